@@ -0,0 +1,77 @@
+"""
+Benchmark of row edits and reads on chunked columns, against numpy arrays.
+
+Usage: python bench/bench_chunked.py [NUM_ROWS [NUM_COLS [NUM_EDITS]]]
+"""
+
+#-------------------------------------------------------------------------------
+
+import numpy as np
+import sys
+import time
+
+from   tbl import model
+from   tbl.model import Model
+
+#-------------------------------------------------------------------------------
+
+def make_model(num_rows, num_cols):
+    mdl = Model()
+    for i in range(num_cols):
+        mdl.add_col(np.arange(num_rows, dtype=np.float64) * i, "c{}".format(i))
+    return mdl
+
+
+def edit_numpy(mdl, rows):
+    # The previous implementation of row deletion.
+    for r in rows:
+        for col in mdl.cols:
+            col.arr = np.delete(col.arr, r)
+        mdl.num_rows -= 1
+
+
+def edit_chunked(mdl, rows):
+    for r in rows:
+        model.delete_row(mdl, r)
+
+
+def read_range(mdl, num):
+    # Read screen-sized ranges of rows from all columns.
+    for start in range(0, mdl.num_rows - 50, mdl.num_rows // num):
+        for col in mdl.cols:
+            col.arr[start : start + 50]
+
+
+def timed(fn, *args, **kw_args):
+    start = time.perf_counter()
+    fn(*args, **kw_args)
+    return time.perf_counter() - start
+
+
+def main():
+    num_rows    = int(sys.argv[1]) if len(sys.argv) > 1 else 5000000
+    num_cols    = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    num_edits   = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+    print("{:,} rows x {} cols, {} deletes".format(
+        num_rows, num_cols, num_edits))
+    rows = np.random.default_rng(0).integers(num_rows // 2, size=num_edits)
+
+    mdl = make_model(num_rows, num_cols)
+    elapsed = timed(edit_numpy, mdl, rows)
+    print("numpy   delete  {:9.3f} ms/row".format(elapsed / num_edits * 1e3))
+    elapsed = timed(read_range, mdl, 1000)
+    print("numpy   read    {:9.3f} ms".format(elapsed * 1e3))
+
+    mdl = make_model(num_rows, num_cols)
+    elapsed = timed(edit_chunked, mdl, rows)
+    print("chunked delete  {:9.3f} ms/row".format(elapsed / num_edits * 1e3))
+    elapsed = timed(read_range, mdl, 1000)
+    print("chunked read    {:9.3f} ms".format(elapsed * 1e3))
+    elapsed = timed(lambda: [ np.asarray(c.arr) for c in mdl.cols ])
+    print("chunked asarray {:9.3f} ms".format(elapsed * 1e3))
+
+
+if __name__ == "__main__":
+    main()
+
+
@@ -0,0 +1,73 @@
+"""
+Benchmark of parallel CSV parsing against the number of workers.
+
+Usage: python bench/bench_parallel_csv.py [NUM_ROWS]
+"""
+
+#-------------------------------------------------------------------------------
+
+import numpy as np
+import os
+from   pathlib import Path
+import sys
+import tempfile
+import time
+
+from   tbl import parse
+from   tbl.parallel_csv import parse_parallel
+
+#-------------------------------------------------------------------------------
+
+def write_csv(path, num_rows):
+    rng = np.random.default_rng(0)
+    with open(path, "w") as file:
+        print("id,x,y,label", file=file)
+        for start in range(0, num_rows, 100000):
+            n = min(100000, num_rows - start)
+            ids = np.arange(start, start + n)
+            xs = rng.normal(size=n)
+            ys = rng.integers(0, 1000000, size=n)
+            labels = rng.choice(["alpha", "beta", "gamma", "delta"], size=n)
+            file.writelines(
+                "{},{:.6f},{},{}\n".format(*r)
+                for r in zip(ids, xs, ys, labels)
+            )
+
+
+def load_serial(path):
+    with open(path, newline="") as file:
+        rows, names = parse.reader(file)
+        convert = parse.BatchConverter(len(names))
+        return [ convert(b) for b in parse.iter_batches(rows, len(names)) ]
+
+
+def timed(fn, *args, **kw_args):
+    start = time.perf_counter()
+    fn(*args, **kw_args)
+    return time.perf_counter() - start
+
+
+def main():
+    num_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 2000000
+    with tempfile.TemporaryDirectory() as dir:
+        path = Path(dir) / "bench.csv"
+        write_csv(path, num_rows)
+        size = path.stat().st_size
+        print("{:,} rows, {:,} bytes".format(num_rows, size))
+
+        base = timed(load_serial, path)
+        print("serial          {:7.3f} s".format(base))
+        workers = 1
+        while workers <= os.cpu_count():
+            for quoted in (True, False):
+                elapsed = timed(parse_parallel, path, workers, quoted=quoted)
+                print("{:2d} workers {:6s}{:7.3f} s  {:5.2f}x".format(
+                    workers, "quoted" if quoted else "", elapsed,
+                    base / elapsed))
+            workers *= 2
+
+
+if __name__ == "__main__":
+    main()
+
+
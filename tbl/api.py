@@ -1,5 +1,5 @@
 from   .controller import Controller
-from   .model import Model
+from   .dataframe import from_dataframe
 from   .screen import main_loop
 from   .view import build_view
 
@@ -12,8 +12,10 @@ __all__ = (
 def show_dataframe(df):
     """
     Shows the interactive curses viewer for a dataframe.
+
+    The dataframe's columns are shown without copying them.
     """
-    mdl = Model(cols={ n: df[n] for n in df.columns })
+    mdl = from_dataframe(df)
     vw = build_view(mdl)
     ctl = Controller()
     main_loop(mdl, vw, ctl)
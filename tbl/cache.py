@@ -0,0 +1,249 @@
+"""
+Binary columnar cache of loaded tables.
+
+After a file is loaded, each column is written to the cache directory as a
+`.npy` file, along with the column names, the file's size and mtime from
+before it was loaded, and the source options it was loaded with.  When the
+same, unchanged file is opened again with the same options, the columns are
+memory-mapped from the cache instead of parsing the file.
+
+Numeric columns are cached as-is.  Object columns of strings are cached as
+their UTF-8 encoded strings, concatenated, plus an array of offsets; these
+are decoded on demand.  Other object columns, such as those with `None` or
+numbers, are pickled, so that their values are loaded unchanged.  Encoded
+columns are cached as their codes or run ends, plus their values.
+
+The cache directory is `$TBL_CACHE_DIR`, or by default `~/.cache/tbl`.  Each
+file has one entry, in a subdirectory named by a hash of its path.
+"""
+
+#-------------------------------------------------------------------------------
+
+import hashlib
+import json
+import logging
+import numpy as np
+import os
+from   pathlib import Path
+import shutil
+import tempfile
+
+from   .encoding import DictArray, RLEArray
+from   .lazy import LazyArray
+from   .model import Model
+
+__all__ = (
+    "get_meta",
+    "load_cached",
+    "save_cached",
+)
+
+#-------------------------------------------------------------------------------
+
+VERSION = 2
+
+def get_dir():
+    """
+    Returns the cache directory.
+    """
+    dir = os.environ.get("TBL_CACHE_DIR")
+    return Path.home() / ".cache" / "tbl" if dir is None else Path(dir)
+
+
+def get_meta(path, options=None):
+    """
+    Returns the metadata of a cache entry for `path`, as the file is now.
+
+    @param options
+      Source options that affect the loaded table.  An entry is used only
+      with the same options.
+    """
+    path = Path(path).resolve()
+    stat = path.stat()
+    return {
+        "version"   : VERSION,
+        "path"      : str(path),
+        "size"      : stat.st_size,
+        "mtime_ns"  : stat.st_mtime_ns,
+        # As they'll be read back from JSON, so that they compare equal.
+        "options"   : json.loads(json.dumps(options or {}, default=str)),
+    }
+
+
+def _get_entry(meta):
+    """
+    Returns the cache entry directory for a file's metadata.
+    """
+    key = hashlib.sha1(meta["path"].encode()).hexdigest()[: 20]
+    return get_dir() / key
+
+
+#-------------------------------------------------------------------------------
+
+class PackedStrings(LazyArray):
+    """
+    Strings stored as concatenated UTF-8 bytes, decoded on demand.
+    """
+
+    in_memory = True
+
+    def __init__(self, data, offsets):
+        self.__data = data
+        self.__offsets = offsets
+
+
+    def __len__(self):
+        return len(self.__offsets) - 1
+
+
+    def _get_range(self, start, stop):
+        arr = np.empty(stop - start, dtype=object)
+        if stop > start:
+            offsets = np.asarray(self.__offsets[start : stop + 1])
+            base = offsets[0]
+            text = self.__data[base : offsets[-1]].tobytes()
+            offsets = offsets - base
+            arr[:] = [
+                text[o0 : o1].decode()
+                for o0, o1 in zip(offsets[: -1], offsets[1 :])
+            ]
+        return arr
+
+
+
+def _pack_strings(arr):
+    """
+    Encodes an object array of strings to UTF-8 bytes and offsets.
+    """
+    encoded = [ v.encode() for v in arr ]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([ len(e) for e in encoded ], out=offsets[1 :])
+    data = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+    return data, offsets
+
+
+#-------------------------------------------------------------------------------
+
+def load_cached(path, options=None):
+    """
+    Loads a model for `path` from the cache.
+
+    @param options
+      Source options, which must match those the entry was saved with.
+    @return
+      The model, or `None` if there is no up-to-date cache entry.
+    """
+    meta = get_meta(path, options)
+    entry = _get_entry(meta)
+    try:
+        with open(entry / "meta.json") as file:
+            cached = json.load(file)
+    except (OSError, ValueError):
+        return None
+    cols = cached.pop("cols", None)
+    if cols is None or cached != meta:
+        return None
+
+    mdl = Model()
+    def load_objects(name, kind):
+        if kind == "objects":
+            return np.load(
+                entry / "{}.npy".format(name), allow_pickle=True)
+        return PackedStrings(
+            np.load(entry / "{}.data.npy".format(name), mmap_mode="r"),
+            np.load(entry / "{}.offsets.npy".format(name), mmap_mode="r"),
+        )
+
+    try:
+        for i, col in enumerate(cols):
+            if col["kind"] in ("strings", "objects"):
+                arr = load_objects(i, col["kind"])
+            elif col["kind"] == "dict":
+                arr = DictArray(
+                    np.load(entry / "{}.codes.npy".format(i), mmap_mode="r"),
+                    np.asarray(
+                        load_objects("{}.values".format(i), col["values"])),
+                )
+            elif col["kind"] == "rle":
+                arr = RLEArray(
+                    np.load(entry / "{}.ends.npy".format(i)),
+                    np.asarray(
+                        load_objects("{}.values".format(i), col["values"])),
+                )
+            else:
+                arr = np.load(entry / "{}.npy".format(i), mmap_mode="r")
+            mdl.add_col(arr, col["name"])
+    except (OSError, ValueError) as exc:
+        logging.warning("bad cache entry: {}: {}".format(entry, exc))
+        return None
+
+    if mdl.num_rows is None:
+        mdl.num_rows = 0
+    logging.info("loaded from cache: {}".format(entry))
+    return mdl
+
+
+def save_cached(path, mdl, meta=None):
+    """
+    Writes the columns of `mdl` to the cache entry for `path`.
+
+    The entry is written to a temporary directory and moved into place, so a
+    partially-written entry is never used.
+
+    @param meta
+      The file's metadata from `get_meta()`, taken before it was loaded, so
+      that the entry is stale if the file changed since; if `None`, taken now.
+    """
+    meta = get_meta(path) if meta is None else meta
+    entry = _get_entry(meta)
+    entry.parent.mkdir(parents=True, exist_ok=True)
+    tmp = Path(tempfile.mkdtemp(dir=entry.parent, prefix=".tmp-"))
+    def save_objects(name, arr):
+        """
+        Saves an object array; returns "strings" or "objects".
+        """
+        arr = np.asarray(arr, dtype=object)
+        if all( type(v) is str for v in arr ):
+            data, offsets = _pack_strings(arr)
+            np.save(tmp / "{}.data.npy".format(name), data)
+            np.save(tmp / "{}.offsets.npy".format(name), offsets)
+            return "strings"
+        else:
+            np.save(tmp / "{}.npy".format(name), arr, allow_pickle=True)
+            return "objects"
+
+    try:
+        cols = []
+        for i, col in enumerate(mdl.cols):
+            arr = col.arr
+            meta_col = {"name": col.name}
+            if isinstance(arr, DictArray):
+                np.save(tmp / "{}.codes.npy".format(i), arr.codes)
+                meta_col["values"] = save_objects(
+                    "{}.values".format(i), arr.values)
+                meta_col["kind"] = "dict"
+            elif isinstance(arr, RLEArray):
+                np.save(tmp / "{}.ends.npy".format(i), arr.ends)
+                meta_col["values"] = save_objects(
+                    "{}.values".format(i), arr.values)
+                meta_col["kind"] = "rle"
+            elif arr.dtype.kind == "O":
+                meta_col["kind"] = save_objects(i, arr)
+            else:
+                np.save(tmp / "{}.npy".format(i), np.asarray(arr))
+                meta_col["kind"] = "array"
+            cols.append(meta_col)
+
+        # Write metadata last.
+        with open(tmp / "meta.json", "w") as file:
+            json.dump(dict(meta, cols=cols), file)
+
+        # Replace any old entry.
+        shutil.rmtree(entry, ignore_errors=True)
+        os.replace(tmp, entry)
+    except:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    logging.info("saved to cache: {}".format(entry))
+
+
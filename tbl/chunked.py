@@ -0,0 +1,221 @@
+"""
+Chunked columns, for cheap row insertion and deletion.
+
+A chunked column is a sequence of chunks, each a range of rows of some
+underlying array, numpy or lazy.  A column is first chunked into fixed-size
+ranges of itself, without copying.  Inserting or deleting a row copies only
+the chunk containing it, into a new numpy array, so an edit costs O(chunk)
+rather than O(rows); unchanged chunks are shared with the previous version.
+
+Chunks are kept between `CHUNK_SIZE / 2` and `2 * CHUNK_SIZE` rows, roughly,
+by merging and splitting edited chunks with their neighbors.
+
+A lazy array's dtype may widen as more of it is read, so a chunked column's
+dtype isn't fixed; it's the widest of its chunks' current dtypes.  Rows read
+from a chunk are converted to it, by the lazy array they came from.
+"""
+
+#-------------------------------------------------------------------------------
+
+from   bisect import bisect_right
+from   itertools import accumulate
+import numpy as np
+
+from   .lazy import LazyArray
+
+__all__ = (
+    "ChunkedArray",
+    "chunk",
+)
+
+#-------------------------------------------------------------------------------
+
+# Number of rows in each chunk initially.
+CHUNK_SIZE = 65536
+
+class ChunkedArray(LazyArray):
+    """
+    An array stored as a sequence of chunks.
+
+    Each chunk is an `(arr, start, stop)` range of rows of an array.  Edits
+    return new chunked arrays.
+    """
+
+    def __init__(self, chunks, dtype, source=None):
+        """
+        @param dtype
+          The dtype, if there are no chunks.
+        @param source
+          The lazy array the column was chunked from, if any.
+        """
+        self.chunks = chunks
+        self.source = source
+        # The widest dtype of numpy chunks, which don't change.
+        self.__dtype = np.result_type(
+            np.dtype(dtype),
+            *{ a.dtype for a, _, _ in chunks if isinstance(a, np.ndarray) })
+        # Lazy chunks, whose dtypes may widen.
+        self.__lazy = list({
+            id(a): a for a, _, _ in chunks if not isinstance(a, np.ndarray)
+        }.values())
+        # End row of each chunk.  A list, since bisecting it is faster than
+        # searching an array, for a single row.
+        self.__ends = list(accumulate( e - s for _, s, e in chunks ))
+
+
+    @classmethod
+    def from_array(Class, arr, chunk_size=CHUNK_SIZE):
+        """
+        Chunks an array, without copying it.
+        """
+        return Class(
+            [
+                (arr, start, min(start + chunk_size, len(arr)))
+                for start in range(0, len(arr), chunk_size)
+            ],
+            arr.dtype,
+            arr if isinstance(arr, LazyArray) else None)
+
+
+    def __len__(self):
+        return self.__ends[-1] if len(self.__ends) > 0 else 0
+
+
+    @property
+    def dtype(self):
+        return np.result_type(self.__dtype, *( a.dtype for a in self.__lazy ))
+
+
+    @property
+    def in_memory(self):
+        return all( a.in_memory for a in self.__lazy )
+
+
+    def __cast(self, vals, dtype):
+        """
+        Converts rows read from chunks to `dtype`.
+        """
+        vals = np.asarray(vals)
+        if vals.dtype == dtype:
+            return vals
+        elif self.source is not None:
+            # Rows copied from the source, before its dtype widened.
+            return self.source.cast(vals, dtype)
+        else:
+            return vals.astype(dtype)
+
+
+    def _get_range(self, start, stop):
+        if stop <= start:
+            return np.empty(0, dtype=self.dtype)
+        p0 = bisect_right(self.__ends, start)
+        p1 = bisect_right(self.__ends, stop - 1, p0) + 1
+        parts = []
+        for p in range(p0, p1):
+            arr, s, e = self.chunks[p]
+            # Shift to the chunk's rows in its array.
+            shift = s - (self.__ends[p] - (e - s))
+            parts.append(arr[max(start + shift, s) : min(stop + shift, e)])
+        # Reading may have widened a lazy chunk; get the dtype afterward.
+        dtype = self.dtype
+        if len(parts) == 1:
+            # A view, if the chunk is a numpy array.
+            return self.__cast(parts[0], dtype)
+        return np.concatenate([ self.__cast(p, dtype) for p in parts ])
+
+
+    def _take(self, idx):
+        ps = np.searchsorted(np.array(self.__ends), idx, side="right")
+        parts = []
+        for p in np.unique(ps):
+            arr, s, e = self.chunks[p]
+            sel = ps == p
+            parts.append(
+                (sel, arr[idx[sel] - (self.__ends[p] - (e - s)) + s]))
+        dtype = self.dtype
+        res = np.empty(len(idx), dtype=dtype)
+        for sel, vals in parts:
+            res[sel] = self.__cast(vals, dtype)
+        return res
+
+
+    def __locate(self, i):
+        """
+        Returns the chunk containing row `i`, and the row's offset in it.
+        """
+        p = min(bisect_right(self.__ends, i), len(self.chunks) - 1)
+        return p, i - (self.__ends[p] - self.__len(p))
+
+
+    def __len(self, p):
+        _, s, e = self.chunks[p]
+        return e - s
+
+
+    def __rows(self, p):
+        """
+        Returns the rows of chunk `p` as a numpy array.
+        """
+        arr, s, e = self.chunks[p]
+        vals = np.asarray(arr[s : e])
+        return self.__cast(vals, np.result_type(vals, self.dtype))
+
+
+    def __replace(self, p, arr):
+        """
+        Returns a copy with chunk `p` replaced by the rows of `arr`.
+
+        Merges the new chunk into a neighbor, or splits it, to keep chunks
+        near `CHUNK_SIZE`.
+        """
+        chunks = self.chunks[: p]
+        rest = self.chunks[p + 1 :]
+        if len(arr) < CHUNK_SIZE // 2:
+            # Merge with the smaller neighbor.
+            prev = len(chunks) > 0 and (
+                len(rest) == 0 or self.__len(p - 1) <= self.__len(p + 1))
+            if prev:
+                arr = np.concatenate([self.__rows(p - 1), arr])
+                chunks = chunks[: -1]
+            elif len(rest) > 0:
+                arr = np.concatenate([arr, self.__rows(p + 1)])
+                rest = rest[1 :]
+        if len(arr) > 2 * CHUNK_SIZE:
+            half = len(arr) // 2
+            chunks.extend([(arr, 0, half), (arr, half, len(arr))])
+        elif len(arr) > 0:
+            chunks.append((arr, 0, len(arr)))
+        return self.__class__(chunks + rest, self.__dtype, self.source)
+
+
+    def delete(self, i):
+        """
+        Returns a copy with row `i` deleted.
+        """
+        p, j = self.__locate(i)
+        return self.__replace(p, np.delete(self.__rows(p), j))
+
+
+    def insert(self, i, val):
+        """
+        Returns a copy with `val` inserted at row `i`.
+        """
+        if len(self.chunks) == 0:
+            return self.__class__(
+                [(np.array([val], dtype=self.dtype), 0, 1)], self.dtype,
+                self.source)
+        p, j = self.__locate(i)
+        return self.__replace(p, np.insert(self.__rows(p), j, val))
+
+
+
+def chunk(arr):
+    """
+    Returns `arr` as a chunked array, chunking it if necessary.
+    """
+    if isinstance(arr, ChunkedArray):
+        return arr
+    else:
+        return ChunkedArray.from_array(arr)
+
+
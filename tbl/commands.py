@@ -25,16 +25,22 @@ named "name":
         ...
     ``` 
 
+Commands that edit the model record a snapshot of it first, with
+`Controller.push()`, so that they may be undone.
+
 The command should perform the appropriate action, and may,
 
 1. Return `CmdResult` to indicate success.  The result object may optionally
-   carry a status message to show to the user, and an undo function (of no
-   arguments) to add to the undo stack.
+   carry a status message to show to the user.
 
 1. Return of `None`.  This is treated as a default `CmdResult`.
 
 1. Raise `CmdError`to indicate failure.
 
+A command that computes a table at length may instead start a background job
+that returns a `CmdResult` with the table; the table is opened when the job
+finishes.
+
 To bind a command to a key or key combo, see the `keymap` module.
 """
 
@@ -80,6 +86,7 @@ def command():
             raise ValueError("command name {} already used".format(name))
 
         commands[name] = Command(name, fn, params)
+        return fn
 
     return register
 
@@ -94,8 +101,13 @@ class CmdError(Exception):
 
 class CmdResult:
 
-    def __init__(self, *, msg=None):
+    def __init__(self, *, msg=None, table=None):
+        """
+        @param table
+          A new table to open, as a `(mdl, vw)` pair, or `None`.
+        """
         self.msg = msg
+        self.table = table
 
 
     def __repr__(self):
@@ -0,0 +1,221 @@
+"""
+Streaming compression and decompression of files.
+
+Compression is determined from the file suffix.  Compressed files are read and
+written as streams, so they are never decompressed in full to disk or memory.
+
+Gzip files may contain multiple members, as written by `bgzip`, `pigz -i`, or
+by concatenating gzip files.  These are decompressed in parallel threads (zlib
+releases the GIL), a bounded number of members at a time.  Member starts
+aren't recorded in the file, so candidates are found by searching for the gzip
+magic bytes; a candidate is accepted only if the previous member ends exactly
+there, which zlib verifies with the member's CRC.
+"""
+
+#-------------------------------------------------------------------------------
+
+import bz2
+from   concurrent.futures import ThreadPoolExecutor
+from   contextlib import contextmanager
+import gzip
+import io
+import lzma
+import mmap
+import os
+import re
+import zlib
+
+__all__ = (
+    "SUFFIXES",
+    "get_compression",
+    "open_read",
+    "open_write",
+)
+
+#-------------------------------------------------------------------------------
+
+# Modules for compression suffixes.
+SUFFIXES = {
+    ".gz"   : gzip,
+    ".bz2"  : bz2,
+    ".xz"   : lzma,
+}
+
+def get_compression(path):
+    """
+    Returns the compression suffix of `path`, or `None` if uncompressed.
+    """
+    suffix = os.path.splitext(str(path))[1]
+    return suffix if suffix in SUFFIXES else None
+
+
+#-------------------------------------------------------------------------------
+# Parallel gzip
+
+GZIP_MAGIC = re.compile(b"\x1f\x8b\x08")
+
+# Members with more compressed bytes than this are streamed, not decoded whole.
+MAX_MEMBER_SIZE = 1 << 24
+
+# Size of reads when streaming.
+CHUNK_SIZE = 1 << 20
+
+def _decode_member(buf, start, stop):
+    """
+    Decodes a gzip member that should occupy exactly `buf[start : stop]`.
+
+    @return
+      The decompressed data, or `None` if this isn't a complete member.
+    """
+    dec = zlib.decompressobj(wbits=31)
+    try:
+        data = dec.decompress(buf[start : stop])
+    except zlib.error:
+        return None
+    return data if dec.eof and len(dec.unused_data) == 0 else None
+
+
+def _stream_member(buf, start):
+    """
+    Decodes the gzip member starting at `start`, in chunks.
+
+    @return
+      A generator of decompressed chunks, whose return value is the offset
+      at which the member ends.
+    """
+    dec = zlib.decompressobj(wbits=31)
+    pos = start
+    while not dec.eof:
+        if pos >= len(buf):
+            raise EOFError("truncated gzip member")
+        chunk = buf[pos : pos + CHUNK_SIZE]
+        yield dec.decompress(chunk)
+        pos += len(chunk)
+    return pos - len(dec.unused_data)
+
+
+def iter_gzip_parallel(buf, workers=None):
+    """
+    Decompresses a possibly multi-member gzip buffer, in parallel.
+
+    @return
+      A generator of decompressed chunks, in order.
+    """
+    size = len(buf)
+    cands = [ m.start() for m in GZIP_MAGIC.finditer(buf) ] + [size]
+    if cands[0] != 0:
+        raise zlib.error("not a gzip file")
+
+    workers = os.cpu_count() if workers is None else workers
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        i = 0
+        while i < len(cands) - 1:
+            # Decode the next several candidate members in parallel.
+            spans = [
+                (c0, c1)
+                for c0, c1 in zip(cands[i : i + workers], cands[i + 1 :])
+                if c1 - c0 <= MAX_MEMBER_SIZE
+            ]
+            results = executor.map(lambda s: _decode_member(buf, *s), spans)
+            end = cands[i]
+            for (c0, c1), data in zip(spans, results):
+                if c0 != end or data is None:
+                    break
+                yield data
+                end = c1
+
+            if end == cands[i]:
+                # The next member is large, or the next candidate is a false
+                # positive inside it.  Stream it.
+                end = yield from _stream_member(buf, end)
+
+            # Skip to the candidate where the last member ended.
+            while cands[i] < end:
+                i += 1
+            if cands[i] != end:
+                raise zlib.error("trailing garbage at {}".format(end))
+
+
+class _ChunkReader(io.RawIOBase):
+    """
+    Raw binary stream over a generator of byte chunks.
+    """
+
+    def __init__(self, chunks, close=None):
+        self.__chunks = chunks
+        # The current chunk, sliced without copying.
+        self.__buf = memoryview(b"")
+        self.__close = close
+
+
+    def readable(self):
+        return True
+
+
+    def readinto(self, b):
+        while len(self.__buf) == 0:
+            try:
+                self.__buf = memoryview(next(self.__chunks))
+            except StopIteration:
+                return 0
+        n = min(len(b), len(self.__buf))
+        b[: n] = self.__buf[: n]
+        self.__buf = self.__buf[n :]
+        return n
+
+
+    def close(self):
+        if not self.closed:
+            self.__chunks.close()
+            if self.__close is not None:
+                self.__close()
+        super().close()
+
+
+
+#-------------------------------------------------------------------------------
+
+def open_read(path, workers=None):
+    """
+    Opens a possibly-compressed file for streaming binary reads.
+
+    @param workers
+      Number of threads for decompressing multi-member gzip files.
+    """
+    compression = get_compression(path)
+    if compression is None:
+        return open(path, "rb")
+
+    elif compression == ".gz":
+        with open(path, "rb") as file:
+            if file.seek(0, 2) == 0:
+                return io.BytesIO()
+            buf = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        chunks = iter_gzip_parallel(buf, workers)
+        return io.BufferedReader(_ChunkReader(chunks, buf.close), CHUNK_SIZE)
+
+    else:
+        return SUFFIXES[compression].open(path, "rb")
+
+
+@contextmanager
+def open_write(file, compression):
+    """
+    Context manager that wraps a binary file for writing with compression.
+
+    Finishes the compressed stream on exit, but doesn't close `file`.
+
+    @param compression
+      A compression suffix, or `None` for no compression.
+    """
+    if compression is None:
+        yield file
+    elif compression == ".gz":
+        # Don't record the temporary file's name in the gzip header.
+        with gzip.GzipFile(filename="", mode="wb", fileobj=file) as cfile:
+            yield cfile
+    else:
+        with SUFFIXES[compression].open(file, "wb") as cfile:
+            yield cfile
+
+
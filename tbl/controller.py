@@ -1,7 +1,12 @@
 import numpy as np
+import re
 
-from   . import model, view
+from   . import join, model, view
 from   .commands import *
+from   .derived import derive
+from   .history import DEFAULT_BUDGET, History
+from   .lazy import Unloaded
+from   .selection import to_runs
 
 # FIXME: Track dirty state.
 
@@ -9,34 +14,285 @@ from   .commands import *
 
 class Controller:
 
-    def __init__(self):
-        self.undo = []
+    def __init__(self, journal=None, history_budget=DEFAULT_BUDGET):
+        """
+        @param history_budget
+          Memory budget for undo history, in bytes.
+        """
+        self.history = History(history_budget)
+        # Edit journal, if edits are journaled.
+        self.journal = journal
+
+
+    def record(self, op, **args):
+        """
+        Records an edit in the journal, if any.
+        """
+        if self.journal is not None:
+            self.journal.record(op, **args)
+
+
+    def push(self, snap, mdl, name, ops, inverse):
+        """
+        Records an edit in the history and the journal.
+
+        @param snap
+          A snapshot of the model before the edit.
+        @param ops
+          Journal ops, `(op, args)` pairs, that perform the edit.
+        @param inverse
+          Journal ops that undo the edit.
+        """
+        self.history.push(snap, mdl, name, ops, inverse)
+        for op, args in ops:
+            self.record(op, **args)
 
 
 
 #-------------------------------------------------------------------------------
 # Commands
 
+def _check_editable(mdl):
+    if mdl.loading:
+        raise CmdError("table is still loading")
+    if any( isinstance(c.arr, Unloaded) for c in mdl.cols ):
+        raise CmdError("table has unloaded columns")
+
+
 @command()
-def undo(ctl):
+def undo(mdl, vw, ctl):
+    _check_editable(mdl)
     try:
-        cmd = ctl.undo.pop()
+        version = ctl.history.undo_edit(mdl)
     except IndexError:
         raise CmdError("nothing to undo")
-    else:
-        cmd()
+    for op, args in version.inverse:
+        ctl.record(op, **args)
+
+    view.update_cols(vw, mdl)
+    view.update_rows(vw, mdl)
+    view.move_cur_to(vw)
+    return CmdResult(msg="undo: {}".format(version.name))
+
+
+@command()
+def redo(mdl, vw, ctl):
+    _check_editable(mdl)
+    try:
+        version = ctl.history.redo_edit(mdl)
+    except IndexError:
+        raise CmdError("nothing to redo")
+    for op, args in version.ops:
+        ctl.record(op, **args)
+
+    view.update_cols(vw, mdl)
+    view.update_rows(vw, mdl)
+    view.move_cur_to(vw)
+    return CmdResult(msg="redo: {}".format(version.name))
 
 
 @command()
 def delete_row(mdl, vw, ctl):
-    row_num = vw.cur.r
+    _check_editable(mdl)
+    if view.get_num_rows(vw, mdl) == 0:
+        raise CmdError("no rows")
+
+    row_num = view.get_model_rows(vw, vw.cur.r)
+    snap    = model.snapshot(mdl)
     row     = model.delete_row(mdl, row_num)
-    undo    = lambda: model.insert_row(mdl, row_num, row)
-    ctl.undo.append(undo)
+    ctl.push(
+        snap, mdl, "delete row",
+        [("delete_row", {"row": row_num})],
+        [("insert_row", {"row": row_num, "values": row})],
+    )
 
     # Make sure selection is still valid.
-    # FIXME: Abstract this propertly.
-    vw.layout = view.Layout(mdl, vw)
+    view.update_rows(vw, mdl)
     view.move_cur_to(vw)
 
 
+def _get_selected(mdl, vw):
+    """
+    Returns a mask of selected model rows.
+    """
+    _check_editable(mdl)
+    mask = view.get_selected(vw, mdl.num_rows)
+    if not mask.any():
+        raise CmdError("no rows selected")
+    return mask
+
+
+def _take_rows(mdl, ctl, name, idx, inverse):
+    """
+    Takes rows at `idx`, as a single edit.
+    """
+    snap = model.snapshot(mdl)
+    model.take_rows(mdl, idx)
+    ctl.push(snap, mdl, name, [("take_rows", {"runs": to_runs(idx)})], inverse)
+
+
+@command()
+def delete_selected_rows(mdl, vw, ctl):
+    mask = _get_selected(mdl, vw)
+    # Displayed rows that are selected, above the cursor.
+    before = vw.selection.count(0, vw.cur.r)
+    rows = np.flatnonzero(mask)
+    # To undo in the journal, insert the deleted values back.  The history
+    # restores its snapshot instead, so without a journal, don't copy them.
+    inverse = [] if ctl.journal is None else [(
+        "insert_rows", {
+            "runs": to_runs(rows),
+            "values": [ c.arr[rows] for c in mdl.cols ],
+        }
+    )]
+    _take_rows(
+        mdl, ctl, "delete {} rows".format(len(rows)), np.flatnonzero(~mask),
+        inverse,
+    )
+
+    vw.selection.clear()
+    view.update_rows(vw, mdl)
+    view.move_cur_to(vw, r=vw.cur.r - before)
+    return CmdResult(msg="deleted {} rows".format(len(rows)))
+
+
+@command()
+def duplicate_selected_rows(mdl, vw, ctl):
+    mask = _get_selected(mdl, vw)
+    # Displayed rows that are selected, above the cursor.
+    before = vw.selection.count(0, vw.cur.r)
+    # Each selected row is followed by its copy.
+    idx = np.repeat(np.arange(mdl.num_rows), 1 + mask)
+    first = np.diff(idx, prepend=-1) != 0
+    num = int(mask.sum())
+    _take_rows(
+        mdl, ctl, "duplicate {} rows".format(num), idx,
+        [("take_rows", {"runs": to_runs(np.flatnonzero(first))})],
+    )
+
+    view.update_rows(vw, mdl)
+    # Select the copies.
+    view.select(vw, ~first)
+    view.move_cur_to(vw, r=vw.cur.r + before)
+    return CmdResult(msg="duplicated {} rows".format(num))
+
+
+@command()
+def move_selected_rows(mdl, vw, ctl):
+    """
+    Moves selected rows to before the cursor row.
+    """
+    if len(vw.sort_keys) > 0:
+        raise CmdError("can't move rows in a sorted view")
+    mask = _get_selected(mdl, vw)
+    # The cursor's model row.  Rows in a filtered view are in model order.
+    r = int(view.get_model_rows(vw, vw.cur.r))
+    rows = np.arange(mdl.num_rows)
+    idx = np.concatenate([
+        rows[: r][~mask[: r]],
+        rows[mask],
+        rows[r :][~mask[r :]],
+    ])
+    # The inverse permutation restores the original order.
+    inverse = np.argsort(idx, kind="stable")
+    num = int(mask.sum())
+    _take_rows(
+        mdl, ctl, "move {} rows".format(num), idx,
+        [("take_rows", {"runs": to_runs(inverse)})],
+    )
+
+    # Keep the moved rows selected, and the cursor on the first of them.
+    start = r - int(mask[: r].sum())
+    moved = np.zeros(mdl.num_rows, dtype=bool)
+    moved[start : start + num] = True
+    view.update_rows(vw, mdl)
+    view.select(vw, moved)
+    if len(vw.selection) > 0:
+        view.move_cur_to(vw, r=int(vw.selection.starts[0]))
+    return CmdResult(msg="moved {} rows".format(num))
+
+
+@command()
+def add_column(mdl, vw, ctl, expr):
+    """
+    Adds a derived column after the current column.
+
+    @param expr
+      The column name and expression, as `name = expression`, for example
+      `total = qty * price`.
+    """
+    _check_editable(mdl)
+    match = re.match(r"\s*([^=]+?)\s*=(?!=)(.*)$", expr)
+    if match is None:
+        raise CmdError("expected: name = expression")
+    name, expr = match.group(1), match.group(2).strip()
+    if any( c.name == name for c in mdl.cols ):
+        raise CmdError("column exists: {}".format(name))
+    try:
+        arr = derive(mdl, expr)
+    except ValueError as exc:
+        raise CmdError(str(exc))
+
+    position = (
+        mdl.get_col_idx(vw.cols[vw.cur.c].col_id) + 1 if len(vw.cols) > 0
+        else mdl.num_cols
+    )
+    snap = model.snapshot(mdl)
+    mdl.add_col(arr, name, position=position)
+    args = {"name": name, "expr": expr, "position": position}
+    ctl.push(
+        snap, mdl, "add column {}".format(name),
+        [("add_derived_col", args)],
+        [("delete_col", {"position": position})],
+    )
+
+    view.update_cols(vw, mdl)
+    col_id = mdl.cols[position].id
+    c = next( c for c, col in enumerate(vw.cols) if col.col_id == col_id )
+    view.move_cur_to(vw, c=c)
+    return CmdResult(msg="added column: {}".format(name))
+
+
+@command()
+def lookup_join(mdl, vw, ctl, source_str, key):
+    """
+    Adds the columns of another table, looked up by key, after the current
+    column.
+
+    @param key
+      The name of the key column in both tables, or `left=right` if the names
+      differ; if empty, the current column.
+    """
+    _check_editable(mdl)
+    if source_str == "":
+        raise CmdError("no source given")
+    if key.strip() == "":
+        key = mdl.get_col(vw.cols[vw.cur.c].col_id).name
+    left, _, right = ( k.strip() for k in key.partition("=") )
+    right = right or left
+
+    position = (
+        mdl.get_col_idx(vw.cols[vw.cur.c].col_id) + 1 if len(vw.cols) > 0
+        else mdl.num_cols
+    )
+    snap = model.snapshot(mdl)
+    try:
+        num_cols, num_rows = join.lookup_join(
+            mdl, source_str, left, right, position)
+    except (ValueError, OSError) as exc:
+        raise CmdError("can't join: {}".format(exc))
+    args = {
+        "source": source_str, "left": left, "right": right,
+        "position": position,
+    }
+    ctl.push(
+        snap, mdl, "join {}".format(source_str),
+        [("lookup_join", args)],
+        [("delete_col", {"position": position})] * num_cols,
+    )
+
+    view.update_cols(vw, mdl)
+    return CmdResult(msg="joined {} columns; {:,} of {:,} rows matched".format(
+        num_cols, num_rows, mdl.num_rows))
+
+
@@ -0,0 +1,306 @@
+"""
+Value counts and histograms of a column.
+
+Value counts are exact for encoded columns, which are counted from their
+codes or runs, and for columns of up to `EXACT_LIMIT` rows.  Larger columns
+are counted approximately, unless exact counts are requested, in a single
+streaming pass that holds a bounded summary of the most frequent values.
+
+The summary is a Misra-Gries summary, the mergeable form of a space-saving
+sketch: each chunk of rows is counted exactly, and merged into the summary;
+when the summary has more than `SUMMARY_SIZE` values, the count of the next
+most frequent value is subtracted from all, and values whose counts drop to
+zero are evicted.  Counts are therefore underestimates, by at most the total
+subtracted, which is reported as the error.  Any value that occurs in more
+than `1 / SUMMARY_SIZE` of rows is kept.
+
+A histogram of a numeric column counts values in equal-width bins between
+the column's finite min and max, in a streaming pass.  NaN and infinite values
+aren't counted.
+
+Results are cached by column array; since edits replace arrays, a column's
+results are reused until it's edited.
+"""
+
+#-------------------------------------------------------------------------------
+
+import numpy as np
+
+from   . import jobs, view
+from   .commands import command, CmdError, CmdResult
+from   .encoding import DictArray, RLEArray
+from   .lazy import Unloaded
+from   .lib.cache import ArrayCache
+from   .model import Model
+from   .stats import get_nulls
+
+__all__ = (
+    "Counts",
+    "count_values",
+    "histogram",
+)
+
+#-------------------------------------------------------------------------------
+
+# Columns with more rows than this are counted approximately, by default.
+EXACT_LIMIT = 1 << 22
+
+# Number of values kept in an approximate summary.
+SUMMARY_SIZE = 1 << 12
+
+# Number of rows per chunk when streaming.
+CHUNK_SIZE = 1 << 20
+
+# Number of values shown in a value counts table.
+TOP_K = 1000
+
+# Number of histogram bins.
+NUM_BINS = 20
+
+# Width of histogram bars, in characters.
+BAR_WIDTH = 40
+
+# Number of counts and histograms to cache.
+CACHE_SIZE = 16
+
+_results = ArrayCache(CACHE_SIZE)
+
+def _sum_by_value(vals, counts):
+    """
+    Sums counts of equal values.
+
+    @return
+      Distinct values and their total counts.
+    @raise ValueError
+      The values can't be compared.
+    """
+    try:
+        vals, inverse = np.unique(vals, return_inverse=True)
+    except TypeError:
+        raise ValueError("values aren't comparable")
+    return vals, np.bincount(
+        inverse.reshape(-1), weights=counts, minlength=len(vals)
+    ).astype(np.int64)
+
+
+class Counts:
+    """
+    Counts of a column's distinct non-null values, most frequent first.
+    """
+
+    def __init__(self, values, counts, num_null, error=0):
+        order = np.argsort(-counts, kind="stable")
+        self.values     = values[order]
+        self.counts     = counts[order]
+        self.num_null   = num_null
+        # The most by which any count may be underestimated.
+        self.error      = error
+
+
+    @property
+    def exact(self):
+        return self.error == 0
+
+
+
+class _Summary:
+    """
+    Misra-Gries summary of frequent values.
+    """
+
+    def __init__(self, size, dtype):
+        self.size   = size
+        self.values = np.empty(0, dtype=dtype)
+        self.counts = np.empty(0, dtype=np.int64)
+        self.error  = 0
+
+
+    def add(self, vals, counts):
+        """
+        Adds distinct values and their counts.
+        """
+        vals, counts = _sum_by_value(
+            np.concatenate([self.values, vals]),
+            np.concatenate([self.counts, counts]))
+        if len(vals) > self.size:
+            # Subtract the count of the first value that doesn't fit.
+            cut = np.partition(counts, len(counts) - self.size - 1)[
+                len(counts) - self.size - 1]
+            counts -= cut
+            keep = counts > 0
+            vals, counts = vals[keep], counts[keep]
+            self.error += int(cut)
+        self.values, self.counts = vals, counts
+
+
+
+def _count(arr, exact):
+    if isinstance(arr, DictArray):
+        vals = arr.values
+        # A negative code, as for a missing categorical value, is null.
+        codes = arr.codes[arr.codes >= 0]
+        counts = np.bincount(codes, minlength=len(vals))
+    elif isinstance(arr, RLEArray):
+        vals = arr.values
+        counts = np.diff(arr.ends, prepend=0)
+    elif exact or len(arr) <= EXACT_LIMIT:
+        vals = np.asarray(arr)
+        counts = np.ones(len(vals), dtype=np.int64)
+    else:
+        summary = _Summary(SUMMARY_SIZE, arr.dtype)
+        num_null = 0
+        for start in range(0, len(arr), CHUNK_SIZE):
+            vals = np.asarray(arr[start : start + CHUNK_SIZE])
+            nulls = get_nulls(vals)
+            num_null += int(nulls.sum())
+            vals = vals[~nulls]
+            summary.add(vals, np.ones(len(vals), dtype=np.int64))
+        return Counts(summary.values, summary.counts, num_null, summary.error)
+
+    nulls = get_nulls(vals)
+    vals, counts = _sum_by_value(vals[~nulls], counts[~nulls])
+    return Counts(vals, counts, len(arr) - int(counts.sum()))
+
+
+def count_values(arr, exact=False):
+    """
+    Counts the distinct values of a column.  Results are cached.
+
+    @param exact
+      If true, count exactly, however large the column.
+    @rtype
+      `Counts`
+    @raise ValueError
+      The values can't be compared.
+    """
+    return _results.get(
+        ("counts", id(arr), exact), arr, lambda: _count(arr, exact))
+
+
+def _get_finite(arr, start):
+    vals = np.asarray(arr[start : start + CHUNK_SIZE])
+    return vals[np.isfinite(vals)]
+
+
+def _histogram(arr, bins):
+    lo = hi = None
+    # Find the range, then count, a chunk at a time.
+    for start in range(0, len(arr), CHUNK_SIZE):
+        vals = _get_finite(arr, start)
+        if len(vals) > 0:
+            lo = vals.min() if lo is None else min(lo, vals.min())
+            hi = vals.max() if hi is None else max(hi, vals.max())
+    if lo is None:
+        return np.empty(0), np.empty(0, dtype=np.int64)
+
+    edges = np.linspace(float(lo), float(hi), bins + 1)
+    counts = np.zeros(bins, dtype=np.int64)
+    for start in range(0, len(arr), CHUNK_SIZE):
+        counts += np.histogram(_get_finite(arr, start), edges)[0]
+    return edges, counts
+
+
+def histogram(arr, bins=NUM_BINS):
+    """
+    Counts a numeric column's finite values in equal-width bins.  Results
+    are cached.
+
+    @return
+      Bin edges, and the count in each bin.  Values equal to the last edge
+      are in the last bin.
+    """
+    return _results.get(
+        ("histogram", id(arr), bins), arr, lambda: _histogram(arr, bins))
+
+
+#-------------------------------------------------------------------------------
+# Commands
+
+def _get_col(vw, mdl):
+    if mdl.loading:
+        raise CmdError("table is still loading")
+    col = mdl.get_col(vw.cols[vw.cur.c].col_id)
+    if isinstance(col.arr, Unloaded):
+        raise CmdError("column isn't loaded: {}".format(col.name))
+    return col
+
+
+def _value_counts(vw, mdl, exact):
+    col = _get_col(vw, mdl)
+    name, arr, num_rows = col.name, col.arr, mdl.num_rows
+
+    def run(job):
+        job.status = "counting {}".format(name)
+        # A ValueError, if the values can't be compared, fails the job.
+        counts = count_values(arr, exact)
+
+        table = Model()
+        table.add_col(counts.values[: TOP_K], name)
+        table.add_col(counts.counts[: TOP_K], "count")
+        table.add_col(counts.counts[: TOP_K] / max(num_rows, 1), "fraction")
+
+        if counts.exact:
+            msg = "{:,} values; {:,} nulls".format(
+                len(counts.values), counts.num_null)
+        else:
+            msg = (
+                "top {:,} values; {:,} nulls; counts may be low by {:,}"
+                .format(len(counts.values), counts.num_null, counts.error))
+        return CmdResult(msg=msg, table=(table, view.build_view(table)))
+
+    # Count in the background; the main loop opens the table when done.
+    jobs.start("value counts {}".format(name), run)
+    return CmdResult(msg="counting values: {}".format(name))
+
+
+@command()
+def value_counts(vw, mdl):
+    """
+    Opens a table of the most frequent values in the current column.
+
+    Large columns are counted approximately.
+    """
+    return _value_counts(vw, mdl, False)
+
+
+@command()
+def value_counts_exact(vw, mdl):
+    """
+    Opens a table of the most frequent values in the current column, counted
+    exactly.
+    """
+    return _value_counts(vw, mdl, True)
+
+
+@command()
+def show_histogram(vw, mdl):
+    """
+    Opens a histogram of the current column's values, if numeric.
+    """
+    col = _get_col(vw, mdl)
+    if col.arr.dtype.kind not in "iuf":
+        raise CmdError("not numeric: {}".format(col.name))
+    name, arr = col.name, col.arr
+
+    def run(job):
+        job.status = "histogram {}".format(name)
+        edges, counts = histogram(arr)
+
+        table = Model()
+        table.add_col(edges[: -1], "from")
+        table.add_col(edges[1 :], "to")
+        table.add_col(counts, "count")
+        top = max(counts.max(), 1) if len(counts) > 0 else 1
+        bars = [ "▇" * int(round(BAR_WIDTH * c / top)) for c in counts ]
+        table.add_col(np.array(bars, dtype=object), "bar")
+
+        return CmdResult(
+            msg="histogram of {}: {} bins".format(name, len(counts)),
+            table=(table, view.build_view(table)),
+        )
+
+    # Count in the background; the main loop opens the table when done.
+    jobs.start("histogram {}".format(name), run)
+    return CmdResult(msg="computing histogram: {}".format(name))
+
+
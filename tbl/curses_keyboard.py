@@ -61,6 +61,8 @@ KEYS = {
     275:    "F11",
     276:    "F12",
     330:    "DELETE",
+    336:    "S-DOWN",
+    337:    "S-UP",
     338:    "PAGEDOWN",
     339:    "PAGEUP",
     343:    "ENTER",
@@ -76,12 +78,22 @@ META_KEYS = {
     102:    "M-RIGHT",  # M-f 
 }
 
-def get_key(stdscr, interval=0.01):
+def get_key(stdscr, interval=0.01, timeout=None):
+    """
+    Waits for and returns the next key or UI event.
+
+    @param timeout
+      If not `None`, the maximum time in seconds to wait; returns the
+      pseudo-key "TIMEOUT" if no event occurs in this time.
+    """
+    end = None if timeout is None else time.monotonic() + timeout
     while True:
         meta = False
         c = stdscr.getch()
         if c == -1:
             # No character available.
+            if end is not None and time.monotonic() >= end:
+                return "TIMEOUT", None
             time.sleep(interval)
             continue
 
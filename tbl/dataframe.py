@@ -0,0 +1,94 @@
+"""
+Models that wrap pandas DataFrame columns without copying them.
+
+Columns backed by numpy arrays are used directly, as views.  Categorical
+columns are dictionary-encoded columns sharing the categorical's codes.
+Columns with other extension dtypes, such as nullable ints and strings, are
+lazy arrays, which convert only the rows that are read.
+"""
+
+#-------------------------------------------------------------------------------
+
+import numpy as np
+
+from   .encoding import DictArray
+from   .lazy import LazyArray
+from   .model import Model
+
+__all__ = (
+    "ExtensionColumn",
+    "from_dataframe",
+)
+
+#-------------------------------------------------------------------------------
+
+class ExtensionColumn(LazyArray):
+    """
+    A pandas extension array, converted to numpy on demand.
+
+    Nullable ints and floats are converted to float, with NaN for missing
+    values.  Other extension dtypes are converted to objects, with `None` for
+    missing values.
+    """
+
+    def __init__(self, arr):
+        self.__arr = arr
+        if arr.dtype.kind in "iuf":
+            self.__dtype = np.dtype(np.float64)
+            self.__na_value = np.nan
+        else:
+            self.__dtype = np.dtype(object)
+            self.__na_value = None
+
+
+    def __len__(self):
+        return len(self.__arr)
+
+
+    @property
+    def dtype(self):
+        return self.__dtype
+
+
+    def _get_range(self, start, stop):
+        # Slicing an extension array doesn't copy.
+        return self.__arr[start : stop].to_numpy(
+            dtype=self.__dtype, na_value=self.__na_value)
+
+
+    def _take(self, idx):
+        return self.__arr.take(idx).to_numpy(
+            dtype=self.__dtype, na_value=self.__na_value)
+
+
+
+def _get_arr(series):
+    """
+    Returns an array-like for a series, without copying its data.
+    """
+    import pandas as pd
+
+    dtype = series.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        # Missing values have code -1, which indexes the `None` at the end.
+        values = np.append(dtype.categories.to_numpy(dtype=object), None)
+        return DictArray(series.array.codes, values)
+    elif isinstance(dtype, pd.api.extensions.ExtensionDtype):
+        return ExtensionColumn(series.array)
+    else:
+        return series.to_numpy(copy=False)
+
+
+def from_dataframe(df):
+    """
+    Builds a model whose columns wrap the columns of a DataFrame.
+    """
+    mdl = Model()
+    for i, name in enumerate(df.columns):
+        # By position, in case names are duplicated.
+        mdl.add_col(_get_arr(df.iloc[:, i]), name)
+    if mdl.num_rows is None:
+        mdl.num_rows = len(df)
+    return mdl
+
+
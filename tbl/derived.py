@@ -0,0 +1,203 @@
+"""
+Derived columns, computed from other columns on demand.
+
+A derived column's values are an expression over other columns, in the same
+syntax as filters, for example `qty * price`.  The column's array is a lazy
+array that evaluates the expression only for the rows that are read, such as
+those being rendered or queried, so the column is never materialized unless
+the whole of it is needed.
+
+Values are computed a chunk of rows at a time, and chunks are kept in a
+cache shared by all derived columns, which evicts the least recently used.
+A derived array holds the source arrays it was computed from.  Since edits
+replace arrays rather than modifying them, editing a source column replaces
+the derived array too, which invalidates its cached chunks.
+
+Rows for which the expression can't be evaluated, for example because of a
+value of the wrong type, are null; int and bool values are then converted to
+float, so that they can be NaN.  The column's dtype therefore widens if later
+chunks have such rows.
+"""
+
+#-------------------------------------------------------------------------------
+
+import numpy as np
+
+from   .lazy import LazyArray, Unloaded, get_null
+from   .lib.cache import ArrayCache
+from   .query import Query, get_cols
+
+__all__ = (
+    "DerivedArray",
+    "derive",
+)
+
+#-------------------------------------------------------------------------------
+
+# Number of rows per computed chunk.
+CHUNK_SIZE = 1 << 16
+
+# Number of computed chunks to cache, across all derived columns.
+CACHE_SIZE = 64
+
+# Number of rows on which an expression is checked, before it's derived.
+CHECK_ROWS = 1024
+
+_chunks = ArrayCache(CACHE_SIZE)
+
+def _nulls(num, dtype):
+    """
+    Returns an array of nulls, converting int or bool `dtype` to float.
+    """
+    if dtype.kind in "biu":
+        dtype = np.dtype(np.float64)
+    return np.full(num, get_null(dtype), dtype=dtype)
+
+
+def _evaluate(query, cols, num):
+    """
+    Evaluates an expression, with nulls for rows that can't be evaluated.
+
+    @raise ValueError
+      No row can be evaluated.
+    """
+    try:
+        return query.evaluate(cols, num)
+    except ValueError as exc:
+        error = exc
+
+    # Find the rows that fail, one at a time.
+    failed = np.zeros(num, dtype=bool)
+    parts = []
+    for i in range(num):
+        try:
+            parts.append(query.evaluate(
+                { n: c[i : i + 1] for n, c in cols.items() }, 1))
+        except ValueError:
+            failed[i] = True
+    if len(parts) == 0:
+        raise error
+    vals = np.concatenate(parts)
+    res = _nulls(num, vals.dtype)
+    res[~failed] = vals
+    return res
+
+
+class DerivedArray(LazyArray):
+    """
+    A column computed from an expression over other columns.
+    """
+
+    def __init__(self, query, sources, num_rows):
+        """
+        @param query
+          The `Query` that computes values.
+        @param sources
+          Mapping from each name in the query to the `(col_id, arr)` of the
+          column it refers to.
+        """
+        self.query      = query
+        self.sources    = sources
+        self.num_rows   = num_rows
+        # The widest dtype of values computed so far.
+        self.dtype      = None
+        self.__compute(slice(0, min(num_rows, 1)), 1)
+
+
+    def __len__(self):
+        return self.num_rows
+
+
+    @property
+    def expr(self):
+        return self.query.expr
+
+
+    def __compute(self, sel, num):
+        cols = { n: np.asarray(a[sel]) for n, (_, a) in self.sources.items() }
+        try:
+            vals = _evaluate(self.query, cols, num)
+        except ValueError:
+            dtype = np.dtype(np.float64) if self.dtype is None else self.dtype
+            vals = _nulls(num, dtype)
+        self.dtype = (
+            vals.dtype if self.dtype is None
+            else np.result_type(self.dtype, vals.dtype)
+        )
+        return vals
+
+
+    def __get_chunk(self, i):
+        start = i * CHUNK_SIZE
+        stop = min(start + CHUNK_SIZE, self.num_rows)
+        return _chunks.get(
+            (id(self), i), self,
+            lambda: self.__compute(slice(start, stop), stop - start))
+
+
+    def _get_range(self, start, stop):
+        if stop - start > CACHE_SIZE // 2 * CHUNK_SIZE:
+            # Too many rows to cache; don't evict chunks that are in use.
+            vals = self.__compute(slice(start, stop), stop - start)
+            return vals.astype(self.dtype, copy=False)
+        if stop <= start:
+            return np.empty(0, dtype=self.dtype)
+
+        first, last = start // CHUNK_SIZE, (stop - 1) // CHUNK_SIZE
+        parts = [ self.__get_chunk(i) for i in range(first, last + 1) ]
+        vals = parts[0] if len(parts) == 1 else np.concatenate(parts)
+        offset = first * CHUNK_SIZE
+        # Later chunks may have widened the dtype.
+        return vals[start - offset : stop - offset].astype(
+            self.dtype, copy=False)
+
+
+    def _take(self, idx):
+        # Compute scattered rows directly from their source values.
+        return self.__compute(idx, len(idx))
+
+
+    def update(self, mdl):
+        """
+        Returns the derived array for the model's current source columns.
+
+        @return
+          `self`, if the sources and number of rows are unchanged.
+        @raise LookupError
+          A source column no longer exists.
+        """
+        sources = {
+            n: (i, mdl.get_col(i).arr) for n, (i, _) in self.sources.items() }
+        if (
+                mdl.num_rows == self.num_rows
+                and all(
+                    sources[n][1] is a for n, (_, a) in self.sources.items())
+        ):
+            return self
+        return self.__class__(self.query, sources, mdl.num_rows)
+
+
+
+def derive(mdl, expr):
+    """
+    Returns a derived array computing `expr` over a model's columns.
+
+    @raise ValueError
+      The expression is invalid, refers to columns that don't exist or
+      aren't loaded, or can't be evaluated for any of the first rows.
+    """
+    query = Query(expr)
+    cols = get_cols(mdl, sorted(query.names))
+    for name, col in cols.items():
+        if isinstance(col.arr, Unloaded):
+            raise ValueError("column isn't loaded: {}".format(name))
+    # Check that the expression can be evaluated, on the first rows.
+    sel = slice(0, min(mdl.num_rows, CHECK_ROWS))
+    _evaluate(
+        query, { n: np.asarray(c.arr[sel]) for n, c in cols.items() },
+        sel.stop)
+
+    sources = { n: (c.id, c.arr) for n, c in cols.items() }
+    return DerivedArray(query, sources, mdl.num_rows)
+
+
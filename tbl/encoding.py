@@ -0,0 +1,246 @@
+"""
+Compact encodings of object columns.
+
+A dictionary-encoded column stores a small integer code per row, indexing a
+table of its distinct values; this suits columns with few distinct values.  A
+run-length encoded column stores each run of equal consecutive values once,
+with the row at which the run ends; this suits sorted or repetitive columns.
+
+Encoded columns are lazy arrays, so rows are decoded only as they're read.
+Deleting or inserting a row, or taking a subset of rows, returns a new encoded
+array, without decoding the column.
+"""
+
+#-------------------------------------------------------------------------------
+
+import numpy as np
+
+from   .lazy import LazyArray
+
+__all__ = (
+    "EncodedArray",
+    "DictArray",
+    "RLEArray",
+    "encode",
+    "encode_cols",
+)
+
+#-------------------------------------------------------------------------------
+
+# Dictionary-encode a column if it has at most this fraction of distinct values.
+MAX_DICT_RATIO = 0.25
+
+# Run-length encode a column if it has at most this fraction of runs.
+MAX_RUN_RATIO = 0.05
+
+def _objects(vals):
+    arr = np.empty(len(vals), dtype=object)
+    arr[:] = vals
+    return arr
+
+
+def _code_dtype(num_values):
+    """
+    Returns the smallest int dtype for codes into `num_values` values.
+    """
+    for dtype in (np.int8, np.int16, np.int32):
+        if num_values <= np.iinfo(dtype).max + 1:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+
+class EncodedArray(LazyArray):
+    """
+    Base class for encoded object columns.
+    """
+
+    dtype = np.dtype(object)
+    in_memory = True
+
+    def delete(self, i):
+        """
+        Returns a copy with row `i` deleted.
+        """
+        raise NotImplementedError("delete")
+
+
+    def insert(self, i, val):
+        """
+        Returns a copy with `val` inserted at row `i`.
+        """
+        raise NotImplementedError("insert")
+
+
+    def take(self, idx):
+        """
+        Returns a copy with the rows at indices `idx`, in order.
+        """
+        raise NotImplementedError("take")
+
+
+
+class DictArray(EncodedArray):
+    """
+    Dictionary-encoded column: codes indexing an array of distinct values.
+
+    Negative codes index values from the end, as for a pandas categorical's
+    missing values, whose code is -1.
+    """
+
+    def __init__(self, codes, values):
+        self.codes  = codes
+        self.values = values
+
+
+    def __len__(self):
+        return len(self.codes)
+
+
+    def _get_range(self, start, stop):
+        return self.values[self.codes[start : stop]]
+
+
+    def _take(self, idx):
+        return self.values[self.codes[idx]]
+
+
+    def delete(self, i):
+        return self.__class__(np.delete(self.codes, i), self.values)
+
+
+    def insert(self, i, val):
+        values = self.values
+        try:
+            code, = np.flatnonzero(values == val)[: 1]
+        except ValueError:
+            # A new value.
+            code = len(values)
+            values = np.append(values, _objects([val]))
+        codes = self.codes.astype(_code_dtype(len(values)), copy=False)
+        if len(values) > len(self.values) and (codes < 0).any():
+            # Appending a value moves the end, so make negative codes
+            # explicit.
+            codes = np.where(codes < 0, codes + len(self.values), codes)
+        return self.__class__(np.insert(codes, i, code), values)
+
+
+    def take(self, idx):
+        return self.__class__(self.codes[idx], self.values)
+
+
+
+class RLEArray(EncodedArray):
+    """
+    Run-length encoded column: run values, and the row at which each ends.
+    """
+
+    def __init__(self, ends, values):
+        # Drop empty runs, and merge adjacent runs with equal values.
+        keep = np.diff(ends, prepend=0) > 0
+        ends, values = ends[keep], values[keep]
+        last = np.append(values[: -1] != values[1 :], True).astype(bool)
+        self.ends   = ends[last]
+        self.values = values[last]
+
+
+    def __len__(self):
+        return int(self.ends[-1]) if len(self.ends) > 0 else 0
+
+
+    def _get_range(self, start, stop):
+        if stop <= start:
+            return np.empty(0, dtype=object)
+        r0 = np.searchsorted(self.ends, start, side="right")
+        r1 = np.searchsorted(self.ends, stop - 1, side="right") + 1
+        ends = np.minimum(self.ends[r0 : r1], stop)
+        counts = np.diff(ends, prepend=start)
+        return np.repeat(self.values[r0 : r1], counts)
+
+
+    def _take(self, idx):
+        return self.values[np.searchsorted(self.ends, idx, side="right")]
+
+
+    def delete(self, i):
+        r = np.searchsorted(self.ends, i, side="right")
+        ends = self.ends.copy()
+        ends[r :] -= 1
+        return self.__class__(ends, self.values)
+
+
+    def insert(self, i, val):
+        # Split the run containing row `i`, and insert a run for `val`.
+        r = np.searchsorted(self.ends, i, side="right")
+        ends = np.concatenate([self.ends[: r], [i, i + 1], self.ends[r :] + 1])
+        split = self.values[r] if r < len(self.values) else val
+        values = np.concatenate(
+            [self.values[: r], _objects([split, val]), self.values[r :]])
+        return self.__class__(ends, values)
+
+
+    def take(self, idx):
+        if len(idx) == 0:
+            return self.__class__(self.ends[: 0], self.values[: 0])
+        # Runs of the rows taken, and where these change.
+        runs = np.searchsorted(self.ends, idx, side="right")
+        ends = np.append(np.flatnonzero(runs[1 :] != runs[: -1]) + 1, len(idx))
+        return self.__class__(ends, self.values[runs[ends - 1]])
+
+
+
+#-------------------------------------------------------------------------------
+
+def _factorize(arr, max_values):
+    """
+    Returns codes and distinct values of `arr`, or `None` if there are more
+    than `max_values` distinct values.
+    """
+    # Collect distinct values a block at a time, so that a column with too
+    # many stops early.  dict.fromkeys() and map() loop over rows in C.
+    index = {}
+    try:
+        for start in range(0, len(arr), 65536):
+            index.update(dict.fromkeys(arr[start : start + 65536]))
+            if len(index) > max_values:
+                return None
+    except TypeError:
+        # Unhashable.
+        return None
+    values = _objects(list(index))
+    index = { v: i for i, v in enumerate(values) }
+    codes = np.fromiter(
+        map(index.__getitem__, arr), dtype=_code_dtype(len(index)),
+        count=len(arr))
+    return codes, values
+
+
+def encode(arr):
+    """
+    Encodes an object array compactly, if it has few runs or distinct values.
+
+    @return
+      An encoded array, or `arr` itself if it's not worth encoding.
+    """
+    if not (isinstance(arr, np.ndarray) and arr.dtype.kind == "O"):
+        return arr
+    if len(arr) < 2:
+        return arr
+
+    # Run-length encoding is cheaper to compute, so try it first.
+    starts = np.flatnonzero(arr[1 :] != arr[: -1]).astype(np.int64) + 1
+    if len(starts) + 1 <= MAX_RUN_RATIO * len(arr):
+        ends = np.append(starts, len(arr))
+        return RLEArray(ends, arr[ends - 1])
+
+    res = _factorize(arr, int(MAX_DICT_RATIO * len(arr)))
+    return arr if res is None else DictArray(*res)
+
+
+def encode_cols(mdl):
+    """
+    Encodes the model's object columns, where worthwhile.
+    """
+    for col in mdl.cols:
+        col.arr = encode(col.arr)
+
+
@@ -0,0 +1,161 @@
+"""
+Following growing CSV files and pipes.
+
+Like `tail -f`, a followed source is read incrementally: rows are appended to
+the model as they arrive, and data already read is never read again.  A pipe
+is followed until its writer closes it; a regular file is followed until the
+job is cancelled, with the `stop-following` command.  The model is loading
+while it's followed, so it can't be edited until then.
+"""
+
+#-------------------------------------------------------------------------------
+
+import csv
+import io
+import numpy as np
+import os
+import select
+import stat
+import time
+
+from   . import jobs, model, parse
+from   .commands import command, CmdError, CmdResult
+from   .model import Model
+
+__all__ = (
+    "load_following",
+)
+
+#-------------------------------------------------------------------------------
+
+def _complete_end(buf, quoted=True):
+    """
+    Returns the length of the complete rows at the start of `buf`.
+
+    `buf` must start at a row boundary.
+    """
+    arr = np.frombuffer(buf, dtype=np.uint8)
+    nl = np.flatnonzero(arr == 10)
+    if quoted:
+        # Skip newlines inside quoted fields.
+        qs = np.flatnonzero(arr == 34)
+        nl = nl[np.searchsorted(qs, nl) % 2 == 0]
+    return int(nl[-1]) + 1 if len(nl) > 0 else 0
+
+
+class RowReader:
+    """
+    Reads complete rows from a file descriptor, as they become available.
+    """
+
+    def __init__(self, fd, *, quoted=True, encoding="utf-8"):
+        self.fd         = fd
+        self.quoted     = quoted
+        self.encoding   = encoding
+        # Regular files may grow after EOF; pipes can't.
+        self.regular    = stat.S_ISREG(os.fstat(fd).st_mode)
+        self.eof        = False
+        self.__pending  = b""
+
+
+    def read(self, timeout):
+        """
+        Returns text of complete rows available within `timeout` seconds.
+
+        Returns an empty string if there are none.  At the end of a pipe,
+        returns any final partial row, and sets `eof`.
+        """
+        if self.eof:
+            return ""
+        if not self.regular:
+            ready, _, _ = select.select([self.fd], [], [], timeout)
+            if len(ready) == 0:
+                return ""
+
+        data = os.read(self.fd, 1 << 20)
+        if len(data) == 0:
+            if self.regular:
+                # Wait for the file to grow.
+                time.sleep(timeout)
+                return ""
+            else:
+                self.eof = True
+                data, self.__pending = self.__pending, b""
+                return data.decode(self.encoding)
+
+        buf = self.__pending + data
+        end = _complete_end(buf, self.quoted)
+        self.__pending = buf[end :]
+        return buf[: end].decode(self.encoding)
+
+
+    def close(self):
+        os.close(self.fd)
+
+
+
+def _to_batch(rows, num_cols):
+    return next(
+        parse.iter_batches(iter(rows), num_cols, first=len(rows)),
+        [ () for _ in range(num_cols) ])
+
+
+def load_following(fd, name, *, quoted=True, interval=0.25):
+    """
+    Loads CSV data from a file descriptor, and follows it for more rows.
+
+    Blocks until the header is available.  Rows are appended in a background
+    job, stored as `mdl.loader`, which runs until the end of a pipe, or until
+    cancelled.  Takes ownership of `fd`.
+    """
+    reader = RowReader(fd, quoted=quoted)
+    text = ""
+    while text == "" and not reader.eof:
+        text = reader.read(interval)
+    rows = list(csv.reader(io.StringIO(text)))
+    names = rows.pop(0) if len(rows) > 0 else []
+    convert = parse.BatchConverter(len(names))
+
+    mdl = Model()
+    for name_, arr in zip(names, convert(_to_batch(rows, len(names)))):
+        mdl.add_col(arr, name_)
+    if mdl.num_rows is None:
+        mdl.num_rows = 0
+
+    def follow(job):
+        try:
+            while not (job.cancelled or reader.eof):
+                job.status = "following {:,} rows".format(mdl.num_rows)
+                text = reader.read(interval)
+                rows = list(csv.reader(io.StringIO(text)))
+                if len(rows) > 0:
+                    batch = _to_batch(rows, len(names))
+                    model.append_rows(mdl, convert(batch))
+                    model.enforce_budget(mdl)
+        finally:
+            reader.close()
+        job.msg = "loaded {:,} rows: {}".format(mdl.num_rows, name)
+
+    mdl.loader = jobs.start("follow {}".format(name), follow)
+    return mdl
+
+
+#-------------------------------------------------------------------------------
+# Commands
+
+@command()
+def stop_following(mdl):
+    """
+    Stops following the table's source for more rows.
+    """
+    job = mdl.loader
+    if job is None or job.done or not job.name.startswith("follow "):
+        raise CmdError("not following")
+    job.cancel()
+    try:
+        job.wait()
+    except Exception as exc:
+        raise CmdError("following failed: {}".format(exc))
+    return CmdResult(msg=job.msg)
+
+
@@ -1,12 +1,77 @@
-from   fixfmt.npfmt import choose_formatter
+from   fixfmt import Number, String
+from   fixfmt import npfmt
+import numpy as np
 
 from   .commands import command
 
 #-------------------------------------------------------------------------------
 
+# Number of rows sampled to choose a formatter.
+SAMPLE_SIZE = 4096
+
+# Number of evenly spaced runs of rows in a sample.
+SAMPLE_BLOCKS = 16
+
+def sample(arr, size=SAMPLE_SIZE, blocks=SAMPLE_BLOCKS):
+    """
+    Returns a bounded sample of the values in `arr`.
+
+    The sample is stratified: it consists of runs of consecutive rows, evenly
+    spaced from the start to the end, so that lazy columns read only a few
+    pages, and values that vary through the column are represented.
+    """
+    num = len(arr)
+    if num <= size:
+        return np.asarray(arr[:])
+    run = size // blocks
+    starts = np.linspace(0, num - run, blocks).astype(int)
+    return np.concatenate([ arr[s : s + run] for s in starts ])
+
+
+def choose_formatter(arr):
+    """
+    Chooses a formatter for a column from a sample of its values.
+
+    Values outside the sample may not fit; see `widen()`.
+    """
+    return npfmt.choose_formatter(sample(arr))
+
+
+def widen(fmt, arr):
+    """
+    Returns a formatter that fits `arr` as well as `fmt`.
+
+    Grows the size, precision, or sign of `fmt` in place, if values in `arr`
+    need it.  If `fmt` is the wrong type, for instance because a lazy
+    column's dtype has since widened, returns a new formatter.
+    """
+    new = npfmt.choose_formatter(np.asarray(arr))
+    if isinstance(fmt, Number) and isinstance(new, Number):
+        fmt.size = max(fmt.size, new.size)
+        if new.precision is not None:
+            fmt.precision = max(
+                -1 if fmt.precision is None else fmt.precision, new.precision)
+        if new.sign == "-":
+            fmt.sign = "-"
+        return fmt
+    elif isinstance(fmt, String) and isinstance(new, String):
+        fmt.size = max(fmt.size, new.size)
+        return fmt
+    elif type(fmt) is type(new):
+        return fmt
+    else:
+        return new
+
+
+#-------------------------------------------------------------------------------
+# Commands
+
 @command()
 def decrease_column_width(vw):
-    fmt = vw.cols[vw.cur.c].fmt
+    col = vw.cols[vw.cur.c]
+    # Don't undo the change when rendering.
+    col.widen = False
+    fmt = col.fmt
     try:
         if fmt.size > 1:
             fmt.size -= 1
@@ -16,7 +81,10 @@ def decrease_column_width(vw):
 
 @command()
 def increase_column_width(vw):
-    fmt = vw.cols[vw.cur.c].fmt
+    col = vw.cols[vw.cur.c]
+    # Don't undo the change when rendering.
+    col.widen = False
+    fmt = col.fmt
     try:
         fmt.size += 1
     except AttributeError:
@@ -25,7 +93,10 @@ def increase_column_width(vw):
 
 @command()
 def decrease_column_precision(vw):
-    fmt = vw.cols[vw.cur.c].fmt
+    col = vw.cols[vw.cur.c]
+    # Don't undo the change when rendering.
+    col.widen = False
+    fmt = col.fmt
     try:
         if fmt.precision is None:
             pass
@@ -39,7 +110,10 @@ def decrease_column_precision(vw):
 
 @command()
 def increase_column_precision(vw):
-    fmt = vw.cols[vw.cur.c].fmt
+    col = vw.cols[vw.cur.c]
+    # Don't undo the change when rendering.
+    col.widen = False
+    fmt = col.fmt
     try:
         if fmt.precision is None:
             fmt.precision = 0
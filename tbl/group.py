@@ -0,0 +1,201 @@
+"""
+Group-by aggregation, as a derived table.
+
+Grouping factorizes each key column into dense codes, from its cached sort
+ranks, and combines the codes of multiple keys into a single group code per
+row.  Aggregates are computed with `np.bincount` and `ufunc.reduceat` over
+rows sorted by group code, without a Python-level loop over rows or groups.
+
+The result is a new model with one row per group, in ascending key order with
+null keys last, with the key columns, a `count` column, and the sum, mean,
+min, and max of each numeric column.  Nulls are excluded from aggregates; a
+group with no non-null values has a NaN mean, min, and max.
+"""
+
+#-------------------------------------------------------------------------------
+
+import numpy as np
+
+from   . import view
+from   .commands import command, CmdError, CmdResult
+from   .lazy import Unloaded
+from   .model import Model
+from   .sort import get_ranks
+from   .stats import get_nulls
+
+__all__ = (
+    "factorize",
+    "group",
+)
+
+#-------------------------------------------------------------------------------
+
+def _compact(codes):
+    """
+    Renumbers codes densely, preserving their order.
+    """
+    top = int(codes.max()) + 1 if len(codes) > 0 else 0
+    if top <= 2 * len(codes):
+        # Few enough possible codes to renumber with a lookup table.
+        used = np.bincount(codes, minlength=top) > 0
+        return (np.cumsum(used) - 1)[codes]
+    else:
+        _, codes = np.unique(codes, return_inverse=True)
+        return codes.reshape(-1)
+
+
+def factorize(arrs, rows=None):
+    """
+    Assigns a group code to each row, by the combined values of `arrs`.
+
+    @param rows
+      Index array of rows to group, or `None` for all.
+    @return
+      The group code of each row.  Codes are dense, and in ascending key
+      order, with nulls last.
+    @raise ValueError
+      A column's values can't be ranked.
+    """
+    codes = None
+    for arr in arrs:
+        ranks, null_rank = get_ranks(arr)
+        if rows is not None:
+            ranks = ranks[rows]
+        codes = ranks if codes is None else codes * (null_rank + 1) + ranks
+        # Compact the codes after each key, so that they can't overflow.
+        codes = _compact(codes)
+    return codes
+
+
+def _reduce(ufunc, vals, starts, present, num_groups):
+    """
+    Reduces sorted values per group, with NaN for groups with no values.
+    """
+    res = ufunc.reduceat(vals, starts) if len(vals) > 0 else vals[: 0]
+    if len(present) == num_groups:
+        return res
+    out = np.full(num_groups, np.nan)
+    out[present] = res
+    return out
+
+
+def _aggregate(arr, order, scodes, num_groups):
+    """
+    Returns aggregates of a numeric column's values by group.
+
+    @param order
+      Rows sorted by group.
+    @param scodes
+      The group codes of `order`.
+    """
+    vals = np.asarray(arr[order])
+    if vals.dtype.kind == "b":
+        vals = vals.astype(np.int64)
+    valid = ~get_nulls(vals)
+    if not valid.all():
+        vals, scodes = vals[valid], scodes[valid]
+
+    count = np.bincount(scodes, minlength=num_groups)
+    starts = np.flatnonzero(np.diff(scodes, prepend=-1) != 0)
+    present = scodes[starts]
+    sum = np.zeros(num_groups, dtype=np.add.reduce(vals[: 0]).dtype)
+    if len(vals) > 0:
+        sum[present] = np.add.reduceat(vals, starts)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = sum / count
+    return {
+        "sum"   : sum,
+        "mean"  : mean,
+        "min"   : _reduce(np.minimum, vals, starts, present, num_groups),
+        "max"   : _reduce(np.maximum, vals, starts, present, num_groups),
+    }
+
+
+def group(mdl, key_ids, col_ids, rows=None):
+    """
+    Groups a model's rows by key columns, and aggregates other columns.
+
+    @param key_ids
+      IDs of the columns to group by.
+    @param col_ids
+      IDs of columns to aggregate.  Columns that aren't numeric or aren't
+      loaded are skipped, as are key columns.
+    @param rows
+      Index array of model rows to group, or `None` for all.
+    @return
+      A new model with a row per group.
+    @raise ValueError
+      A key column can't be grouped.
+    """
+    keys = [ mdl.get_col(i) for i in key_ids ]
+    for col in keys:
+        if isinstance(col.arr, Unloaded):
+            raise ValueError("column isn't loaded: {}".format(col.name))
+    codes = factorize([ c.arr for c in keys ], rows)
+
+    # Sort rows by group, once, for all aggregates.
+    order = np.argsort(codes, kind="stable")
+    scodes = codes[order]
+    if rows is not None:
+        order = rows[order]
+    starts = np.flatnonzero(np.diff(scodes, prepend=-1) != 0)
+    num_groups = len(starts)
+
+    grouped = Model()
+    for col in keys:
+        # Take key values from the first row of each group.
+        grouped.add_col(col.arr[order[starts]], col.name)
+    grouped.add_col(np.diff(np.append(starts, len(scodes))), "count")
+    for col in ( mdl.get_col(i) for i in col_ids ):
+        if (
+                col.id in key_ids
+                or isinstance(col.arr, Unloaded)
+                or col.arr.dtype.kind not in "biuf"
+        ):
+            continue
+        aggs = _aggregate(col.arr, order, scodes, num_groups)
+        for name, arr in aggs.items():
+            grouped.add_col(arr, "{} {}".format(col.name, name))
+
+    return grouped
+
+
+#-------------------------------------------------------------------------------
+# Commands
+
+@command()
+def group_by(vw, mdl, names):
+    """
+    Opens a table of the displayed rows grouped by columns.
+
+    @param names
+      Comma-separated names of the columns to group by; if empty, the current
+      column.
+    """
+    if mdl.loading:
+        raise CmdError("table is still loading")
+    names = [ n.strip() for n in names.split(",") if n.strip() != "" ]
+    if len(names) == 0:
+        key_ids = [vw.cols[vw.cur.c].col_id]
+    else:
+        key_ids = []
+        for name in names:
+            try:
+                col, = ( c for c in mdl.cols if c.name == name )
+            except ValueError:
+                raise CmdError("no column: {}".format(name))
+            key_ids.append(col.id)
+
+    # Aggregate the displayed columns, in display order.
+    col_ids = [ c.col_id for c in vw.cols if c.visible ]
+    try:
+        grouped = group(mdl, key_ids, col_ids, vw.rows)
+    except ValueError as exc:
+        raise CmdError("can't group: {}".format(exc))
+
+    return CmdResult(
+        msg="{} groups".format(grouped.num_rows),
+        table=(grouped, view.build_view(grouped)),
+    )
+
+
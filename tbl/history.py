@@ -0,0 +1,192 @@
+"""
+Undo and redo history, as model versions.
+
+Before each edit, the controller takes a snapshot of the model, which is
+cheap: edits replace column arrays rather than modifying them, and chunked
+columns share unchanged chunks between versions.  Undo restores the snapshot;
+redo restores the version that was undone.
+
+Old versions keep replaced arrays and chunks alive.  The history estimates
+the memory each version retains, and forgets the oldest versions when the
+total exceeds its budget.
+"""
+
+#-------------------------------------------------------------------------------
+
+import numpy as np
+
+from   . import model
+from   .chunked import ChunkedArray
+from   .encoding import DictArray, RLEArray
+
+__all__ = (
+    "History",
+)
+
+#-------------------------------------------------------------------------------
+
+# Default memory budget for history, in bytes.
+DEFAULT_BUDGET = 256 << 20
+
+def _get_arrays(arr):
+    """
+    Returns the numpy arrays that hold a column's data.
+    """
+    if isinstance(arr, np.ndarray):
+        return [arr]
+    elif isinstance(arr, ChunkedArray):
+        return [ a for c in arr.chunks for a in _get_arrays(c[0]) ]
+    elif isinstance(arr, DictArray):
+        return [arr.codes, arr.values]
+    elif isinstance(arr, RLEArray):
+        return [arr.ends, arr.values]
+    else:
+        # Lazy arrays hold little data themselves.
+        return []
+
+
+def _get_retained(old, new):
+    """
+    Returns the bytes of arrays in model `old` that aren't in model `new`.
+    """
+    old_ids = { id(c.arr) for c in old.cols }
+    new_ids = { id(c.arr) for c in new.cols }
+    # Arrays of columns that were replaced...
+    arrs = {
+        id(a): a
+        for c in old.cols if id(c.arr) not in new_ids
+        for a in _get_arrays(c.arr)
+    }
+    # ... except those shared by their replacements, such as unchanged chunks.
+    for col in new.cols:
+        if id(col.arr) not in old_ids:
+            for a in _get_arrays(col.arr):
+                arrs.pop(id(a), None)
+    return sum( a.nbytes for a in arrs.values() )
+
+
+def _get_ops_size(ops):
+    """
+    Returns the bytes of arrays in journal ops' args, such as deleted values.
+    """
+    def size(val):
+        if isinstance(val, np.ndarray):
+            return val.nbytes
+        elif isinstance(val, (list, tuple)):
+            return sum( size(v) for v in val )
+        else:
+            return 0
+
+    return sum( size(v) for _, args in ops for v in args.values() )
+
+
+class History:
+
+    class Version:
+
+        def __init__(self, snap, name, ops, inverse):
+            self.snap       = snap
+            self.name       = name
+            # Journal ops to redo and undo the edit.
+            self.ops        = ops
+            self.inverse    = inverse
+            # Bytes held by the ops themselves.
+            self.ops_size   = _get_ops_size(ops) + _get_ops_size(inverse)
+            # Estimated bytes retained only by this version.
+            self.size       = 0
+
+
+
+    def __init__(self, budget=DEFAULT_BUDGET):
+        """
+        @param budget
+          Memory budget for old versions, in bytes.
+        """
+        self.budget = budget
+        self.undo   = []
+        self.redo   = []
+
+
+    @property
+    def size(self):
+        return sum( v.size for v in self.undo + self.redo )
+
+
+    def push(self, snap, mdl, name, ops=(), inverse=()):
+        """
+        Records an edit.
+
+        @param snap
+          A snapshot of the model before the edit.
+        @param mdl
+          The model after the edit.
+        @param ops
+          Journal ops, `(op, args)` pairs, that perform the edit.
+        @param inverse
+          Journal ops that undo the edit.
+        """
+        version = self.Version(snap, name, ops, inverse)
+        version.size = _get_retained(snap, mdl) + version.ops_size
+        self.undo.append(version)
+        self.redo.clear()
+
+        # Forget the oldest versions, if over budget.  Always keep the latest.
+        size = self.size
+        while size > self.budget and len(self.undo) > 1:
+            size -= self.undo.pop(0).size
+
+
+    def __restore(self, mdl, src, dst):
+        version = src.pop()
+        snap = model.snapshot(mdl)
+        model.restore(mdl, version.snap)
+        version.snap = snap
+        version.size = _get_retained(snap, mdl) + version.ops_size
+        dst.append(version)
+        return version
+
+
+    def replace_arrays(self, replaced):
+        """
+        Replaces column arrays in old versions with equivalent arrays, so
+        that the old arrays can be freed.
+
+        The replaced arrays are in the current model too, so they don't
+        count toward the size of any version.
+
+        @param replaced
+          `(old, new)` pairs of arrays.
+        """
+        new = { id(o): n for o, n in replaced }
+        if len(new) == 0:
+            return
+        for version in self.undo + self.redo:
+            for col in version.snap.cols:
+                col.arr = new.get(id(col.arr), col.arr)
+
+
+    def undo_edit(self, mdl):
+        """
+        Restores the model to its version before the last edit.
+
+        @return
+          The version undone.
+        @raise IndexError
+          Nothing to undo.
+        """
+        return self.__restore(mdl, self.undo, self.redo)
+
+
+    def redo_edit(self, mdl):
+        """
+        Restores the model to its version after the last undone edit.
+
+        @return
+          The version redone.
+        @raise IndexError
+          Nothing to redo.
+        """
+        return self.__restore(mdl, self.redo, self.undo)
+
+
+
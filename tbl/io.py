@@ -1,9 +1,23 @@
 import csv
+from   io import TextIOWrapper
+import numpy as np
+import os
 from   pathlib import Path
-import sys
 
+from   . import jobs, model, parse
+from   .cache import get_meta, load_cached, save_cached
 from   .commands import command, CmdResult, CmdError
+from   .follow import load_following
+from   . import journal as journal_
+from   .journal import Journal
+from   .encoding import EncodedArray, encode, encode_cols
+from   .compress import SUFFIXES, get_compression, open_read, open_write
+from   .lazy import LazyArray, Unloaded
+from   .lib.fs import atomic_write
+from   .mmap_csv import MappedCSV, MappedCSVColumn
 from   .model import Model
+from   .parallel_csv import parse_parallel
+from   .sqlite import SQLiteColumn, SQLiteTable, get_table_names
 
 #-------------------------------------------------------------------------------
 
@@ -27,21 +41,48 @@ class Source:
         User-visible representation of the source.
         """
 
+    # The path of the file the source reads, if any; used for caching.
+    path = None
+
+    # True if the source supports `dump()`.
+    writable = True
+
     @classmethod
-    def parse(Class, source_str):
+    def parse(Class, source_str, **options):
         """
         Parses a source from the source string.
+
+        @param options
+          Source-specific options.
         """
 
     def load(self) -> Model:
         """
         Reads a model.
+
+        The source may return the model before it is completely read, and
+        continue appending rows in a background job, stored as `mdl.loader`.
+
+        Some columns may be left unloaded, as `Unloaded` placeholders.
+        """
+
+    def load_columns(self, indices):
         """
+        Reads the columns at `indices`, which were left unloaded.
 
-    def dump(self, mdl: Model):
+        @return
+          An array for each column.
+        """
+
+    def dump(self, mdl: Model, job=None):
         """
         Writes a model.
 
+        May be called in a background job, with a snapshot of the model.
+
+        @param job
+          If not `None`, the job to which to report progress.  If the job is
+          cancelled, the dump stops and the original data is left intact.
         :raise NotImplemented:
         """
         
@@ -49,48 +90,359 @@ class Source:
 
 class CSVSource(Source):
 
-    def __init__(self, path):
+    def __init__(self, path, *, mmap=False, workers=None, quoted=True,
+                 follow=False, columns=None):
+        """
+        @param mmap
+          If true, memory-map the file and parse rows only as they're read,
+          rather than loading it.
+        @param workers
+          If not `None`, parse the file in parallel with this many processes;
+          0 for the number of CPUs.
+        @param quoted
+          If true, allow quoted fields to contain newlines.  Otherwise, rows
+          can be split faster.
+        @param follow
+          If true, keep reading rows as they are appended to the file or
+          written to the pipe.
+        @param columns
+          If not `None`, names of the columns to load, as a sequence or a
+          comma-separated string.  Other columns are left unloaded, and may
+          be loaded later.
+        """
         self.__path = "-" if path == "-" else Path(path)
+        self.__mmap = bool(mmap)
+        self.__workers = workers
+        self.__quoted = bool(quoted)
+        self.__follow = bool(follow)
+        self.__compression = (
+            None if self.__path == "-" else get_compression(self.__path))
+        if self.__compression is not None and self.__mmap:
+            raise ValueError("can't memory-map compressed file")
+        if self.__follow and (self.__compression is not None or self.__mmap):
+            raise ValueError("can't follow compressed or memory-mapped file")
+        if isinstance(columns, str):
+            columns = columns.split(",")
+        self.__columns = None if columns is None else list(columns)
+        if self.__columns is not None:
+            if len(self.__columns) == 0:
+                raise ValueError("no columns to load")
+            if self.__path == "-" or self.__mmap or self.__follow:
+                raise ValueError(
+                    "can't select columns from stdin, or memory-mapped or "
+                    "followed file")
 
 
     def __str__(self):
         return str(self.__path)
 
 
-    @classmethod
-    def parse(Class, source_str):
-        return Class(source_str)
+    @property
+    def path(self):
+        """
+        The file path, or `None` for stdin.
+        """
+        return None if self.__path == "-" else self.__path
 
 
-    def load(self):
-        # FIXME: For now, use pandas to load and convert CSV files.
-        import pandas as pd
-        df = pd.read_csv(sys.stdin if self.__path == "-" else self.__path)
-        return Model(cols={ n: df[n] for n in df.columns })
+    @property
+    def writable(self):
+        # Can't save to stdin.
+        return self.__path != "-"
 
 
-    def dump(self, mdl):
-        with open(self.__path, "w") as file:
+    @classmethod
+    def parse(Class, source_str, **options):
+        return Class(source_str, **options)
+
+
+    def load(self):
+        if self.__mmap:
+            if self.__path == "-":
+                raise ValueError("can't memory-map stdin")
+            return load_mapped_csv(self.__path)
+
+        if self.__follow:
+            # As below, use a duplicate of stdin.
+            fd = (
+                os.dup(0) if self.__path == "-"
+                else os.open(self.__path, os.O_RDONLY)
+            )
+            return load_following(fd, str(self), quoted=self.__quoted)
+
+        if self.__compression is not None:
+            return load_csv(self.__open(), str(self), columns=self.__columns)
+
+        if self.__workers is not None and self.__path != "-":
+            return load_csv_parallel(
+                self.__path, self.__workers or None, quoted=self.__quoted,
+                columns=self.__columns)
+
+        if self.__path == "-":
+            # Use a duplicate of stdin, since the screen later replaces fd 0
+            # with the TTY, while we may still be loading.
+            file = os.fdopen(os.dup(0), newline="")
+        else:
+            file = self.__path.open(newline="")
+        return load_csv(file, str(self), columns=self.__columns)
+
+
+    def __open(self):
+        # Stream decompressed data.  For multi-member gzip, workers are used
+        # to decompress members in parallel.
+        return TextIOWrapper(
+            open_read(self.__path, self.__workers or None),
+            encoding="utf-8", newline="")
+
+
+    def load_columns(self, indices):
+        if self.__workers is not None and self.__compression is None:
+            _, arrs = parse_parallel(
+                self.__path, self.__workers or None, quoted=self.__quoted,
+                cols=indices)
+            return arrs
+
+        with self.__open() as file:
+            rows, names = parse.reader(file)
+            convert = parse.BatchConverter(len(indices))
+            parts = [ [] for _ in indices ]
+            for batch in parse.iter_batches(rows, len(names), cols=indices):
+                for part, arr in zip(parts, convert(batch)):
+                    part.append(arr)
+        return [
+            parse.concat(p) if len(p) > 0 else np.empty(0, dtype=np.int64)
+            for p in parts
+        ]
+
+
+    def dump(self, mdl, job=None):
+        if self.__path == "-":
+            raise ValueError("can't save to stdin")
+
+        with atomic_write(self.__path, "wb") as raw, \
+             open_write(raw, self.__compression) as cfile:
+            file = TextIOWrapper(cfile, encoding="utf-8", newline="")
             writer = csv.writer(file)
             # Write header.
             header = [ col.name for col in mdl.cols ]
             writer.writerow(header)
-            # Write rows.
-            for row_num in range(mdl.num_rows):
-                row = [ str(c.arr[row_num]) for c in mdl.cols ]
-                writer.writerow(row)
+            # Write rows, formatting and writing a chunk at a time.
+            for start in range(0, mdl.num_rows, DUMP_CHUNK_SIZE):
+                if job is not None:
+                    if job.cancelled:
+                        raise RuntimeError("cancelled")
+                    job.status = "saving {:.0%}".format(start / mdl.num_rows)
+                stop = min(start + DUMP_CHUNK_SIZE, mdl.num_rows)
+                cols = [ format_col(c.arr[start : stop]) for c in mdl.cols ]
+                writer.writerows(zip(*cols))
+            # Flush, but leave closing to the enclosing contexts.
+            file.detach()
 
 
 
 Source.TYPES["csv"] = CSVSource
 Source.FILE_SUFFIXES[".csv"] = CSVSource
+for suffix in SUFFIXES:
+    Source.FILE_SUFFIXES[".csv" + suffix] = CSVSource
+
+
+# Number of rows formatted and written together.
+DUMP_CHUNK_SIZE = 65536
+
+def format_col(arr):
+    """
+    Formats an array of values to a list of CSV field strings.
+
+    NaN and `None` are formatted as empty fields.
+    """
+    arr = np.asarray(arr)
+    res = arr.astype(str)
+    if arr.dtype.kind == "f":
+        res[np.isnan(arr)] = ""
+    elif arr.dtype.kind == "O":
+        res[arr == None] = ""
+    return res.tolist()
+
+
+def _get_indices(names, columns):
+    """
+    Returns the indices of `columns` in `names`, or `None` for all.
+    """
+    if columns is None:
+        return None
+    try:
+        return [ names.index(c) for c in columns ]
+    except ValueError:
+        missing = [ c for c in columns if c not in names ]
+        raise LookupError("no columns: {}".format(", ".join(missing)))
+
+
+def _make_model(names, cols, arrs):
+    """
+    Builds a model with `arrs` for columns at indices `cols`.
+
+    Other columns are left unloaded.
+
+    @return
+      The model, and its cols for `arrs`.
+    """
+    mdl = Model()
+    mdl.num_rows = len(arrs[0]) if len(arrs) > 0 else 0
+    cols = range(len(names)) if cols is None else cols
+    arrs = dict(zip(cols, arrs))
+    for i, name in enumerate(names):
+        mdl.add_col(arrs[i] if i in arrs else Unloaded(mdl, i), name)
+    return mdl, [ mdl.cols[c] for c in cols ]
+
+
+def load_csv(file, name, *, columns=None):
+    """
+    Loads CSV data from an open file, streaming in the background.
+
+    Parses the header and a first small batch of rows immediately, so that the
+    model is ready to show.  Parses the rest of the file in a background job,
+    appending rows to the model batch by batch.  Closes `file` when done.
+
+    @param columns
+      Names of columns to load, or `None` for all.
+    """
+    rows, names = parse.reader(file)
+    cols = _get_indices(names, columns)
+    width = len(names) if cols is None else len(cols)
+    batches = parse.iter_batches(rows, len(names), cols=cols)
+    convert = parse.BatchConverter(width)
+
+    first = next(batches, [ () for _ in range(width) ])
+    mdl, loaded = _make_model(names, cols, convert(first))
+
+    def load_rest(job):
+        with file:
+            for batch in batches:
+                if job.cancelled:
+                    break
+                arrs = { c.id: a for c, a in zip(loaded, convert(batch)) }
+                model.append_rows(mdl, [ arrs.get(c.id) for c in mdl.cols ])
+                # Spill columns as they outgrow the memory budget.
+                model.enforce_budget(mdl)
+                job.status = "loading {:,} rows\u2026".format(mdl.num_rows)
+        job.status = "encoding\u2026"
+        encode_cols(mdl)
+        model.enforce_budget(mdl)
+        job.msg = "loaded {:,} rows: {}".format(mdl.num_rows, name)
+
+    mdl.loader = jobs.start("load {}".format(name), load_rest)
+    return mdl
+
+
+def load_csv_parallel(path, workers, *, quoted=True, columns=None):
+    """
+    Loads a CSV file, parsing it in parallel in the background.
+
+    Parses the header and a first small batch of rows immediately, so that the
+    model is ready to show.  Replaces these with the full columns when the
+    parallel parse is done.
+
+    @param columns
+      Names of columns to load, or `None` for all.
+    """
+    with path.open(newline="") as file:
+        rows, names = parse.reader(file)
+        cols = _get_indices(names, columns)
+        width = len(names) if cols is None else len(cols)
+        first = next(
+            parse.iter_batches(rows, len(names), cols=cols),
+            [ () for _ in range(width) ])
+    mdl, loaded = _make_model(names, cols, parse.BatchConverter(width)(first))
+
+    def load_all(job):
+        job.status = "loading in parallel\u2026"
+        _, arrs = parse_parallel(path, workers, quoted=quoted, cols=cols)
+        # Set arrays first, so concurrent readers never see too many rows.
+        for col, arr in zip(loaded, arrs):
+            col.arr = encode(arr)
+        mdl.num_rows = len(arrs[0]) if len(arrs) > 0 else 0
+        job.msg = "loaded {:,} rows: {}".format(mdl.num_rows, path)
+
+    mdl.loader = jobs.start("load {}".format(path), load_all)
+    return mdl
+
+
+def load_mapped_csv(path):
+    """
+    Opens a CSV file as a model of memory-mapped columns.
+    """
+    table = MappedCSV(path)
+    mdl = Model()
+    for c, name in enumerate(table.names):
+        mdl.add_col(MappedCSVColumn(table, c), name)
+    if mdl.num_rows is None:
+        mdl.num_rows = 0
+    return mdl
 
 
 #-------------------------------------------------------------------------------
 
-def make_source(source_str):
+class SQLiteSource(Source):
+    """
+    A table in an SQLite database, read lazily a page at a time.
+
+    The source string is `PATH::TABLE`, or just `PATH` if the database has
+    only one table.
+    """
+
+    def __init__(self, path, table=None):
+        self.__path = Path(path)
+        if table is None:
+            names = get_table_names(self.__path)
+            if len(names) != 1:
+                raise ValueError(
+                    "specify one of tables: {}".format(" ".join(names)))
+            table, = names
+        self.__table = table
+
+
+    def __str__(self):
+        return "sqlite::{}::{}".format(self.__path, self.__table)
+
+
+    @classmethod
+    def parse(Class, source_str, **options):
+        path, _, table = source_str.rpartition("::")
+        return (
+            Class(path, table, **options) if path != ""
+            else Class(table, **options)
+        )
+
+
+    def load(self):
+        table = SQLiteTable(self.__path, self.__table)
+        mdl = Model()
+        for c, name in enumerate(table.names):
+            mdl.add_col(SQLiteColumn(table, c), name)
+        return mdl
+
+
+    writable = False
+
+    def dump(self, mdl, job=None):
+        raise NotImplementedError("can't save to SQLite")
+
+
+
+Source.TYPES["sqlite"] = SQLiteSource
+Source.FILE_SUFFIXES[".db"] = SQLiteSource
+Source.FILE_SUFFIXES[".sqlite"] = SQLiteSource
+Source.FILE_SUFFIXES[".sqlite3"] = SQLiteSource
+
+
+#-------------------------------------------------------------------------------
+
+def make_source(source_str, **options):
     """
     Constructs a source from a path string.
+
+    @param options
+      Source-specific options, passed to the source type.
     """
     if "::" in source_str:
         source_name, source_str = source_str.split("::", 1)
@@ -98,46 +450,210 @@ def make_source(source_str):
             Src = Source.TYPES[source_name]
         except KeyError:
             raise ValueError(f"unknown source type: {source_name}") from None
-        return Src.parse(source_str)
+        return Src.parse(source_str, **options)
 
     else:
-        # Assume it's a path, and take the path from the file suffix.
+        # Assume it's a path, and take the path from the file suffix.  Try
+        # compound suffixes, longest first, e.g. ".csv.gz" then ".gz".
         path = Path(source_str)
-        try:
-            Src = Source.FILE_SUFFIXES[path.suffix]
-        except KeyError:
+        suffixes = path.suffixes
+        for i in range(len(suffixes)):
+            try:
+                Src = Source.FILE_SUFFIXES["".join(suffixes[i :])]
+            except KeyError:
+                continue
+            else:
+                return Src(path, **options)
+        else:
             raise ValueError(
                 f"unknown source for suffix: {path.suffix}") from None
-        else:
-            return Src(path)
 
 
-def open(source_str):
+def open(source_str, *, cache=False, journal=False, **options):
     """
     Loads a model based on a source string.
+
+    @param cache
+      If true, load the model from the binary column cache, if the source
+      file has an up-to-date entry; otherwise, add an entry after loading,
+      unless its columns are read lazily.
+    @param journal
+      If true, open the source file's edit journal as `mdl.journal`, and
+      replay it on the model after loading.
     """
-    source = make_source(source_str)
-    mdl = source.load()
+    source = make_source(source_str, **options)
+    path = source.path
+
+    # Parallel parsing gives the same table, so don't key the cache on it.
+    cache_options = { n: v for n, v in options.items() if n != "workers" }
+    mdl = (
+        None if path is None or not cache
+        else load_cached(path, cache_options)
+    )
+    save_cache = cache and path is not None and mdl is None
+    if save_cache:
+        # The file as it is before loading, in case it changes while loading.
+        cache_meta = get_meta(path, cache_options)
+    if mdl is None:
+        mdl = source.load()
     mdl.source = source
+    if any( isinstance(c.arr, Unloaded) for c in mdl.cols ):
+        # Only whole tables are cached or journaled.
+        if journal:
+            raise ValueError("can't journal edits with unloaded columns")
+        save_cache = False
+    if any(
+            isinstance(c.arr, LazyArray)
+            and not isinstance(c.arr, EncodedArray)
+            for c in mdl.cols
+    ):
+        # Columns read lazily from the source, such as memory-mapped ones,
+        # would have to be read in full to cache them.
+        save_cache = False
+    mdl.journal = None if path is None or not journal else Journal(path)
+
+    if save_cache or (mdl.journal is not None and len(mdl.journal.entries) > 0):
+        loader = mdl.loader
+
+        def finish(job):
+            # Wait until the base data is completely loaded.
+            if loader is not None:
+                loader.wait()
+                job.msg = loader.msg
+            base = model.snapshot(mdl)
+            if mdl.journal is not None:
+                for entry in mdl.journal.entries:
+                    journal_.apply(mdl, entry)
+                if mdl.journal.num_unsaved > 0:
+                    job.msg = "recovered {} unsaved edits".format(
+                        mdl.journal.num_unsaved)
+            if save_cache:
+                # Cache the base data, not the edits.
+                jobs.start(
+                    "cache {}".format(source),
+                    lambda j: save_cached(path, base, cache_meta))
+
+        # The model is still loading until the journal is replayed.
+        mdl.loader = jobs.start("open {}".format(source), finish)
+
     return mdl
 
 
+def load_columns(mdl, col_ids):
+    """
+    Starts loading unloaded columns from the model's source, in the background.
+
+    Columns that are loaded, or already loading, are skipped.
+
+    @return
+      The job, or `None` if there are no columns to load.
+    """
+    cols = [
+        c for c in ( mdl.get_col(i) for i in col_ids )
+        if isinstance(c.arr, Unloaded) and not c.arr.loading
+    ]
+    if len(cols) == 0:
+        return None
+    for col in cols:
+        col.arr.loading = True
+    loader = mdl.loader
+    names = ", ".join( c.name for c in cols )
+
+    def load(job):
+        try:
+            # Wait for the loaded columns, so the row counts match.
+            if loader is not None:
+                loader.wait()
+            job.status = "loading {}\u2026".format(names)
+            arrs = mdl.source.load_columns([ c.arr.index for c in cols ])
+        except:
+            for col in cols:
+                col.arr.loading = False
+            raise
+        for col, arr in zip(cols, arrs):
+            col.arr = encode(arr)
+        job.msg = "loaded: {}".format(names)
+
+    return jobs.start("load {}".format(names), load)
+
+
 #-------------------------------------------------------------------------------
 # Commands
 
+def _dump(mdl, ctl, source):
+    """
+    Dumps a snapshot of the model to a source in the background.
+
+    Afterward, makes the source the model's source, and rebases the journal
+    onto it.  If the dump fails, the model's source is unchanged.
+    """
+    if source is None or not source.writable:
+        raise CmdError(f"can't save to: {source}")
+    if mdl.loading:
+        raise CmdError("table is still loading")
+    if any( isinstance(c.arr, Unloaded) for c in mdl.cols ):
+        raise CmdError("table has unloaded columns")
+    name = f"save {source}"
+    if any( j.name == name for j in jobs.running ):
+        raise CmdError(f"already saving: {source}")
+
+    # Dump a snapshot in the background, so the model may be edited meanwhile.
+    snap = model.snapshot(mdl)
+    journal = ctl.journal
+    offset = None if journal is None else journal.tell()
+
+    def dump(job):
+        source.dump(snap, job)
+        mdl.source = source
+        if journal is not None:
+            if source.path is None:
+                journal.close()
+                ctl.journal = None
+            else:
+                journal.rebase(source.path, offset)
+        job.msg = f"saved: {source}"
+
+    jobs.start(name, dump)
+    return CmdResult(msg=f"saving: {source}")
+
+
 @command()
-def save(mdl):
+def save(mdl, ctl):
     # FIXME: Confirm overwrite.
-    mdl.source.dump(mdl)
-    return CmdResult(msg=f"saved: {mdl.source}")
+    if ctl.journal is not None:
+        # Just commit the edits in the journal.
+        num = ctl.journal.commit()
+        return CmdResult(msg=f"saved {num} edits: {ctl.journal.path}")
+    else:
+        return _dump(mdl, ctl, mdl.source)
 
 
 @command()
-def save_as(mdl, source_str):
+def save_as(mdl, ctl, source_str):
     if source_str == "":
         raise CmdError("no source given")
 
-    mdl.source = make_source(source_str)
-    return save(mdl)
+    return _dump(mdl, ctl, make_source(source_str))
+
+
+@command()
+def compact(mdl, ctl):
+    """
+    Rewrites the source with all edits, and starts a new journal.
+    """
+    return _dump(mdl, ctl, mdl.source)
+
+
+@command()
+def load_column(mdl, vw):
+    """
+    Loads the current column, if it's unloaded.
+    """
+    col = mdl.get_col(vw.cols[vw.cur.c].col_id)
+    if not isinstance(col.arr, Unloaded):
+        raise CmdError(f"column already loaded: {col.name}")
+    if load_columns(mdl, [col.id]) is None:
+        raise CmdError(f"column already loading: {col.name}")
+    return CmdResult(msg=f"loading: {col.name}")
 
 
@@ -0,0 +1,123 @@
+"""
+Background jobs.
+
+A job runs a function on a daemon thread, so that long operations (loading,
+saving, scanning) don't block the UI.  The function is called with the job as
+its first argument; it should update `job.status` to report progress, and
+check `job.cancelled` periodically to stop early.
+
+Running jobs are registered in `running`.  The main loop polls this to redraw
+while jobs are in progress, shows their status, and reaps them when done.
+"""
+
+#-------------------------------------------------------------------------------
+
+import logging
+import threading
+
+__all__ = (
+    "Job",
+    "reap",
+    "running",
+    "start",
+    "wait_all",
+)
+
+#-------------------------------------------------------------------------------
+
+class Job:
+
+    def __init__(self, name, fn, *args, **kw_args):
+        self.name   = name
+        # User-visible progress text, updated by the job function.
+        self.status = None
+        # Message to show when the job completes successfully.
+        self.msg    = None
+        self.result = None
+        self.error  = None
+
+        self.__cancel = threading.Event()
+        self.__thread = threading.Thread(
+            target=self.__run, args=(fn, args, kw_args), name=name,
+            daemon=True)
+
+
+    def __repr__(self):
+        return "{}({!r})".format(self.__class__.__name__, self.name)
+
+
+    def __run(self, fn, args, kw_args):
+        try:
+            self.result = fn(self, *args, **kw_args)
+        except Exception as exc:
+            logging.exception("job failed: {}".format(self.name))
+            self.error = exc
+
+
+    def start(self):
+        self.__thread.start()
+        return self
+
+
+    @property
+    def done(self):
+        return not self.__thread.is_alive()
+
+
+    @property
+    def cancelled(self):
+        return self.__cancel.is_set()
+
+
+    def cancel(self):
+        """
+        Requests that the job stop early.
+        """
+        self.__cancel.set()
+
+
+    def wait(self, timeout=None):
+        """
+        Blocks until the job is done; returns its result.
+
+        @raise
+          The exception raised by the job function, if any.
+        """
+        self.__thread.join(timeout)
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+
+# Jobs that have been started but not yet reaped.
+running = []
+
+def start(name, fn, *args, **kw_args):
+    """
+    Creates, registers, and starts a job.
+    """
+    job = Job(name, fn, *args, **kw_args)
+    running.append(job)
+    return job.start()
+
+
+def reap():
+    """
+    Removes finished jobs from `running`; returns them.
+    """
+    done = [ j for j in running if j.done ]
+    for job in done:
+        running.remove(job)
+    return done
+
+
+def wait_all():
+    """
+    Waits for all running jobs, including any jobs they start.
+    """
+    while not all( j.done for j in running ):
+        for job in list(running):
+            job.wait()
+
+
@@ -0,0 +1,146 @@
+"""
+Lookup joins, enriching a table with columns of another.
+
+A lookup join matches each row of a table to the first row of another table
+with an equal key value.  The other table's key column is indexed once: its
+distinct values are factorized from their cached sort ranks, and kept sorted
+with the first row of each, so that a whole column of keys is looked up with
+a single vectorized binary search.  A dictionary-encoded key column looks up
+its distinct values only.
+
+The result is an index array of matching rows, with -1 for no match.  The
+other table's columns are added as lazy arrays that gather values through
+this index array, so they share it and aren't copied.  Rows without a match
+have null values.
+"""
+
+#-------------------------------------------------------------------------------
+
+import numpy as np
+from   pathlib import Path
+
+from   . import io
+from   .encoding import DictArray
+from   .lazy import GatherArray, Unloaded
+from   .sort import get_ranks
+from   .stats import get_nulls
+
+__all__ = (
+    "Index",
+    "lookup_join",
+)
+
+#-------------------------------------------------------------------------------
+
+class Index:
+    """
+    Index of a key column's distinct non-null values.
+    """
+
+    def __init__(self, values, rows):
+        # Distinct values, sorted.
+        self.values = values
+        # The first row with each value.
+        self.rows   = rows
+
+
+    @classmethod
+    def from_array(Class, arr):
+        """
+        @raise ValueError
+          The values can't be ranked.
+        """
+        ranks, null_rank = get_ranks(arr)
+        order = np.argsort(ranks, kind="stable")
+        starts = np.flatnonzero(np.diff(ranks[order], prepend=-1) != 0)
+        # Ranks are dense, so the first row of each rank is at its start;
+        # nulls, if any, are last.
+        rows = order[starts[: null_rank]]
+        return Class(np.asarray(arr[rows]), rows)
+
+
+    def lookup(self, keys):
+        """
+        Looks up key values.
+
+        @return
+          The row of each key, or -1 if there is none.
+        @raise ValueError
+          The keys aren't comparable to the indexed values.
+        """
+        if isinstance(keys, DictArray):
+            # Look up each distinct key once.
+            return self.lookup(keys.values)[keys.codes]
+
+        keys = np.asarray(keys)
+        dtype = np.int32 if len(self.rows) < 1 << 31 else np.int64
+        rows = np.full(len(keys), -1, dtype=dtype)
+        # Null keys don't match.
+        sel = np.flatnonzero(~get_nulls(keys))
+        if len(self.values) == 0 or len(sel) == 0:
+            return rows
+        keys = keys[sel]
+        try:
+            pos = np.searchsorted(self.values, keys)
+            pos[pos == len(self.values)] = 0
+            found = self.values[pos] == keys
+        except TypeError:
+            raise ValueError("keys aren't comparable")
+        # Comparisons numpy can't vectorize give a scalar.
+        found = np.broadcast_to(np.asarray(found, dtype=bool), (len(keys), ))
+        rows[sel[found]] = self.rows[pos[found]]
+        return rows
+
+
+
+def _get_col(mdl, name):
+    try:
+        col, = ( c for c in mdl.cols if c.name == name )
+    except ValueError:
+        raise ValueError("no column: {}".format(name))
+    if isinstance(col.arr, Unloaded):
+        raise ValueError("column isn't loaded: {}".format(name))
+    return col
+
+
+def lookup_join(mdl, source_str, left, right, position):
+    """
+    Adds the columns of another table, looked up by key, to a model.
+
+    Columns whose names are already in the model are renamed with the name of
+    the other source.
+
+    @param source_str
+      The other table's source.
+    @param left
+      The name of the model's key column.
+    @param right
+      The name of the other table's key column.
+    @param position
+      The column position at which to insert the new columns.
+    @return
+      The number of columns added, and the number of rows matched.
+    @raise ValueError
+      The join failed.
+    """
+    key = _get_col(mdl, left)
+    other = io.open(source_str)
+    if other.loader is not None:
+        other.loader.wait()
+        # The other table isn't shown, so don't report it's loaded.
+        other.loader.msg = None
+    idx = Index.from_array(_get_col(other, right).arr).lookup(key.arr)
+
+    names = { c.name for c in mdl.cols }
+    cols = [
+        c for c in other.cols
+        if c.name != right and not isinstance(c.arr, Unloaded)
+    ]
+    for i, col in enumerate(cols):
+        name = col.name
+        if name in names:
+            name = "{} ({})".format(name, Path(source_str).stem)
+        mdl.add_col(GatherArray(col.arr, idx), name, position=position + i)
+    return len(cols), int((idx >= 0).sum())
+
+
@@ -0,0 +1,250 @@
+"""
+Append-only edit journal.
+
+The journal records edits to a model loaded from a file, in a sidecar file
+next to it, so that saving only needs to append to the journal rather than
+rewrite the file.  Reopening the file replays the journal on top of it.
+
+The journal file has JSON lines.  The first line records the size and mtime
+of the base file.  If the base file has changed, the journal's edits may no
+longer apply, so it is moved aside, rather than replayed or discarded, and a
+new journal is started.
+Subsequent lines are edits, and commit markers written on save.  Edits are
+written as they're made, so edits after the last commit can be recovered
+after a crash; on a clean exit without saving, they are discarded.
+
+Compaction rewrites the base file with all edits applied, and starts a new
+journal for it.
+"""
+
+#-------------------------------------------------------------------------------
+
+import itertools
+import json
+import logging
+import numpy as np
+import os
+from   pathlib import Path
+import threading
+
+from   . import model
+from   .derived import derive
+from   .lib.fs import atomic_write
+from   .selection import from_runs
+
+__all__ = (
+    "Journal",
+    "apply",
+)
+
+#-------------------------------------------------------------------------------
+
+def _get_base(source_path):
+    stat = Path(source_path).stat()
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _to_json(val):
+    # Convert numpy arrays and scalars to Python objects.
+    if isinstance(val, np.ndarray):
+        val = val.tolist()
+    if isinstance(val, (list, tuple)):
+        return [ _to_json(v) for v in val ]
+    return val.item() if hasattr(val, "item") else val
+
+
+def apply(mdl, entry):
+    """
+    Applies a journal entry to a model.
+    """
+    op = entry["op"]
+    if op == "delete_row":
+        model.delete_row(mdl, entry["row"])
+    elif op == "insert_row":
+        model.insert_row(mdl, entry["row"], entry["values"])
+    elif op == "take_rows":
+        model.take_rows(mdl, from_runs(entry["runs"]))
+    elif op == "insert_rows":
+        model.insert_rows(mdl, from_runs(entry["runs"]), entry["values"])
+    elif op == "add_derived_col":
+        mdl.add_col(
+            derive(mdl, entry["expr"]), entry["name"],
+            position=entry["position"])
+    elif op == "delete_col":
+        model.delete_col(mdl, entry["position"])
+    elif op == "lookup_join":
+        # Imported here, since joining opens a source, and io imports us.
+        from .join import lookup_join
+        lookup_join(
+            mdl, entry["source"], entry["left"], entry["right"],
+            entry["position"])
+    else:
+        raise ValueError("unknown journal op: {}".format(op))
+
+
+def _move_aside(path):
+    """
+    Renames `path` to an unused name beside it.
+
+    @return
+      The new path.
+    """
+    for i in itertools.count():
+        new = path.with_name(
+            "{}.stale{}".format(path.name, "" if i == 0 else i))
+        if not new.exists():
+            os.rename(path, new)
+            return new
+
+
+class Journal:
+
+    def __init__(self, source_path):
+        """
+        Opens the journal for a source file, creating it if necessary.
+
+        Reads entries from an existing journal into `entries`, if its base
+        matches the source file.  Of these, the last `num_unsaved` were not
+        committed.  If it doesn't match, moves it aside to `stale_path`.
+        """
+        source_path = Path(source_path)
+        self.path = source_path.with_name(source_path.name + ".tbljournal")
+        self.__lock = threading.Lock()
+        self.entries = []
+        self.num_unsaved = 0
+        self.stale_path = None
+
+        try:
+            with open(self.path) as file:
+                lines = file.readlines()
+        except FileNotFoundError:
+            lines = []
+
+        base = _get_base(source_path)
+        if len(lines) > 0 and json.loads(lines[0]).get("base") == base:
+            offset = committed = len(lines[0].encode())
+            for line in lines[1 :]:
+                if not line.endswith("\n"):
+                    # Partial line from a crash.
+                    break
+                offset += len(line.encode())
+                entry = json.loads(line)
+                if entry["op"] == "commit":
+                    committed = offset
+                    self.num_unsaved = 0
+                else:
+                    self.entries.append(entry)
+                    self.num_unsaved += 1
+            self.__committed = committed
+            self.__file = open(self.path, "r+")
+            self.__file.truncate(offset)
+            self.__file.seek(offset)
+
+        else:
+            if len(lines) > 0:
+                # Keep the edits, in case they're wanted.
+                self.stale_path = _move_aside(self.path)
+                logging.warning(
+                    "base file changed; moved journal to: {}".format(
+                        self.stale_path))
+            self.__file = open(self.path, "w")
+            self.__write({"base": base})
+            self.__committed = self.__file.tell()
+
+
+    def __write(self, obj):
+        # JSON is written as ASCII, so character and byte offsets agree.
+        self.__file.write(json.dumps(obj) + "\n")
+        self.__file.flush()
+
+
+    def record(self, op, **args):
+        """
+        Records an edit.
+        """
+        args = { n: _to_json(v) for n, v in args.items() }
+        with self.__lock:
+            self.__write(dict(op=op, **args))
+            self.num_unsaved += 1
+
+
+    def commit(self):
+        """
+        Marks recorded edits as saved.
+
+        @return
+          The number of edits saved.
+        """
+        with self.__lock:
+            self.__write({"op": "commit"})
+            os.fsync(self.__file.fileno())
+            self.__committed = self.__file.tell()
+            num, self.num_unsaved = self.num_unsaved, 0
+        return num
+
+
+    def discard(self):
+        """
+        Removes edits that haven't been committed.
+        """
+        with self.__lock:
+            self.__file.truncate(self.__committed)
+            self.__file.seek(self.__committed)
+            self.num_unsaved = 0
+
+
+    def tell(self):
+        """
+        Returns the current position in the journal.
+        """
+        with self.__lock:
+            return self.__file.tell()
+
+
+    def rebase(self, source_path, offset):
+        """
+        Starts a new journal for a source file that has just been written.
+
+        Edits recorded after `offset`, the position when the file was written,
+        are carried over to the new journal.
+        """
+        source_path = Path(source_path)
+        path = source_path.with_name(source_path.name + ".tbljournal")
+        with self.__lock:
+            self.__file.seek(offset)
+            tail = self.__file.read()
+            header = json.dumps({"base": _get_base(source_path)}) + "\n"
+            with atomic_write(path) as file:
+                file.write(header + tail)
+
+            # Edits carried over aren't saved to the new base file, unless
+            # they were committed since.
+            committed = offset = len(header)
+            num_unsaved = 0
+            for line in tail.splitlines(keepends=True):
+                offset += len(line)
+                if json.loads(line)["op"] == "commit":
+                    committed = offset
+                    num_unsaved = 0
+                else:
+                    num_unsaved += 1
+
+            if path != self.path:
+                # The old journal's source wasn't changed, so discard its
+                # uncommitted edits, which are in the new journal.
+                self.__file.truncate(self.__committed)
+            self.__file.close()
+
+            self.path = path
+            self.__file = open(self.path, "r+")
+            self.__file.seek(0, os.SEEK_END)
+            self.__committed = committed
+            self.num_unsaved = num_unsaved
+
+
+    def close(self):
+        with self.__lock:
+            self.__file.close()
+
+
+
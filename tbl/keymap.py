@@ -43,26 +43,55 @@ def get_default():
         "DOWN"          : "move-down",
         "S-LEFT"        : "scroll-left",
         "S-RIGHT"       : "scroll-right",
+        "S-UP"          : "extend-selection-up",
+        "S-DOWN"        : "extend-selection-down",
+        "SPACE"         : "toggle-select-row",
 
         "C-b"           : "move-left",   # back
         "C-f"           : "move-right",  # forward
+        "C-g"           : "cancel",
         "C-k"           : "delete-row",
         "C-p"           : "move-up",     # previous
         "C-n"           : "move-down",   # next
+        "C-r"           : "search-backward",
+        "C-s"           : "search-forward",
         "M-v"           : "move-up-page",
         "C-v"           : "move-down-page",
         "C-x"           : PREFIX,
         ("C-x", "C-s")  : "save",
         ("C-x", "C-w")  : "save-as",
+        ("C-x", "H")    : "show-histogram",
+        ("C-x", "a")    : "add-column",
+        ("C-x", "c")    : "compact",
+        ("C-x", "f")    : "toggle-follow",
+        ("C-x", "F")    : "stop-following",
+        ("C-x", "g")    : "group-by",
+        ("C-x", "h")    : "select-all",
+        ("C-x", "j")    : "lookup-join",
+        ("C-x", "l")    : "load-column",
+        ("C-x", "s")    : "compute-column-stats",
+        ("C-x", "v")    : "value-counts",
+        ("C-x", "V")    : "value-counts-exact",
+        ("C-x", "SPACE"): "clear-selection",
+        ("C-x", "|")    : "clear-filters",
         "C-z"           : "undo",
+        "M-z"           : "redo",
 
         ";"             : "decrease-column-width",
         "'"             : "increase-column-width",
         ":"             : "decrease-column-precision",
         "\""            : "increase-column-precision",
+        "|"             : "filter",
+        "\\"            : "undo-filter",
 
+        "M-g"           : "goto-row",
+        "M-k"           : "delete-selected-rows",
+        "M-d"           : "duplicate-selected-rows",
+        "M-m"           : "move-selected-rows",
         "M-#"           : "toggle-show-row-num",
         "M-$"           : "hide-column",
+        "M-s"           : "sort-by-column",
+        "M-u"           : "clear-sort",
         "M-x"           : "command",
 
         "q"             : "quit",
@@ -0,0 +1,226 @@
+"""
+Array-likes whose values are read or computed on demand.
+
+A lazy array stands in for a numpy array as `Model.Col.arr`, so that the
+model doesn't need to hold the whole column in memory.  It supports `len()`,
+`dtype`, and indexing by an int, slice, bool mask, or int array.  Indexing by
+an int returns a scalar; other indexing returns a numpy array.
+
+Converting a lazy array with `np.asarray()` materializes the whole column.
+"""
+
+#-------------------------------------------------------------------------------
+
+import numpy as np
+
+__all__ = (
+    "GatherArray",
+    "LazyArray",
+    "Unloaded",
+    "get_null",
+)
+
+#-------------------------------------------------------------------------------
+
+class LazyArray:
+    """
+    Base class for lazy arrays.
+
+    Subclasses must implement `__len__`, `dtype`, and `_get_range()`, and may
+    override `_take()` with a more efficient implementation.
+    """
+
+    dtype = np.dtype(object)
+    ndim = 1
+    # True if values are held in memory, rather than read from a source or
+    # computed, so that a pass over them is cheap.
+    in_memory = False
+
+    def __len__(self):
+        raise NotImplementedError("__len__")
+
+
+    @property
+    def shape(self):
+        return (len(self), )
+
+
+    def _get_range(self, start, stop):
+        """
+        Returns values of a contiguous range of rows as an array.
+        """
+        raise NotImplementedError("_get_range")
+
+
+    def _take(self, idx):
+        """
+        Returns values at an array of nonnegative row indices.
+
+        The default implementation reads the range spanning the indices, in
+        pieces separated by large gaps.
+        """
+        if len(idx) == 0:
+            return np.empty(0, dtype=self.dtype)
+        order = np.argsort(idx, kind="stable")
+        sidx = idx[order]
+        # Split into runs wherever there's a big gap between indices.
+        breaks = np.flatnonzero(np.diff(sidx) > 4096) + 1
+        parts = []
+        for run in np.split(sidx, breaks):
+            vals = self._get_range(int(run[0]), int(run[-1]) + 1)
+            parts.append(vals[run - run[0]])
+        res = np.empty(len(idx), dtype=np.result_type(*parts))
+        res[order] = np.concatenate(parts)
+        return res
+
+
+    def cast(self, vals, dtype):
+        """
+        Converts values read from this array to `dtype`.
+
+        A lazy array's dtype may widen as more of it is read; this converts
+        values read before, as the array would now return them.
+        """
+        return np.asarray(vals).astype(dtype)
+
+
+    def __getitem__(self, idx):
+        n = len(self)
+        if isinstance(idx, slice):
+            start, stop, step = idx.indices(n)
+            if step < 0:
+                return self[np.arange(start, stop, step)]
+            return self._get_range(start, max(start, stop))[:: step]
+
+        if np.ndim(idx) == 0:
+            i = int(idx)
+            if i < 0:
+                i += n
+            if not 0 <= i < n:
+                raise IndexError("index {} out of range".format(idx))
+            return self._get_range(i, i + 1)[0]
+
+        idx = np.asarray(idx)
+        if idx.dtype == bool:
+            if len(idx) != n:
+                raise IndexError("mask is wrong length")
+            idx = np.flatnonzero(idx)
+        else:
+            idx = np.where(idx < 0, idx + n, idx).astype(np.int64)
+            if len(idx) > 0 and (idx.min() < 0 or idx.max() >= n):
+                raise IndexError("index out of range")
+        return self._take(idx)
+
+
+    def __iter__(self):
+        # Read in blocks, rather than element by element.
+        for start in range(0, len(self), 65536):
+            yield from self._get_range(start, min(start + 65536, len(self)))
+
+
+    def __array__(self, dtype=None, copy=None):
+        arr = self._get_range(0, len(self))
+        return arr if dtype is None else arr.astype(dtype)
+
+
+    def __repr__(self):
+        return "{}(len={}, dtype={})".format(
+            self.__class__.__name__, len(self), self.dtype)
+
+
+
+class Unloaded(LazyArray):
+    """
+    Placeholder for a column that hasn't been loaded from its source.
+
+    Has as many rows as its model, all empty strings.
+    """
+
+    def __init__(self, mdl, index):
+        """
+        @param index
+          The column's position in the source.
+        """
+        self.__mdl = mdl
+        self.index = index
+        # True while the column is being loaded.
+        self.loading = False
+
+
+    def __len__(self):
+        return self.__mdl.num_rows
+
+
+    def _get_range(self, start, stop):
+        return np.full(stop - start, "", dtype=object)
+
+
+
+def get_null(dtype):
+    """
+    Returns the null value for a dtype.
+    """
+    kind = dtype.kind
+    if kind == "f":
+        return np.nan
+    elif kind in "Mm":
+        return dtype.type("NaT")
+    elif kind in "US":
+        return dtype.type()
+    else:
+        return ""
+
+
+class GatherArray(LazyArray):
+    """
+    Values of another array, gathered through an index array of its rows.
+
+    An index of -1 gives a null value.  If there are any, int and bool values
+    are converted to float, so that they can be NaN.
+    """
+
+    def __init__(self, arr, idx):
+        self.arr        = arr
+        self.idx        = idx
+        # True if any index is -1.
+        self.missing    = bool((idx < 0).any())
+        self.dtype      = (
+            np.dtype(np.float64) if self.missing and arr.dtype.kind in "biu"
+            else arr.dtype
+        )
+
+
+    def __len__(self):
+        return len(self.idx)
+
+
+    @property
+    def in_memory(self):
+        return not isinstance(self.arr, LazyArray) or self.arr.in_memory
+
+
+    def __gather(self, idx):
+        miss = idx < 0
+        if not self.missing or not miss.any():
+            return np.asarray(self.arr[idx]).astype(self.dtype, copy=False)
+        vals = np.empty(len(idx), dtype=self.dtype)
+        vals[~miss] = self.arr[idx[~miss]]
+        vals[miss] = get_null(self.dtype)
+        return vals
+
+
+    def _get_range(self, start, stop):
+        return self.__gather(self.idx[start : stop])
+
+
+    def _take(self, idx):
+        return self.__gather(self.idx[idx])
+
+
+    def take(self, idx):
+        """
+        Returns the gathered values at `idx`, without reading them.
+        """
+        return self.__class__(self.arr, self.idx[idx])
+
+
@@ -0,0 +1,46 @@
+from   collections import OrderedDict
+import threading
+
+#-------------------------------------------------------------------------------
+
+class ArrayCache(OrderedDict):
+    """
+    Cache of results computed from arrays, evicting the least recently used.
+
+    Keys include the IDs of the arrays; since edits replace arrays rather than
+    modifying them, results for an array stay valid while it lives.  The cache
+    holds the arrays themselves, so that their IDs aren't reused.
+
+    The cache may be shared by threads.  A result may be computed more than
+    once, if threads miss on the same key concurrently.
+    """
+
+    def __init__(self, size):
+        super().__init__()
+        self.size = size
+        self.__lock = threading.Lock()
+
+
+    def get(self, key, arrs, fn):
+        """
+        Returns the result for `key`, computing it with `fn()` if necessary.
+
+        @param arrs
+          The arrays the result is computed from.
+        """
+        with self.__lock:
+            entry = super().get(key)
+            if entry is not None:
+                self.move_to_end(key)
+                return entry[1]
+
+        # Compute without holding the lock.
+        result = fn()
+        with self.__lock:
+            self[key] = (arrs, result)
+            while len(self) > self.size:
+                self.popitem(last=False)
+        return result
+
+
+
@@ -0,0 +1,53 @@
+from   contextlib import contextmanager
+import os
+from   pathlib import Path
+import shutil
+import tempfile
+
+#-------------------------------------------------------------------------------
+
+def _get_umask():
+    # The umask can't be read without setting it.
+    umask = os.umask(0o022)
+    os.umask(umask)
+    return umask
+
+
+# The process's umask.  Read once, at import, since setting it to read it
+# isn't thread-safe.
+UMASK = _get_umask()
+
+@contextmanager
+def atomic_write(path, mode="w", **kw_args):
+    """
+    Context manager that writes a file atomically.
+
+    Opens a temporary file in the same directory as `path`.  On successful
+    exit, renames it over `path`, so that readers never see a partially
+    written file.  On error, removes the temporary file and leaves `path`
+    untouched.
+
+    @param kw_args
+      Additional arguments to `open()`.
+    """
+    path = Path(path)
+    file = tempfile.NamedTemporaryFile(
+        mode, dir=path.parent, prefix="." + path.name + ".", suffix=".tmp",
+        delete=False, **kw_args)
+    try:
+        with file:
+            yield file
+            file.flush()
+            os.fsync(file.fileno())
+        # Preserve the permissions of an existing file.  The temporary file
+        # is private, so give a new file the default permissions.
+        try:
+            shutil.copymode(path, file.name)
+        except FileNotFoundError:
+            os.chmod(file.name, 0o666 & ~UMASK)
+        os.replace(file.name, path)
+    except:
+        os.unlink(file.name)
+        raise
+
+
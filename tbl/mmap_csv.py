@@ -0,0 +1,253 @@
+"""
+Memory-mapped CSV tables.
+
+The file is memory-mapped, and a row-offset index records where each row
+starts.  Cells are parsed only when read, in blocks of rows, and recently
+parsed blocks are kept in a small cache.  Resident memory is therefore the
+index plus the blocks being viewed, regardless of file size.
+
+The row-offset index is saved in a sidecar file next to the CSV file, and
+reused on the next open if the file's size and modification time match.
+"""
+
+#-------------------------------------------------------------------------------
+
+from   collections import OrderedDict
+import csv
+import io
+import json
+import logging
+import mmap
+import numpy as np
+from   pathlib import Path
+import threading
+
+from   . import parse
+from   .lazy import LazyArray
+
+#-------------------------------------------------------------------------------
+
+# Number of rows parsed together.
+BLOCK_SIZE = 1024
+
+# Number of parsed blocks to keep.
+CACHE_BLOCKS = 64
+
+# Size of chunks in which the file is scanned for row boundaries.
+SCAN_SIZE = 1 << 24
+
+def find_rows(buf, start=0, quoted=True):
+    """
+    Finds the start offsets of rows in a CSV buffer.
+
+    @param start
+      Offset at which the first row starts.
+    @param quoted
+      If true, newlines inside double-quoted fields aren't row boundaries.
+    @return
+      An array of row start offsets, with the buffer length appended, such
+      that row `i` spans `[offsets[i], offsets[i + 1])`.
+    """
+    size = len(buf)
+    parts = [np.array([start], dtype=np.int64)]
+    # Number of quotes seen so far, mod 2.
+    carry = 0
+    for off in range(start, size, SCAN_SIZE):
+        chunk = np.frombuffer(buf, dtype=np.uint8, offset=off,
+                              count=min(SCAN_SIZE, size - off))
+        nl = np.flatnonzero(chunk == 10)
+        if quoted:
+            # A newline ends a row only if preceded by an even number of
+            # quotes.  An escaped quote "" counts twice, so is harmless.
+            qs = np.flatnonzero(chunk == 34)
+            before = np.searchsorted(qs, nl) + carry
+            nl = nl[before % 2 == 0]
+            carry = (carry + len(qs)) % 2
+        parts.append(nl + (off + 1))
+    offsets = np.concatenate(parts)
+    # If the file ends with a newline, the last "row" is empty.
+    if offsets[-1] != size:
+        offsets = np.append(offsets, size)
+    return offsets
+
+
+def _index_paths(path):
+    return (
+        path.with_name(path.name + ".tblidx.npy"),
+        path.with_name(path.name + ".tblidx.json"),
+    )
+
+
+def load_index(path, meta):
+    """
+    Loads the row-offset index for `path` from its sidecar, if it matches.
+
+    @return
+      The memory-mapped index, or `None` if it's missing or stale.
+    """
+    idx_path, meta_path = _index_paths(path)
+    try:
+        with open(meta_path) as file:
+            if json.load(file) == meta:
+                logging.info("using row index: {}".format(idx_path))
+                return np.load(idx_path, mmap_mode="r")
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def save_index(path, offsets, meta):
+    """
+    Saves the row-offset index for `path` to its sidecar.
+    """
+    idx_path, meta_path = _index_paths(path)
+    try:
+        np.save(idx_path, offsets)
+        with open(meta_path, "w") as file:
+            json.dump(meta, file)
+    except OSError as exc:
+        logging.warning("can't save row index: {}".format(exc))
+
+
+#-------------------------------------------------------------------------------
+
+class MappedCSV:
+    """
+    A memory-mapped CSV file with a row-offset index.
+    """
+
+    def __init__(self, path, *, quoted=True, encoding="utf-8"):
+        self.path = Path(path)
+        self.encoding = encoding
+
+        with open(self.path, "rb") as file:
+            size = file.seek(0, 2)
+            # mmap can't map an empty file.
+            self.buf = (
+                mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+                if size > 0 else b""
+            )
+
+        # Load or build the row index.  The first row is the header.
+        stat = self.path.stat()
+        meta = {
+            "size"      : stat.st_size,
+            "mtime_ns"  : stat.st_mtime_ns,
+            "quoted"    : quoted,
+        }
+        offsets = load_index(self.path, meta)
+        if offsets is None:
+            offsets = find_rows(self.buf, 0, quoted)
+            save_index(self.path, offsets, meta)
+
+        if len(offsets) < 2:
+            # Empty file.
+            self.names = []
+            self.offsets = offsets
+        else:
+            text = self.buf[offsets[0] : offsets[1]].decode(self.encoding)
+            self.names = next(csv.reader(io.StringIO(text)), [])
+            self.offsets = offsets[1 :]
+
+        self.__cache = OrderedDict()
+        self.__lock = threading.Lock()
+
+        # Infer column kinds from the first block.
+        self.kinds = ["i"] * len(self.names)
+        if self.num_rows > 0:
+            self._get_block(0)
+
+
+    @property
+    def num_rows(self):
+        return len(self.offsets) - 1
+
+
+    def _parse_block(self, b):
+        start = b * BLOCK_SIZE
+        stop = min(start + BLOCK_SIZE, self.num_rows)
+        text = self.buf[self.offsets[start] : self.offsets[stop]]
+        rows = csv.reader(io.StringIO(text.decode(self.encoding)))
+        batch = next(
+            parse.iter_batches(rows, len(self.names), first=stop - start),
+            [ () for _ in self.names ])
+        arrs = []
+        for i, vals in enumerate(batch):
+            arr, kind = parse.convert(vals, self.kinds[i])
+            # The column widens if this block doesn't fit its kind.
+            self.kinds[i] = parse.widen(self.kinds[i], kind)
+            arrs.append(arr)
+        return arrs
+
+
+    def _get_block(self, b):
+        with self.__lock:
+            try:
+                arrs = self.__cache[b]
+            except KeyError:
+                arrs = self.__cache[b] = self._parse_block(b)
+                if len(self.__cache) > CACHE_BLOCKS:
+                    self.__cache.popitem(last=False)
+            else:
+                self.__cache.move_to_end(b)
+            return arrs
+
+
+    def get_range(self, c, start, stop):
+        """
+        Returns values of column `c` for rows `[start, stop)`.
+        """
+        if start >= stop:
+            return np.empty(0, dtype=self.get_dtype(c))
+        parts = []
+        for b in range(start // BLOCK_SIZE, (stop - 1) // BLOCK_SIZE + 1):
+            arr = self._get_block(b)[c]
+            b0 = b * BLOCK_SIZE
+            parts.append(arr[max(start - b0, 0) : stop - b0])
+        # Parsing may have widened the column; get the dtype afterward.
+        dtype = self.get_dtype(c)
+        return np.concatenate([ self.cast(p, dtype) for p in parts ])
+
+
+    @staticmethod
+    def cast(arr, dtype):
+        """
+        Converts values parsed earlier to a column's widened dtype.
+        """
+        if dtype.kind == "O":
+            # Blocks parsed as numbers are text, if the column is.
+            return parse.to_text(arr)
+        return arr.astype(dtype, copy=False)
+
+
+    def get_dtype(self, c):
+        return np.dtype({"i": np.int64, "f": np.float64, "O": object}[
+            self.kinds[c]])
+
+
+
+class MappedCSVColumn(LazyArray):
+
+    def __init__(self, table, c):
+        self.__table = table
+        self.__c = c
+
+
+    def __len__(self):
+        return self.__table.num_rows
+
+
+    @property
+    def dtype(self):
+        return self.__table.get_dtype(self.__c)
+
+
+    def _get_range(self, start, stop):
+        return self.__table.get_range(self.__c, start, stop)
+
+
+    def cast(self, vals, dtype):
+        return self.__table.cast(np.asarray(vals), dtype)
+
+
+
@@ -1,6 +1,13 @@
+import copy
 import itertools
 import numpy as np
 
+from   . import parse, spill
+from   .chunked import chunk
+from   .derived import DerivedArray
+from   .encoding import EncodedArray, encode
+from   .lazy import GatherArray, LazyArray
+
 #-------------------------------------------------------------------------------
 
 class Model:
@@ -15,6 +22,10 @@ class Model:
             self.id     = next(self.__ids)
             self.name   = name
             self.arr    = arr
+            # Cached stats of the column's values, or None if not computed.
+            self.stats  = None
+            # When the column was last viewed, as a count of views.
+            self.viewed = 0
 
 
     def __init__(self, cols={}):
@@ -22,6 +33,10 @@ class Model:
         # Number of rows in the table, or None if no columns so far.
         # FIXME: Make a property?
         self.num_rows   = None
+        # Job that is still appending rows to the model, if any.
+        self.loader     = None
+        # Memory budget for column arrays, in bytes, or None for no limit.
+        self.memory_budget = None
 
         for name, arr in cols.items():
             self.add_col(arr, name=name)
@@ -34,7 +49,8 @@ class Model:
         @param position
           Insertion position into the column order; `None` for end.
         """
-        arr = np.asarray(arr)
+        if not isinstance(arr, LazyArray):
+            arr = np.asarray(arr)
         if position is None:
             # Insert at end.
             position = len(self.cols)
@@ -74,9 +90,64 @@ class Model:
         return len(self.cols)
 
 
+    @property
+    def loading(self):
+        """
+        True if rows are still being appended in the background.
+        """
+        return self.loader is not None and not self.loader.done
+
+
 
 #-------------------------------------------------------------------------------
 
+def snapshot(mdl):
+    """
+    Returns a copy of the model's current contents, for consistent reads.
+
+    Edits replace column arrays rather than modifying them, so the copy shares
+    arrays with the model and is cheap.  The copy's cols have the same IDs.
+    """
+    snap = copy.copy(mdl)
+    snap.cols = [ copy.copy(c) for c in mdl.cols ]
+    snap.loader = None
+    return snap
+
+
+def restore(mdl, snap):
+    """
+    Restores the model's contents from a snapshot.
+    """
+    mdl.cols = [ copy.copy(c) for c in snap.cols ]
+    mdl.num_rows = snap.num_rows
+
+
+def _update_derived(mdl):
+    """
+    Updates derived columns for edits to their sources.
+    """
+    # Derived columns may depend on each other; repeat until none change.
+    changed = True
+    while changed:
+        changed = False
+        for col in mdl.cols:
+            if isinstance(col.arr, DerivedArray):
+                arr = col.arr.update(mdl)
+                if arr is not col.arr:
+                    col.arr = arr
+                    col.stats = None
+                    changed = True
+
+
+def _values(col, vals):
+    """
+    Returns values as an array of the column's dtype.
+    """
+    arr = np.empty(len(vals), dtype=col.arr.dtype)
+    arr[:] = vals
+    return arr
+
+
 def delete_row(mdl, row_num):
     """
     Deletes a row; returns a sequence with the row's values.
@@ -84,9 +155,18 @@ def delete_row(mdl, row_num):
     assert 0 <= row_num < mdl.num_rows
 
     row = tuple( c.arr[row_num] for c in mdl.cols )
-    for col in mdl.cols:
-        col.arr = np.delete(col.arr, row_num)
+    for col, val in zip(mdl.cols, row):
+        if isinstance(col.arr, DerivedArray):
+            continue
+        if col.stats is not None:
+            col.stats = col.stats.delete(_values(col, [val]))
+        if isinstance(col.arr, EncodedArray):
+            col.arr = col.arr.delete(row_num)
+        else:
+            # Chunk the column, so that the edit copies only one chunk.
+            col.arr = chunk(col.arr).delete(row_num)
     mdl.num_rows -= 1
+    _update_derived(mdl)
 
     return row
 
@@ -94,13 +174,87 @@ def delete_row(mdl, row_num):
 def insert_row(mdl, row_num, row):
     """
     Inserts a sequence of values as a row at `row_num`.
+
+    Values for derived columns are ignored.
     """
     assert 0 <= row_num <= mdl.num_rows
     assert len(row) == len(mdl.cols)
     
     for col, val in zip(mdl.cols, row):
-        col.arr = np.insert(col.arr, row_num, val)
+        if isinstance(col.arr, DerivedArray):
+            continue
+        if col.stats is not None:
+            col.stats = col.stats.insert(_values(col, [val]))
+        if isinstance(col.arr, EncodedArray):
+            col.arr = col.arr.insert(row_num, val)
+        else:
+            col.arr = chunk(col.arr).insert(row_num, val)
     mdl.num_rows += 1
+    _update_derived(mdl)
+
+
+def take_rows(mdl, idx):
+    """
+    Replaces the rows with those at indices `idx`, in order.
+
+    Rows may be dropped, repeated, or reordered.  Each column is taken in a
+    single vectorized pass; encoded columns stay encoded, and gathered
+    columns stay lazy.
+    """
+    idx = np.asarray(idx, dtype=np.int64)
+    # Reordering rows doesn't change stats, but dropping or repeating them does.
+    reorder = (
+        len(idx) == mdl.num_rows
+        and (np.bincount(idx, minlength=len(idx)) == 1).all()
+    )
+    for col in mdl.cols:
+        if isinstance(col.arr, DerivedArray):
+            continue
+        if not reorder:
+            col.stats = None
+        if isinstance(col.arr, (EncodedArray, GatherArray)):
+            col.arr = col.arr.take(idx)
+        else:
+            col.arr = np.asarray(col.arr[idx])
+    mdl.num_rows = len(idx)
+    _update_derived(mdl)
+
+
+def insert_rows(mdl, rows, cols):
+    """
+    Inserts rows, given as one array of values per column.  Values for derived
+    columns are ignored.
+
+    @param rows
+      Sorted indices of the inserted rows in the resulting table.
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    assert len(cols) == len(mdl.cols)
+    num_rows = mdl.num_rows + len(rows)
+    # Where each resulting row comes from, in the old and new values.
+    mask = np.zeros(num_rows, dtype=bool)
+    mask[rows] = True
+
+    for col, vals in zip(mdl.cols, cols):
+        if isinstance(col.arr, DerivedArray):
+            continue
+        old = np.asarray(col.arr)
+        vals = np.asarray(vals)
+        arr = np.empty(num_rows, dtype=np.result_type(old, vals))
+        arr[~mask] = old
+        arr[mask] = vals
+        if col.stats is not None:
+            col.stats = col.stats.insert(arr[mask])
+        col.arr = encode(arr) if isinstance(col.arr, EncodedArray) else arr
+    mdl.num_rows = num_rows
+    _update_derived(mdl)
+
+
+def delete_col(mdl, col_idx):
+    """
+    Deletes the column at position `col_idx`.
+    """
+    return mdl.cols.pop(col_idx)
 
 
 def set_col_idx(mdl, col_id, col_idx):
@@ -112,3 +266,109 @@ def set_col_idx(mdl, col_id, col_idx):
     return old_idx
 
 
+
+def _append(arr, new):
+    """
+    Appends `new` to `arr`, growing the underlying buffer geometrically.
+
+    If `arr` is a prefix view of a buffer with spare capacity, `new` is written
+    into the buffer in place.  Other views of the buffer are unaffected, since
+    they don't extend past the end of `arr`.
+    """
+    n0 = len(arr)
+    n1 = n0 + len(new)
+    dtype = np.result_type(arr, new)
+    if dtype.kind == "O" and arr.dtype.kind != "O":
+        # The column is text, so rows converted to numbers are text too.
+        arr = parse.to_text(arr)
+
+    buf = arr.base
+    if not (
+            isinstance(buf, np.ndarray)
+            and buf.ndim == 1
+            and buf.dtype == dtype
+            and len(buf) >= n1
+            and buf.strides == arr.strides
+            and buf.__array_interface__["data"][0]
+                == arr.__array_interface__["data"][0]
+    ):
+        # Keep spilled columns on disk as they grow, unless they've widened
+        # to object, which can't be mapped.
+        alloc = (
+            spill.allocate if spill.is_mapped(arr) and dtype.kind != "O"
+            else np.empty
+        )
+        buf = alloc(max(n1, 2 * n0, 1024), dtype)
+        buf[: n0] = arr
+
+    buf[n0 : n1] = new
+    return buf[: n1]
+
+
+def append_rows(mdl, arrs):
+    """
+    Appends rows, given as one array per column.
+
+    An unloaded or derived column's array is `None`; it grows with the model.
+    """
+    assert len(arrs) == len(mdl.cols)
+    lens = { len(a) for a in arrs if a is not None }
+    if len(lens) > 1:
+        raise ValueError("cols are different lengths")
+    num = lens.pop() if len(lens) > 0 else 0
+
+    for col, arr in zip(mdl.cols, arrs):
+        if arr is not None:
+            if col.stats is not None:
+                col.stats = col.stats.insert(arr)
+            col.arr = _append(col.arr, arr)
+    # Update the row count last, so that concurrent readers never see rows
+    # that aren't in every column yet.
+    mdl.num_rows += num
+    _update_derived(mdl)
+
+
+# Counter for column views.
+_views = itertools.count(1)
+
+def touch_cols(mdl, col_ids):
+    """
+    Marks columns as viewed now.
+    """
+    for col_id in col_ids:
+        mdl.get_col(col_id).viewed = next(_views)
+
+
+def enforce_budget(mdl, keep=()):
+    """
+    Spills the least recently viewed columns to disk, until the columns held
+    in memory fit in the model's memory budget.
+
+    Spilled columns have the same values, so they keep their stats.
+
+    @param keep
+      IDs of columns not to spill, such as those on screen.
+    @return
+      `(old, new)` pairs of replaced arrays.
+    """
+    if mdl.memory_budget is None:
+        return []
+
+    sizes = { c.id: spill.get_size([c.arr]) for c in mdl.cols }
+    size = spill.get_size( c.arr for c in mdl.cols )
+    replaced = []
+    for col in sorted(mdl.cols, key=lambda c: c.viewed):
+        if size <= mdl.memory_budget:
+            break
+        if col.id in keep or sizes[col.id] == 0:
+            continue
+        arr = spill.spill(col.arr)
+        if arr is not None:
+            replaced.append((col.arr, arr))
+            col.arr = arr
+            size -= sizes[col.id]
+    if len(replaced) > 0:
+        _update_derived(mdl)
+    return replaced
+
+
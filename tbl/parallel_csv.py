@@ -0,0 +1,139 @@
+"""
+Parallel CSV parsing.
+
+The file is split into byte ranges aligned to row boundaries, which are parsed
+in separate processes.  Each process infers its own column kinds; these are
+reconciled to the widest kind per column, and the per-range arrays are
+concatenated.  Ranges parsed as numbers in a column that another range widens
+to object are converted back to text.
+
+If fields may contain quoted newlines, row boundaries are found with a
+quote-aware scan of the whole file, which is vectorized but sequential.
+Otherwise, each split point is simply advanced to the next newline.
+"""
+
+#-------------------------------------------------------------------------------
+
+from   concurrent.futures import ProcessPoolExecutor
+import csv
+import io
+import mmap
+import multiprocessing
+import numpy as np
+import os
+
+from   . import parse
+from   .mmap_csv import find_rows
+
+__all__ = (
+    "parse_parallel",
+)
+
+#-------------------------------------------------------------------------------
+
+def split_ranges(buf, num, quoted=True):
+    """
+    Splits a CSV buffer into byte ranges aligned to row boundaries.
+
+    @param num
+      The target number of ranges; fewer may be returned.
+    @param quoted
+      If true, allow for quoted fields containing newlines.
+    @return
+      The end offset of the header row, and an array of boundaries such that
+      range `i` is `[bounds[i], bounds[i + 1])`.
+    """
+    size = len(buf)
+    if quoted:
+        offsets = find_rows(buf, 0, quoted=True)
+        header_end = int(offsets[1]) if len(offsets) > 1 else size
+        targets = np.linspace(header_end, size, num + 1)[1 : -1]
+        splits = offsets[np.searchsorted(offsets, targets)]
+    else:
+        end = buf.find(b"\n")
+        header_end = size if end < 0 else end + 1
+        splits = []
+        for target in np.linspace(header_end, size, num + 1)[1 : -1]:
+            end = buf.find(b"\n", int(target))
+            splits.append(size if end < 0 else end + 1)
+    bounds = np.unique(np.concatenate([[header_end], splits, [size]]))
+    return header_end, bounds.astype(np.int64)
+
+
+def _parse_range(path, start, stop, num_cols, encoding, cols=None):
+    """
+    Parses the rows in a byte range of a file.
+
+    @param cols
+      Indices of columns to parse, or `None` for all.
+    @return
+      Column arrays.
+    """
+    with open(path, "rb") as file:
+        file.seek(start)
+        text = file.read(stop - start).decode(encoding)
+
+    rows = csv.reader(io.StringIO(text, newline=""))
+    width = num_cols if cols is None else len(cols)
+    convert = parse.BatchConverter(width)
+    parts = [ [] for _ in range(width) ]
+    for batch in parse.iter_batches(rows, num_cols, first=65536, cols=cols):
+        for part, arr in zip(parts, convert(batch)):
+            part.append(arr)
+
+    arrs = [
+        parse.concat(p) if len(p) > 0 else np.empty(0, dtype=np.int64)
+        for p in parts
+    ]
+    return arrs
+
+
+def parse_parallel(
+        path, workers=None, *, quoted=True, encoding="utf-8", cols=None):
+    """
+    Parses a CSV file using multiple processes.
+
+    @param workers
+      The number of processes; `None` for the number of CPUs.
+    @param cols
+      Indices of columns to parse, or `None` for all.
+    @return
+      The column names, and arrays for the parsed columns.
+    """
+    workers = os.cpu_count() if workers is None else workers
+
+    with open(path, "rb") as file:
+        if file.seek(0, 2) == 0:
+            return [], []
+        buf = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        # Split into more ranges than workers, for better load balancing.
+        header_end, bounds = split_ranges(buf, 4 * workers, quoted)
+        header = buf[: header_end].decode(encoding)
+    finally:
+        buf.close()
+    names = next(csv.reader(io.StringIO(header, newline="")), [])
+    num_cols = len(names)
+
+    # Don't fork, since we may be running in a thread of a threaded process.
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) \
+            as executor:
+        futures = [
+            executor.submit(
+                _parse_range, str(path), int(start), int(stop), num_cols,
+                encoding, cols)
+            for start, stop in zip(bounds[: -1], bounds[1 :])
+        ]
+        results = [ f.result() for f in futures ]
+
+    # Reconcile column kinds across ranges, and stitch.
+    arrs = []
+    for i in range(num_cols if cols is None else len(cols)):
+        parts = [ a[i] for a in results ]
+        arrs.append(
+            parse.concat(parts) if len(parts) > 0
+            else np.empty(0, dtype=np.int64))
+    return names, arrs
+
+
@@ -0,0 +1,157 @@
+"""
+Native CSV parsing and type inference.
+
+Rows are parsed with the standard `csv` module in batches.  Each batch is
+converted column-by-column to numpy arrays, with vectorized conversions.  A
+column's kind only ever widens, in the order int -> float -> object, so that
+batches of the same column may be concatenated.
+
+A column that widens to object is text, so numbers converted from earlier
+batches are converted back to text.  They're formatted in their shortest
+form, and NaN as an empty string, so their text may be spelled differently
+than in the source; `1.50` becomes `1.5`, as it's shown before widening.
+"""
+
+#-------------------------------------------------------------------------------
+
+import csv
+import itertools
+import numpy as np
+
+#-------------------------------------------------------------------------------
+
+# Column kinds, in widening order.
+KINDS = ("i", "f", "O")
+
+# Strings that are treated as missing values in numeric columns.
+NA_VALUES = ("", "NA", "N/A", "NaN", "nan", "null", "NULL")
+
+def convert(vals, kind="i"):
+    """
+    Converts a sequence of strings to an array.
+
+    @param kind
+      The narrowest kind to try; "i" for int, "f" for float, "O" for object.
+    @return
+      The array and its kind, which may be wider than `kind`.
+    """
+    if kind == "O":
+        return _to_object(vals), "O"
+
+    arr = np.array(vals, dtype=str)
+    if kind == "i":
+        try:
+            return arr.astype(np.int64), "i"
+        except (ValueError, OverflowError):
+            pass
+
+    na = np.isin(arr, NA_VALUES)
+    try:
+        # Don't let numpy parse "inf" and "nan" spellings we don't know about;
+        # it's lenient, which is fine.
+        res = np.where(na, "nan", arr).astype(np.float64)
+    except ValueError:
+        return _to_object(vals), "O"
+    else:
+        return res, "f"
+
+
+def _to_object(vals):
+    arr = np.empty(len(vals), dtype=object)
+    arr[:] = vals
+    return arr
+
+
+def to_text(arr):
+    """
+    Converts numbers converted from text back to text, as an object array.
+
+    Object arrays are returned unchanged.
+    """
+    arr = np.asarray(arr)
+    if arr.dtype.kind == "O":
+        return arr
+    text = arr.astype(str)
+    if arr.dtype.kind == "f":
+        text[np.isnan(arr)] = ""
+    return text.astype(object)
+
+
+def concat(arrs):
+    """
+    Concatenates converted batches of a column, converting them to the widest
+    kind among them.
+    """
+    dtype = np.result_type(*arrs)
+    if dtype.kind == "O":
+        arrs = [ to_text(a) for a in arrs ]
+    return np.concatenate([ a.astype(dtype, copy=False) for a in arrs ])
+
+
+def widen(kind0, kind1):
+    """
+    Returns the wider of two kinds.
+    """
+    return KINDS[max(KINDS.index(kind0), KINDS.index(kind1))]
+
+
+def iter_batches(rows, num_cols, first=1024, size=65536, cols=None):
+    """
+    Groups rows into batches, transposed to columns of strings.
+
+    Short rows are padded with empty strings; long rows are truncated.
+
+    @param first
+      Number of rows in the first batch, which is kept small so that it is
+      available quickly.
+    @param size
+      Number of rows in each subsequent batch.
+    @param cols
+      Indices of columns to include, or `None` for all.
+    """
+    n = first
+    while True:
+        batch = list(itertools.islice(rows, n))
+        if len(batch) == 0:
+            break
+        for i, row in enumerate(batch):
+            if len(row) != num_cols:
+                batch[i] = row = (list(row) + [""] * num_cols)[: num_cols]
+            if cols is not None:
+                # Project before transposing, which is the costly part.
+                batch[i] = [ row[c] for c in cols ]
+        width = num_cols if cols is None else len(cols)
+        yield list(zip(*batch)) if width > 0 else []
+        n = size
+
+
+class BatchConverter:
+    """
+    Converts batches of string columns to arrays, tracking each column's kind.
+    """
+
+    def __init__(self, num_cols):
+        self.kinds = ["i"] * num_cols
+
+
+    def __call__(self, batch):
+        arrs = []
+        for i, vals in enumerate(batch):
+            arr, self.kinds[i] = convert(vals, self.kinds[i])
+            arrs.append(arr)
+        return arrs
+
+
+
+def reader(file):
+    """
+    Returns a CSV reader and the header names.
+    """
+    rows = csv.reader(file)
+    try:
+        names = next(rows)
+    except StopIteration:
+        names = []
+    return rows, names
+
+
@@ -0,0 +1,284 @@
+"""
+Row filters, as vectorized expressions over columns.
+
+A filter expression is Python expression syntax over column names, for
+example,
+
+    price > 100 and region == "EU"
+
+Columns whose names aren't identifiers are referenced as `col("unit price")`.
+Supported are constants, arithmetic, comparisons (including chained, and `in`
+or `not in` a list of constants), and `and`, `or`, and `not`, which apply to
+columns elementwise.
+
+An expression is compiled to a function of column arrays, which is evaluated
+a chunk of rows at a time, to limit temporary memory.  The result is an index
+array of the rows for which the expression is true.
+
+The same expressions compute the values of derived columns; see `derived`.
+"""
+
+#-------------------------------------------------------------------------------
+
+import ast
+from   functools import reduce
+import numpy as np
+import operator
+
+from   .lazy import Unloaded
+from   .lib.cache import ArrayCache
+
+__all__ = (
+    "Query",
+    "get_cols",
+    "get_rows",
+)
+
+#-------------------------------------------------------------------------------
+
+# Number of rows per chunk when evaluating.
+CHUNK_SIZE = 1 << 18
+
+# Number of filter results to cache.
+CACHE_SIZE = 8
+
+_BIN_OPS = {
+    ast.Add         : operator.add,
+    ast.Sub         : operator.sub,
+    ast.Mult        : operator.mul,
+    ast.Div         : operator.truediv,
+    ast.FloorDiv    : operator.floordiv,
+    ast.Mod         : operator.mod,
+    ast.Pow         : operator.pow,
+}
+
+_CMP_OPS = {
+    ast.Eq          : operator.eq,
+    ast.NotEq       : operator.ne,
+    ast.Lt          : operator.lt,
+    ast.LtE         : operator.le,
+    ast.Gt          : operator.gt,
+    ast.GtE         : operator.ge,
+}
+
+def _is_in(vals, options):
+    return reduce(np.logical_or, ( vals == o for o in options ), False)
+
+
+class Query:
+    """
+    A compiled filter expression.
+    """
+
+    def __init__(self, expr):
+        """
+        @raise ValueError
+          The expression is invalid.
+        """
+        self.expr = expr
+        # Names of columns referenced.
+        self.names = set()
+        try:
+            tree = ast.parse(expr.strip(), mode="eval")
+        except SyntaxError as exc:
+            raise ValueError("invalid expression: {}".format(exc.msg))
+        self.__fn = self.__compile(tree.body)
+
+
+    def __repr__(self):
+        return "{}({!r})".format(self.__class__.__name__, self.expr)
+
+
+    def __compile(self, node):
+        """
+        Compiles an expression node to a function of column arrays.
+        """
+        compile = self.__compile
+
+        if isinstance(node, ast.Constant):
+            val = node.value
+            return lambda cols: val
+
+        elif isinstance(node, ast.Name):
+            return self.__column(node.id)
+
+        elif (
+                isinstance(node, ast.Call)
+                and isinstance(node.func, ast.Name)
+                and node.func.id == "col"
+                and len(node.args) == 1
+                and len(node.keywords) == 0
+                and isinstance(node.args[0], ast.Constant)
+                and isinstance(node.args[0].value, str)
+        ):
+            return self.__column(node.args[0].value)
+
+        elif isinstance(node, ast.BoolOp):
+            fn = np.logical_and if isinstance(node.op, ast.And) \
+                 else np.logical_or
+            args = [ compile(v) for v in node.values ]
+            return lambda cols: reduce(fn, ( a(cols) for a in args ))
+
+        elif isinstance(node, ast.UnaryOp):
+            fn = {
+                ast.Not     : np.logical_not,
+                ast.USub    : operator.neg,
+                ast.UAdd    : operator.pos,
+            }.get(type(node.op))
+            if fn is not None:
+                arg = compile(node.operand)
+                return lambda cols: fn(arg(cols))
+
+        elif isinstance(node, ast.BinOp):
+            fn = _BIN_OPS.get(type(node.op))
+            if fn is not None:
+                left, right = compile(node.left), compile(node.right)
+                return lambda cols: fn(left(cols), right(cols))
+
+        elif isinstance(node, ast.Compare):
+            args = [ compile(node.left) ]
+            fns = []
+            for op, arg in zip(node.ops, node.comparators):
+                if isinstance(op, (ast.In, ast.NotIn)):
+                    try:
+                        options = list(ast.literal_eval(arg))
+                    except (TypeError, ValueError):
+                        raise ValueError("'in' requires a list of constants")
+                    args.append(lambda cols, o=options: o)
+                    fns.append(
+                        _is_in if isinstance(op, ast.In)
+                        else lambda v, o: np.logical_not(_is_in(v, o)))
+                else:
+                    args.append(compile(arg))
+                    fns.append(_CMP_OPS[type(op)])
+
+            def compare(cols):
+                # Evaluate each operand once, for chained comparisons.
+                vals = [ a(cols) for a in args ]
+                return reduce(np.logical_and, (
+                    fn(l, r) for fn, l, r in zip(fns, vals, vals[1 :]) ))
+
+            return compare
+
+        raise ValueError(
+            "unsupported in filter: {}".format(ast.get_source_segment(
+                self.expr.strip(), node) or type(node).__name__))
+
+
+    def __column(self, name):
+        self.names.add(name)
+        return lambda cols: cols[name]
+
+
+    def evaluate(self, cols, num_rows, dtype=None):
+        """
+        Evaluates the expression.
+
+        @param cols
+          Mapping from column name to array of values.
+        @return
+          An array of the expression's value for each row.
+        """
+        try:
+            with np.errstate(all="ignore"):
+                res = self.__fn(cols)
+        except (TypeError, ArithmeticError) as exc:
+            # Object values may raise, such as when dividing by zero.
+            raise ValueError("can't evaluate {}: {}".format(self.expr, exc))
+        # Constant expressions, or comparisons numpy can't vectorize, may
+        # give a scalar.
+        return np.broadcast_to(np.asarray(res, dtype=dtype), (num_rows, ))
+
+
+    def __call__(self, cols, num_rows):
+        """
+        Evaluates the query.
+
+        @param cols
+          Mapping from column name to array of values.
+        @return
+          A bool mask of rows for which the query is true.
+        """
+        return self.evaluate(cols, num_rows, dtype=bool)
+
+
+
+#-------------------------------------------------------------------------------
+
+_results = ArrayCache(CACHE_SIZE)
+
+def get_cols(mdl, names):
+    """
+    Returns the columns referenced by name.
+
+    @return
+      A mapping from name to column.
+    @raise ValueError
+      A name doesn't refer to exactly one column.
+    """
+    cols = {}
+    for name in names:
+        matches = [ c for c in mdl.cols if c.name == name ]
+        if len(matches) == 0:
+            raise ValueError("no column: {}".format(name))
+        elif len(matches) > 1:
+            raise ValueError("duplicate column: {}".format(name))
+        cols[name], = matches
+    return cols
+
+
+def _get_arrs(mdl, names):
+    arrs = { n: c.arr for n, c in get_cols(mdl, names).items() }
+    for name, arr in arrs.items():
+        if isinstance(arr, Unloaded):
+            raise ValueError("column isn't loaded: {}".format(name))
+    return arrs
+
+
+def _evaluate(query, arrs, rows):
+    """
+    Returns the `rows` for which `query` is true, evaluating a chunk at a
+    time.
+    """
+    parts = []
+    for start in range(0, len(rows), CHUNK_SIZE):
+        chunk = rows[start : start + CHUNK_SIZE]
+        if isinstance(chunk, range):
+            # Contiguous rows, which we can slice without copying.
+            sel = slice(chunk.start, chunk.stop)
+            chunk = np.arange(chunk.start, chunk.stop)
+        else:
+            sel = chunk
+        cols = { n: np.asarray(a[sel]) for n, a in arrs.items() }
+        parts.append(chunk[query(cols, len(chunk))])
+    return (
+        np.concatenate(parts) if len(parts) > 0
+        else np.empty(0, dtype=np.int64)
+    )
+
+
+def get_rows(mdl, queries):
+    """
+    Returns the model rows that pass all queries.
+
+    Each query is evaluated only on the rows that pass the ones before it.
+    Results are cached.
+
+    @return
+      An array of model row indices, or `None` if there are no queries.
+    @raise ValueError
+      A query can't be evaluated.
+    """
+    rows = None
+    # The result of each query depends on the queries before it.
+    key = (mdl.num_rows, )
+    held = ()
+    for query in queries:
+        arrs = _get_arrs(mdl, sorted(query.names))
+        key += (query.expr, ) + tuple( id(a) for a in arrs.values() )
+        held += tuple(arrs.values())
+        prev = range(mdl.num_rows) if rows is None else rows
+        rows = _results.get(key, held, lambda: _evaluate(query, arrs, prev))
+    return rows
+
+
@@ -12,7 +12,9 @@ import logging
 import numpy as np
 import os
 
-from   . import commands, keymap, view
+from   . import commands, counts, group, io, jobs, keymap, model, search
+from   . import stats, view
+from   .controller import Controller
 from   .curses_keyboard import get_key
 from   .lib import log
 from   .text import pad, palide
@@ -97,6 +99,9 @@ def init_attrs():
     curses.init_pair(4, curses.COLOR_RED, -1)
     Attrs.error = curses.color_pair(4)
 
+    curses.init_pair(5, curses.COLOR_BLACK, curses.COLOR_YELLOW)
+    Attrs.selected = curses.color_pair(5)
+
     Attrs.status = Attrs.normal | curses.A_REVERSE
     Attrs.cmd = Attrs.normal | curses.A_REVERSE
 
@@ -136,7 +141,7 @@ def render_output(win, vw):
     for line in lines:
         # FIXME: Writing the bottom-right corner causes an error, which is
         # why we use x - 1.
-        win.addstr(y, 0, pad(line, x - 1), attr)
+        win.addstr(y, 0, palide(line, x - 1), attr)
         y += 1
 
 
@@ -144,28 +149,35 @@ def render_table(win, vw, mdl):
     """
     Renders `mdl` with view `vw` in curses `win`.
     """
-    # Rebuild the layout.
-    vw.layout = view.Layout(vw)
-    vw.layout.num_rows = mdl.num_rows
-
     # Row numbers to draw.  
-    num_rows = mdl.num_rows - vw.scr.y
+    num_rows = view.get_num_rows(vw, mdl) - vw.scr.y
     max_rows = vw.size.y - 1 if vw.show_header else vw.size.y
     num_rows = min(max_rows, num_rows)
     rows = np.arange(num_rows) + vw.scr.y
+
+    # Formatters were chosen from samples; widen them for values that don't
+    # fit.  Then rebuild the layout.
+    view.widen_formatters(vw, mdl, vw.scr.y, vw.scr.y + num_rows)
+    vw.layout = view.Layout(vw)
+    vw.layout.num_rows = view.get_num_rows(vw, mdl)
+    # The model rows displayed in these rows.
+    model_rows = view.get_model_rows(vw, rows)
     if vw.show_header:
         rows = np.concatenate([[-1], rows])
+        model_rows = np.concatenate([[-1], model_rows])
 
     # The padding at the left and right of each field value.
     pad = " " * vw.pad
+    selected = { r for r in rows if r in vw.selection }
 
     # Draw columns.
     for c, x, w, trim, name, fmt, arr in view._rendered_cols(vw, mdl):
-        for y, row in enumerate(rows):
+        for y, (row, model_row) in enumerate(zip(rows, model_rows)):
             attr = (
                      Attrs.cur_pos if c == vw.cur.c and row == vw.cur.r
                 else Attrs.cur_col if c == vw.cur.c
                 else Attrs.cur_row if                   row == vw.cur.r
+                else Attrs.selected if                  row in selected
                 else Attrs.normal
             )
             # FIXME: Draw headers in a separate loop.
@@ -174,13 +186,17 @@ def render_table(win, vw, mdl):
                 text = palide(name, w, elide_pos=0.7)
                 attr |= curses.A_UNDERLINE
             else:
-                text = pad + fmt(arr[row]) + pad
+                text = pad + fmt(arr[model_row]) + pad
             win.addstr(y, x, text[trim], attr)
 
     # Draw text.
     for x, w, text in view._rendered_text(vw, mdl):
         for y, row in enumerate(rows):
-            attr = Attrs.cur_row if row == vw.cur.r else Attrs.normal
+            attr = (
+                     Attrs.cur_row if row == vw.cur.r
+                else Attrs.selected if row in selected
+                else Attrs.normal
+            )
             win.addstr(y, x, text, attr)
 
 
@@ -232,13 +248,17 @@ def read_input(win, vw, prompt=""):
 
 #-------------------------------------------------------------------------------
 
-def next_cmd(vw, win, key_map):
+def next_cmd(vw, win, key_map, timeout=None):
     """
     Waits for, then processes the next UI event according to key_map.
 
     Handles multi-character key combos; collects prefix keys until either
     a complete combo is processed or an input error occurs.
 
+    @param timeout
+      Maximum time to wait for an event before returning `None`, so that the
+      screen may be redrawn; `None` to wait indefinitely.
+
     @raise KeyboardInterrupt
       The program should terminate.
     """
@@ -248,11 +268,18 @@ def next_cmd(vw, win, key_map):
     # Loop until we have a complete combo.
     while True:
         # Show the combo prefix so far.
-        vw.output = " ".join(prefix) + " ..." if len(prefix) > 0 else None
+        if len(prefix) > 0:
+            vw.output = " ".join(prefix) + " ..."
 
         # Wait for the next UI event.
         render_output(win, vw)
-        key, arg = get_key(win)
+        key, arg = get_key(win, timeout=timeout)
+        if key == "TIMEOUT":
+            if len(prefix) > 0:
+                # Don't interrupt a combo.
+                continue
+            else:
+                return None
         logging.debug("key: {!r} {!r}".format(key, arg))
         vw.output = vw.error = None
 
@@ -295,6 +322,8 @@ def main_loop(mdl, vw, ctl):
         "vw"    : vw, 
         "ctl"   : ctl,
     }
+    # Tables under the current one, opened from commands, as `cmd_args`.
+    tables = []
 
     with log.replay(), curses_screen() as win:
         sy, sx = win.getmaxyx()
@@ -302,9 +331,45 @@ def main_loop(mdl, vw, ctl):
 
         input = partial(read_input, win, vw)
 
+        def switch(args):
+            nonlocal mdl, vw, ctl, input
+            # The screen may have been resized since the table was shown.
+            args["vw"].set_screen_size(*vw.screen_size)
+            cmd_args.update(args)
+            mdl, vw, ctl = args["mdl"], args["vw"], args["ctl"]
+            input = partial(read_input, win, vw)
+
+        def open_table(result):
+            # Open the new table on top of this one.
+            tables.append(dict(cmd_args))
+            new_mdl, new_vw = result.table
+            switch({"mdl": new_mdl, "vw": new_vw, "ctl": Controller()})
+
         while True:
+            # Report on finished background jobs.  A job that computes a
+            # table returns a `CmdResult`, whose table is opened now.
+            for job in jobs.reap():
+                if job.error is not None:
+                    vw.error = "error: {}: {}".format(job.name, job.error)
+                elif isinstance(job.result, commands.CmdResult):
+                    if job.result.table is not None:
+                        open_table(job.result)
+                    if job.result.msg is not None:
+                        vw.output = job.result.msg
+                elif job.msg is not None:
+                    vw.output = job.msg
+
+            # Account for edits and rows appended since the last render.
+            view.update_cols(vw, mdl)
+            view.update_rows(vw, mdl)
+            # Jump to a search hit, if one has been found.
+            search.update(vw, mdl)
+
             # Construct the status bar contents.
             sl, sr = view.get_status(vw, mdl)
+            busy = [ j.status for j in jobs.running if j.status is not None ]
+            if len(busy) > 0:
+                sr = " ".join(busy) + " " + sr
             extra = vw.size.x - len(sl) - len(sr)
             if extra >= 0:
                 vw.status = sl + " " * extra + sr
@@ -314,9 +379,23 @@ def main_loop(mdl, vw, ctl):
             # Render the screen.
             win.erase()
             render_screen(win, vw, mdl)
-            # Process the next UI event.
+            # Load unloaded columns as they scroll into view.
+            screen_ids = [ vw.cols[c].col_id for c in view.get_screen_cols(vw) ]
+            io.load_columns(mdl, screen_ids)
+            # Spill columns not viewed recently, if over the memory budget.
+            # While loading, the loader does this.
+            model.touch_cols(mdl, screen_ids)
+            if not mdl.loading:
+                ctl.history.replace_arrays(
+                    model.enforce_budget(mdl, keep=screen_ids))
+            # Compute stats of the current column, for the status bar, if
+            # it's held in memory.
+            stats.compute_stats(mdl, [vw.cols[vw.cur.c].col_id])
+            # Process the next UI event.  While jobs are running, wake up
+            # periodically to redraw their progress.
+            timeout = 0.25 if len(jobs.running) > 0 else None
             try:
-                cmd_name = next_cmd(vw, win, key_map)
+                cmd_name = next_cmd(vw, win, key_map, timeout)
             except KeyboardInterrupt:
                 break
 
@@ -335,6 +414,10 @@ def main_loop(mdl, vw, ctl):
             try:
                 result = commands.run(cmd_name, cmd_args, input)
             except KeyboardInterrupt:
+                if len(tables) > 0:
+                    # Close the table, and return to the one under it.
+                    switch(tables.pop())
+                    continue
                 # Exit the loop.
                 break
             except InputAbort:
@@ -345,6 +428,8 @@ def main_loop(mdl, vw, ctl):
                 curses.beep()
             else:
                 logging.info("command result: {}".format(result))
+                if result.table is not None:
+                    open_table(result)
                 if result.msg is not None:
                     vw.output = result.msg
 
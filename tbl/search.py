@@ -0,0 +1,192 @@
+"""
+Incremental search in the current column.
+
+A search scans the displayed rows of a column in a background job, a chunk
+at a time, starting from the cursor and wrapping around.  The cursor jumps to
+the first hit as soon as it's found, while the job keeps counting hits in the
+rest of the column.
+
+A pattern `/.../` is a regular expression.  Otherwise, in a numeric column, a
+pattern that's a number matches equal values; else, the pattern matches
+values that contain it as a substring.
+"""
+
+#-------------------------------------------------------------------------------
+
+import numpy as np
+import re
+
+from   . import jobs, view
+from   .commands import command, CmdError, CmdResult
+
+__all__ = (
+    "Search",
+    "get_matcher",
+    "update",
+)
+
+#-------------------------------------------------------------------------------
+
+# Number of rows per chunk when scanning.
+CHUNK_SIZE = 1 << 16
+
+def get_matcher(pattern, dtype):
+    """
+    Returns a function that matches an array of values against `pattern`.
+
+    @return
+      A function that takes an array and returns a bool mask of matches.
+    @raise ValueError
+      The pattern is invalid.
+    """
+    if len(pattern) >= 2 and pattern[0] == pattern[-1] == "/":
+        try:
+            regex = re.compile(pattern[1 : -1])
+        except re.error as exc:
+            raise ValueError("invalid regex: {}".format(exc))
+        search = np.frompyfunc(lambda v: regex.search(str(v)) is not None, 1, 1)
+        return lambda vals: search(vals).astype(bool)
+
+    if dtype.kind in "biuf":
+        try:
+            num = float(pattern)
+        except ValueError:
+            pass
+        else:
+            return lambda vals: vals == num
+
+    return lambda vals: np.char.find(vals.astype(str), pattern) >= 0
+
+
+def _get_chunks(start, stop, forward):
+    """
+    Returns chunks of rows `[start, stop)`, in scan order.
+    """
+    starts = range(start, stop, CHUNK_SIZE)
+    chunks = [ (s, min(s + CHUNK_SIZE, stop)) for s in starts ]
+    return chunks if forward else chunks[:: -1]
+
+
+class Search:
+    """
+    A search in progress.
+    """
+
+    def __init__(self, pattern, col_id, forward, row):
+        self.pattern    = pattern
+        self.col_id     = col_id
+        self.forward    = forward
+        # The displayed row at which the search started.
+        self.row        = row
+        # The first hit, as a displayed row, once found.
+        self.hit        = None
+        # True once the cursor has jumped to the hit.
+        self.moved      = False
+        self.num_hits   = 0
+        self.job        = None
+        # The column and displayed rows searched.
+        self.arr        = None
+        self.rows       = None
+
+
+    def __run(self, job, match, num_rows):
+        r = self.row
+        if self.forward:
+            # After the cursor, then wrap around.
+            chunks = _get_chunks(r + 1, num_rows, True) \
+                   + _get_chunks(0, r + 1, True)
+        else:
+            # Before the cursor, then wrap around.
+            chunks = _get_chunks(0, r, False) \
+                   + _get_chunks(r, num_rows, False)
+
+        name = "search {!r}".format(self.pattern)
+        for i, (start, stop) in enumerate(chunks):
+            if job.cancelled:
+                return
+            job.status = "{}: {} hits {:.0%}".format(
+                name, self.num_hits, i / len(chunks))
+            sel = slice(start, stop) if self.rows is None \
+                  else self.rows[start : stop]
+            hits = np.flatnonzero(match(np.asarray(self.arr[sel])))
+            if len(hits) > 0 and self.hit is None:
+                self.hit = start + int(hits[0] if self.forward else hits[-1])
+            self.num_hits += len(hits)
+
+        job.msg = "{}: {} hits".format(name, self.num_hits)
+
+
+    def start(self, mdl, vw):
+        self.arr = mdl.get_col(self.col_id).arr
+        self.rows = vw.rows
+        match = get_matcher(self.pattern, self.arr.dtype)
+        self.job = jobs.start(
+            "search", self.__run, match, view.get_num_rows(vw, mdl))
+        return self
+
+
+
+def update(vw, mdl):
+    """
+    Moves the cursor to the first hit of the view's search, once it's found.
+    """
+    search = vw.search
+    if search is None or search.moved or search.hit is None:
+        return
+    search.moved = True
+    # Don't jump if the column or rows have changed since the search started.
+    if (
+            vw.rows is search.rows
+            and vw.cols[vw.cur.c].col_id == search.col_id
+            and mdl.get_col(search.col_id).arr is search.arr
+    ):
+        view.move_cur_to(vw, r=search.hit)
+
+
+#-------------------------------------------------------------------------------
+# Commands
+
+def _search(vw, mdl, pattern, forward):
+    if vw.search is not None:
+        vw.search.job.cancel()
+        if pattern == "":
+            # Repeat the last search.
+            pattern = vw.search.pattern
+    if pattern == "":
+        raise CmdError("no pattern")
+    if view.get_num_rows(vw, mdl) == 0:
+        raise CmdError("no rows")
+
+    col_id = vw.cols[vw.cur.c].col_id
+    try:
+        vw.search = Search(pattern, col_id, forward, vw.cur.r).start(mdl, vw)
+    except ValueError as exc:
+        raise CmdError(str(exc))
+
+
+@command()
+def search_forward(vw, mdl, pattern):
+    _search(vw, mdl, pattern, True)
+
+
+@command()
+def search_backward(vw, mdl, pattern):
+    _search(vw, mdl, pattern, False)
+
+
+@command()
+def cancel(vw):
+    """
+    Cancels a search in progress, and returns the cursor to where it started.
+    """
+    search = vw.search
+    if search is None or search.job.done:
+        raise CmdError("nothing to cancel")
+    search.job.cancel()
+    if search.moved:
+        view.move_cur_to(vw, r=search.row)
+    # Don't jump later, either.
+    search.moved = True
+    return CmdResult(msg="search cancelled")
+
+
@@ -0,0 +1,167 @@
+"""
+Row selections, as sets of intervals.
+
+A selection is stored as sorted, disjoint half-open intervals of rows, so
+that selecting a range of millions of rows is as cheap as selecting one.
+Operations on selections are vectorized over intervals, and convert to and
+from bool masks and index arrays for vectorized operations over rows.
+"""
+
+#-------------------------------------------------------------------------------
+
+import numpy as np
+
+__all__ = (
+    "Selection",
+    "from_runs",
+    "to_runs",
+)
+
+#-------------------------------------------------------------------------------
+
+def _normalize(starts, stops):
+    """
+    Sorts intervals, drops empty ones, and merges overlapping or adjacent ones.
+    """
+    starts = np.asarray(starts, dtype=np.int64)
+    stops = np.asarray(stops, dtype=np.int64)
+    keep = starts < stops
+    starts, stops = starts[keep], stops[keep]
+    order = np.argsort(starts, kind="stable")
+    starts, stops = starts[order], stops[order]
+    if len(starts) == 0:
+        return starts, stops
+    # An interval starts a new group unless it touches the ones before it.
+    ends = np.maximum.accumulate(stops)
+    new = np.concatenate([[True], starts[1 :] > ends[: -1]])
+    groups = np.flatnonzero(new)
+    last = np.append(groups[1 :], len(starts)) - 1
+    return starts[groups], ends[last]
+
+
+class Selection:
+    """
+    A set of rows.
+    """
+
+    def __init__(self, starts=(), stops=()):
+        self.starts, self.stops = _normalize(starts, stops)
+
+
+    @classmethod
+    def from_mask(Class, mask):
+        """
+        Returns the selection of rows where `mask` is true.
+        """
+        edges = np.diff(np.asarray(mask, dtype=np.int8), prepend=0, append=0)
+        return Class(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1))
+
+
+    def __repr__(self):
+        return "{}({}, {})".format(
+            self.__class__.__name__, self.starts.tolist(), self.stops.tolist())
+
+
+    def __len__(self):
+        """
+        The number of selected rows.
+        """
+        return int((self.stops - self.starts).sum())
+
+
+    def __contains__(self, row):
+        i = np.searchsorted(self.stops, row, side="right")
+        return bool(i < len(self.starts) and self.starts[i] <= row)
+
+
+    def count(self, start, stop):
+        """
+        Returns the number of selected rows in `[start, stop)`.
+        """
+        lens = np.minimum(self.stops, stop) - np.maximum(self.starts, start)
+        return int(np.maximum(lens, 0).sum())
+
+
+    def add(self, start, stop):
+        """
+        Selects rows `[start, stop)`.
+        """
+        self.starts, self.stops = _normalize(
+            np.append(self.starts, start), np.append(self.stops, stop))
+
+
+    def remove(self, start, stop):
+        """
+        Deselects rows `[start, stop)`.
+        """
+        # Keep the parts of each interval before and after the range.
+        self.starts, self.stops = _normalize(
+            np.concatenate([self.starts, np.maximum(self.starts, stop)]),
+            np.concatenate([np.minimum(self.stops, start), self.stops]))
+
+
+    def clear(self):
+        self.starts, self.stops = _normalize((), ())
+
+
+    def clip(self, num_rows):
+        """
+        Deselects rows at or past `num_rows`.
+        """
+        # Intervals are sorted, so the last stops last.
+        if len(self.stops) > 0 and self.stops[-1] > num_rows:
+            self.remove(num_rows, self.stops[-1])
+
+
+    def get_mask(self, num_rows):
+        """
+        Returns a bool mask of selected rows.
+        """
+        edges = np.zeros(num_rows + 1, dtype=np.int8)
+        np.add.at(edges, np.minimum(self.starts, num_rows), 1)
+        np.add.at(edges, np.minimum(self.stops, num_rows), -1)
+        return np.cumsum(edges[: -1]).astype(bool)
+
+
+    def get_indices(self):
+        """
+        Returns the selected rows, in order.
+        """
+        return from_runs(np.stack([self.starts, self.stops], axis=1))
+
+
+
+#-------------------------------------------------------------------------------
+
+def to_runs(idx):
+    """
+    Compresses an index array to runs of consecutive indices.
+
+    @return
+      A list of `[start, stop]` pairs.
+    """
+    idx = np.asarray(idx, dtype=np.int64)
+    if len(idx) == 0:
+        return []
+    breaks = np.flatnonzero(np.diff(idx) != 1) + 1
+    starts = idx[np.concatenate([[0], breaks])]
+    stops = idx[np.append(breaks, len(idx)) - 1] + 1
+    return np.stack([starts, stops], axis=1).tolist()
+
+
+def from_runs(runs):
+    """
+    Expands runs of consecutive indices to an index array.
+
+    @param runs
+      `[start, stop]` pairs, as a sequence or an array.
+    """
+    runs = np.asarray(runs, dtype=np.int64).reshape(-1, 2)
+    starts, stops = runs[:, 0], runs[:, 1]
+    lens = stops - starts
+    # Each index is its position, shifted by its run's start less the lengths
+    # of the runs before it.
+    shift = starts - (np.cumsum(lens) - lens)
+    return np.arange(lens.sum(), dtype=np.int64) + np.repeat(shift, lens)
+
+
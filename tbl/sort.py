@@ -0,0 +1,153 @@
+"""
+Sorting, as row permutations.
+
+Sorting a table doesn't reorder its column arrays.  Instead, the view holds a
+permutation: an index array of model rows in sorted order.  Sorts are stable,
+and may have multiple keys; null values sort last, in either direction.
+
+Each sort key column is ranked once, which also gives its order in either
+direction; multi-key sorts combine ranks.  Permutations are cached by key set,
+keyed on the identities of the column arrays; since edits replace arrays
+rather than modifying them, an edit invalidates the cached results for the
+columns it touches.
+"""
+
+#-------------------------------------------------------------------------------
+
+import numpy as np
+
+from   .encoding import DictArray
+from   .lazy import Unloaded
+from   .lib.cache import ArrayCache
+from   .selection import from_runs
+from   .stats import get_nulls
+
+__all__ = (
+    "get_order",
+    "get_ranks",
+)
+
+#-------------------------------------------------------------------------------
+
+# Number of ranked columns to cache.
+RANK_CACHE_SIZE = 4
+
+# Number of sort permutations to cache.
+ORDER_CACHE_SIZE = 4
+
+_ranked = ArrayCache(RANK_CACHE_SIZE)
+_orders = ArrayCache(ORDER_CACHE_SIZE)
+
+class _Ranked:
+    """
+    A column's dense value ranks, with nulls ranked last, and its ascending
+    sort order.
+    """
+
+    def __init__(self, ranks, null_rank, order):
+        self.ranks      = ranks
+        self.null_rank  = null_rank
+        self.order      = order
+
+
+    @classmethod
+    def from_array(Class, arr):
+        if isinstance(arr, DictArray):
+            # Rank the distinct values only.
+            values = Class.from_array(arr.values)
+            ranks = values.ranks[arr.codes]
+            # Ranks are small ints, for which a stable sort is a radix sort.
+            order = np.argsort(ranks, kind="stable")
+            return Class(ranks, values.null_rank, order)
+
+        vals = np.asarray(arr)
+        nulls = get_nulls(vals)
+        idx = np.flatnonzero(~nulls)
+        try:
+            idx = idx[np.argsort(vals[idx], kind="stable")]
+        except TypeError:
+            raise ValueError("values aren't comparable")
+        svals = vals[idx]
+        new = np.ones(len(svals), dtype=bool)
+        new[1 :] = svals[1 :] != svals[: -1]
+        null_rank = int(new.sum())
+        ranks = np.full(len(vals), null_rank, dtype=np.int64)
+        ranks[idx] = np.cumsum(new) - 1
+        return Class(ranks, null_rank, np.append(idx, np.flatnonzero(nulls)))
+
+
+    def get_ranks(self, descending):
+        if descending:
+            # Reverse ranks, but keep nulls last.
+            return np.where(
+                self.ranks == self.null_rank,
+                self.null_rank, self.null_rank - 1 - self.ranks)
+        else:
+            return self.ranks
+
+
+    def get_order(self, descending):
+        if not descending:
+            return self.order
+        # Reverse the runs of equal values in the ascending order, keeping
+        # the order within each run, and nulls last.
+        sranks = self.ranks[self.order]
+        starts = np.flatnonzero(np.diff(sranks, prepend=-1) != 0)
+        stops = np.append(starts[1 :], len(sranks))
+        runs = np.stack([starts, stops], axis=1)
+        nulls = len(runs) > 0 and sranks[-1] == self.null_rank
+        if nulls:
+            runs = np.concatenate([runs[-2 :: -1], runs[-1 :]])
+        else:
+            runs = runs[:: -1]
+        return self.order[from_runs(runs)]
+
+
+
+def _get_ranked(arr):
+    return _ranked.get(id(arr), arr, lambda: _Ranked.from_array(arr))
+
+
+def get_ranks(arr):
+    """
+    Returns dense ranks of an array's values, in ascending order, with nulls
+    ranked last.
+
+    @return
+      The ranks, and the rank of nulls, which is the number of distinct
+      non-null values.
+    @raise ValueError
+      The values can't be ranked.
+    """
+    ranked = _get_ranked(arr)
+    return ranked.ranks, ranked.null_rank
+
+
+def get_order(mdl, keys):
+    """
+    Returns the permutation that sorts a model's rows.
+
+    @param keys
+      Sort keys, as `(col_id, descending)` pairs, most significant first.
+    @return
+      Model row indices in sorted order.
+    @raise ValueError
+      A key column can't be sorted.
+    """
+    keys = tuple(keys)
+    arrs = tuple( mdl.get_col(i).arr for i, _ in keys )
+    for arr in arrs:
+        if isinstance(arr, Unloaded):
+            raise ValueError("column isn't loaded")
+
+    def sort():
+        if len(keys) == 1:
+            return _get_ranked(arrs[0]).get_order(keys[0][1])
+        ranks = [
+            _get_ranked(a).get_ranks(d) for a, (_, d) in zip(arrs, keys) ]
+        # lexsort's last key is the most significant.
+        return np.lexsort(ranks[:: -1])
+
+    return _orders.get((keys, tuple( id(a) for a in arrs )), arrs, sort)
+
+
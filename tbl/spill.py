@@ -0,0 +1,116 @@
+"""
+Spilling column arrays to disk.
+
+A spilled array is a `np.memmap` of an anonymous temporary file, which the
+OS deletes once the array is no longer referenced.  Since a memmap is a
+numpy array, a spilled column is used exactly as before; the OS pages its
+values back in as they're read, for rendering or queries, and may evict them
+again under memory pressure, since they're backed by the file.
+
+Spilled arrays are allocated with spare capacity, like appended columns, so
+that a column spilled while loading keeps growing on disk.
+
+Object arrays can't be mapped, so only numeric and fixed-width columns, and
+the codes of dictionary-encoded columns, are spilled.
+"""
+
+#-------------------------------------------------------------------------------
+
+import mmap
+import numpy as np
+import tempfile
+
+from   .chunked import ChunkedArray
+from   .encoding import DictArray, RLEArray
+
+__all__ = (
+    "allocate",
+    "get_size",
+    "is_mapped",
+    "spill",
+)
+
+#-------------------------------------------------------------------------------
+
+# Directory for spill files, or `None` for the system temporary directory.
+SPILL_DIR = None
+
+def allocate(num, dtype):
+    """
+    Returns a new array of `num` values on disk.
+    """
+    dtype = np.dtype(dtype)
+    if num == 0 or dtype.itemsize == 0:
+        return np.empty(num, dtype=dtype)
+    with tempfile.TemporaryFile(dir=SPILL_DIR) as file:
+        # The map keeps the file open.
+        return np.memmap(file, dtype=dtype, mode="w+", shape=(num, ))
+
+
+def is_mapped(arr):
+    """
+    True if a numpy array's data is mapped from a file, rather than held in
+    memory.
+    """
+    while arr is not None:
+        if isinstance(arr, mmap.mmap):
+            return True
+        arr = getattr(arr, "base", None)
+    return False
+
+
+def _get_arrays(arr):
+    """
+    Returns the numpy arrays that hold a column's data in memory.
+    """
+    if isinstance(arr, np.ndarray):
+        return [] if is_mapped(arr) else [arr]
+    elif isinstance(arr, ChunkedArray):
+        return [ a for c in arr.chunks for a in _get_arrays(c[0]) ]
+    elif isinstance(arr, DictArray):
+        return _get_arrays(arr.codes) + _get_arrays(arr.values)
+    elif isinstance(arr, RLEArray):
+        return _get_arrays(arr.ends) + _get_arrays(arr.values)
+    else:
+        # Lazy arrays hold little data themselves.
+        return []
+
+
+def get_size(arrs):
+    """
+    Returns the bytes of memory held by column arrays.
+
+    Arrays that share data, such as chunks of the same array, are counted
+    once.
+    """
+    held = { id(a): a for arr in arrs for a in _get_arrays(arr) }
+    return sum( a.nbytes for a in held.values() )
+
+
+def spill(arr):
+    """
+    Copies a column array to disk.
+
+    @return
+      The spilled array, or `None` if the array can't be spilled.
+    """
+    if isinstance(arr, DictArray):
+        codes = spill(arr.codes)
+        return None if codes is None else DictArray(codes, arr.values)
+    elif not isinstance(arr, (np.ndarray, ChunkedArray)):
+        return None
+    elif arr.dtype.kind == "O" or len(_get_arrays(arr)) == 0:
+        return None
+
+    # Leave room to grow, as for appended columns.
+    buf = allocate(max(2 * len(arr), 1024), arr.dtype)
+    if isinstance(arr, ChunkedArray):
+        pos = 0
+        for a, s, e in arr.chunks:
+            buf[pos : pos + e - s] = a[s : e]
+            pos += e - s
+    else:
+        buf[: len(arr)] = arr
+    return buf[: len(arr)]
+
+
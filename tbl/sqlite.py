@@ -0,0 +1,213 @@
+"""
+SQLite tables, read lazily.
+
+Rows are fetched a page at a time, by keyset paging on `rowid`: a page is
+selected with `WHERE rowid >= ? ORDER BY rowid LIMIT ?`, which uses the table
+b-tree directly, rather than with `OFFSET`, which scans.  Recently fetched
+pages are kept in a small LRU cache.
+
+To find the starting rowid of a page, if rowids are dense, it's computed
+directly.  Otherwise, the starting rowids of pages are found as needed, by
+skipping forward from the nearest page whose starting rowid is known.
+"""
+
+#-------------------------------------------------------------------------------
+
+from   collections import OrderedDict
+import numpy as np
+import sqlite3
+import threading
+
+from   . import parse
+from   .lazy import LazyArray
+
+__all__ = (
+    "SQLiteTable",
+    "SQLiteColumn",
+)
+
+#-------------------------------------------------------------------------------
+
+# Number of rows fetched together.
+PAGE_SIZE = 1024
+
+# Number of fetched pages to keep.
+CACHE_PAGES = 32
+
+DTYPES = {
+    "i" : np.dtype(np.int64),
+    "f" : np.dtype(np.float64),
+    "O" : np.dtype(object),
+}
+
+def convert(vals, kind="i"):
+    """
+    Converts a sequence of SQLite values to an array.
+
+    @param kind
+      The narrowest kind to try.
+    @return
+      The array and its kind, which may be wider than `kind`.
+    """
+    # Check value types, since numpy would convert text of numbers, and
+    # truncate floats to ints.
+    types = { type(v) for v in vals }
+    if kind == "i" and types <= {int}:
+        try:
+            return np.array(vals, dtype=np.int64), "i"
+        except OverflowError:
+            pass
+    if kind in "if" and types <= {int, float, type(None)}:
+        # Read NULL as NaN.
+        return np.array(
+            [ np.nan if v is None else v for v in vals ],
+            dtype=np.float64), "f"
+    arr = np.empty(len(vals), dtype=object)
+    arr[:] = vals
+    return arr, "O"
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def get_table_names(path):
+    """
+    Returns the names of tables in an SQLite database.
+    """
+    with sqlite3.connect("file:{}?mode=ro".format(path), uri=True) as conn:
+        return [
+            n for n, in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' "
+                "ORDER BY name")
+        ]
+
+
+class SQLiteTable:
+    """
+    A table in an SQLite database, read a page at a time.
+    """
+
+    def __init__(self, path, table):
+        self.path   = path
+        self.table  = table
+        self.__conn = sqlite3.connect(
+            "file:{}?mode=ro".format(path), uri=True, check_same_thread=False)
+        self.__lock = threading.RLock()
+
+        self.names = [
+            r[1] for r in self.__execute(
+                "PRAGMA table_info({})".format(_quote(table)))
+        ]
+        if len(self.names) == 0:
+            raise LookupError("no table: {}".format(table))
+
+        (min_rowid, max_rowid, self.num_rows), = self.__execute(
+            "SELECT min(rowid), max(rowid), count(*) FROM {}"
+            .format(_quote(table)))
+        self.__dense = (
+            self.num_rows == 0 or max_rowid - min_rowid + 1 == self.num_rows)
+        # Starting rowids of pages, where known.
+        self.__keys = {0: min_rowid}
+
+        self.kinds = ["i"] * len(self.names)
+        self.__cache = OrderedDict()
+        if self.num_rows > 0:
+            # Infer column kinds from the first page.
+            self._get_page(0)
+
+
+    def __execute(self, sql, *args):
+        with self.__lock:
+            return self.__conn.execute(sql, args).fetchall()
+
+
+    def _get_key(self, p):
+        """
+        Returns the starting rowid of page `p`.
+        """
+        if self.__dense:
+            return self.__keys[0] + p * PAGE_SIZE
+        try:
+            return self.__keys[p]
+        except KeyError:
+            pass
+
+        # Skip forward from the nearest known page.
+        k = max( k for k in self.__keys if k < p )
+        (key, ), = self.__execute(
+            "SELECT rowid FROM {} WHERE rowid >= ? ORDER BY rowid "
+            "LIMIT 1 OFFSET ?".format(_quote(self.table)),
+            self.__keys[k], (p - k) * PAGE_SIZE)
+        self.__keys[p] = key
+        return key
+
+
+    def _fetch_page(self, p):
+        key = self._get_key(p)
+        rows = self.__execute(
+            "SELECT rowid, {} FROM {} WHERE rowid >= ? ORDER BY rowid "
+            "LIMIT ?".format(
+                ", ".join( _quote(n) for n in self.names ),
+                _quote(self.table)),
+            key, PAGE_SIZE + 1)
+        # The extra row gives us the next page's key for free.
+        if len(rows) > PAGE_SIZE:
+            self.__keys.setdefault(p + 1, rows.pop()[0])
+
+        arrs = []
+        for i, vals in enumerate(list(zip(*rows))[1 :]):
+            arr, kind = convert(vals, self.kinds[i])
+            self.kinds[i] = parse.widen(self.kinds[i], kind)
+            arrs.append(arr)
+        return arrs
+
+
+    def _get_page(self, p):
+        with self.__lock:
+            try:
+                self.__cache.move_to_end(p)
+                return self.__cache[p]
+            except KeyError:
+                arrs = self.__cache[p] = self._fetch_page(p)
+                if len(self.__cache) > CACHE_PAGES:
+                    self.__cache.popitem(last=False)
+                return arrs
+
+
+    def get_range(self, c, start, stop):
+        """
+        Returns values of column `c` for rows `[start, stop)`.
+        """
+        if start >= stop:
+            return np.empty(0, dtype=DTYPES[self.kinds[c]])
+        parts = []
+        for p in range(start // PAGE_SIZE, (stop - 1) // PAGE_SIZE + 1):
+            arr = self._get_page(p)[c]
+            p0 = p * PAGE_SIZE
+            parts.append(arr[max(start - p0, 0) : stop - p0])
+        return np.concatenate(parts).astype(DTYPES[self.kinds[c]], copy=False)
+
+
+
+class SQLiteColumn(LazyArray):
+
+    def __init__(self, table, c):
+        self.__table = table
+        self.__c = c
+
+
+    def __len__(self):
+        return self.__table.num_rows
+
+
+    @property
+    def dtype(self):
+        return DTYPES[self.__table.kinds[self.__c]]
+
+
+    def _get_range(self, start, stop):
+        return self.__table.get_range(self.__c, start, stop)
+
+
+
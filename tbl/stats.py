@@ -0,0 +1,341 @@
+"""
+Per-column summary statistics.
+
+Column stats are computed in the background, chunk by chunk, and cached on
+`Model.Col.stats`.  Stats are immutable, like column arrays: edits replace a
+column's stats with updated stats, computed from the inserted or deleted
+values only, so that snapshots keep the stats of their version.
+
+Stats of columns held in memory are computed as they're viewed.  Columns read
+from a source or computed on demand, such as memory-mapped or derived columns,
+would be read in full on every edit, so their stats are computed only on
+request.
+
+Most stats update exactly.  Deleting a column's min or max value loses that
+bound, so the stats are dropped and recomputed.  The distinct count is an
+approximation, from a HyperLogLog sketch; deleted values stay in the sketch,
+so after deletions the distinct count may be an overestimate.
+"""
+
+#-------------------------------------------------------------------------------
+
+import numpy as np
+
+from   . import jobs
+from   .commands import command, CmdError, CmdResult
+from   .lazy import LazyArray, Unloaded
+
+__all__ = (
+    "Sketch",
+    "Stats",
+    "compute",
+    "compute_column_stats",
+    "compute_stats",
+    "get_nulls",
+)
+
+#-------------------------------------------------------------------------------
+
+# Number of bits of hash that select a sketch register.
+SKETCH_BITS = 12
+
+# Number of rows per chunk when computing stats.
+CHUNK_SIZE = 1 << 20
+
+def _mix(h):
+    """
+    Scrambles uint64 hashes, with the splitmix64 finalizer.
+    """
+    with np.errstate(over="ignore"):
+        h = (h ^ (h >> np.uint64(30))) * np.uint64(0xbf58476d1ce4e5b9)
+        h = (h ^ (h >> np.uint64(27))) * np.uint64(0x94d049bb133111eb)
+        return h ^ (h >> np.uint64(31))
+
+
+def _hash(arr):
+    """
+    Returns uint64 hashes of values.
+    """
+    kind = arr.dtype.kind
+    if kind in "biuf":
+        # Hash numbers by float value, so that equal ints and floats agree.
+        h = arr.astype(np.float64).view(np.uint64)
+    elif kind in "Mm":
+        h = arr.view(np.int64).view(np.uint64)
+    else:
+        h = np.fromiter(
+            ( hash(v) for v in arr ), dtype=np.int64, count=len(arr)
+        ).view(np.uint64)
+    return _mix(h)
+
+
+class Sketch:
+    """
+    HyperLogLog sketch, for estimating the number of distinct values.
+    """
+
+    def __init__(self, registers=None):
+        if registers is None:
+            registers = np.zeros(1 << SKETCH_BITS, dtype=np.uint8)
+        self.registers = registers
+
+
+    @classmethod
+    def from_array(Class, arr):
+        h = _hash(arr)
+        reg = (h >> np.uint64(64 - SKETCH_BITS)).astype(np.intp)
+        # The rest of the hash fits exactly in a float, so its log is exact.
+        rest = (h & np.uint64((1 << (64 - SKETCH_BITS)) - 1)).astype(np.float64)
+        with np.errstate(divide="ignore"):
+            rank = (64 - SKETCH_BITS) - np.floor(np.log2(rest))
+        rank = np.minimum(rank, 64 - SKETCH_BITS + 1).astype(np.uint8)
+        registers = np.zeros(1 << SKETCH_BITS, dtype=np.uint8)
+        np.maximum.at(registers, reg, rank)
+        return Class(registers)
+
+
+    def merge(self, other):
+        return self.__class__(np.maximum(self.registers, other.registers))
+
+
+    def estimate(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        est = alpha * m * m / np.sum(2.0 ** -self.registers.astype(float))
+        zeros = int((self.registers == 0).sum())
+        if est <= 2.5 * m and zeros > 0:
+            # Small range correction.
+            est = m * np.log(m / zeros)
+        return int(round(est))
+
+
+
+def get_nulls(arr):
+    """
+    Returns a mask of null values: NaN, NaT, `None`, or empty strings.
+    """
+    kind = arr.dtype.kind
+    if kind == "f":
+        return np.isnan(arr)
+    elif kind in "Mm":
+        return np.isnat(arr)
+    elif kind == "O":
+        return (arr == None) | (arr == "")
+    elif kind in "US":
+        return arr == arr.dtype.type()
+    else:
+        return np.zeros(len(arr), dtype=bool)
+
+
+def _bound(fn, a, b):
+    """
+    Combines bounds `a` and `b` with `fn`, or returns `None` if they're not
+    comparable.
+    """
+    if a is None or b is None:
+        return None
+    try:
+        return fn(a, b)
+    except TypeError:
+        return None
+
+
+class Stats:
+    """
+    Summary statistics of a column's values.
+
+    `min`, `max`, and `sum` are of non-null values.  `min` and `max` are
+    `None` if there are no non-null values, or these aren't comparable;
+    `sum` is `None` unless values are numbers.
+    """
+
+    def __init__(self, num, num_null, min, max, sum, sketch):
+        self.num        = num
+        self.num_null   = num_null
+        self.min        = min
+        self.max        = max
+        self.sum        = sum
+        self.sketch     = sketch
+
+
+    @classmethod
+    def from_array(Class, arr):
+        arr = np.asarray(arr)
+        nulls = get_nulls(arr)
+        vals = arr[~nulls]
+        lo = hi = None
+        if len(vals) > 0:
+            if arr.dtype.kind == "O":
+                try:
+                    lo, hi = min(vals), max(vals)
+                except TypeError:
+                    pass
+            else:
+                lo, hi = vals.min(), vals.max()
+        sum = (
+            float(vals.sum(dtype=np.float64)) if arr.dtype.kind in "biuf"
+            else None
+        )
+        return Class(
+            len(arr), int(nulls.sum()), lo, hi, sum, Sketch.from_array(vals))
+
+
+    @property
+    def num_values(self):
+        """
+        The number of non-null values.
+        """
+        return self.num - self.num_null
+
+
+    @property
+    def mean(self):
+        if self.sum is None or self.num_values == 0:
+            return None
+        return self.sum / self.num_values
+
+
+    @property
+    def distinct(self):
+        """
+        The approximate number of distinct non-null values.
+        """
+        return self.sketch.estimate()
+
+
+    def merge(self, other):
+        """
+        Returns stats of the values of both.
+        """
+        if self.num_values == 0:
+            lo, hi = other.min, other.max
+        elif other.num_values == 0:
+            lo, hi = self.min, self.max
+        else:
+            lo = _bound(min, self.min, other.min)
+            hi = _bound(max, self.max, other.max)
+        return self.__class__(
+            self.num + other.num,
+            self.num_null + other.num_null,
+            lo, hi,
+            None if self.sum is None or other.sum is None
+            else self.sum + other.sum,
+            self.sketch.merge(other.sketch),
+        )
+
+
+    def insert(self, vals):
+        """
+        Returns stats updated for inserted values.
+        """
+        return self.merge(self.from_array(vals))
+
+
+    def delete(self, vals):
+        """
+        Returns stats updated for deleted values.
+
+        @return
+          The updated stats, or `None` if a deleted value was the min or max.
+        """
+        other = self.from_array(vals)
+        if other.num_values > 0:
+            if self.min is None or self.max is None:
+                return None
+            try:
+                if not (self.min < other.min and other.max < self.max):
+                    return None
+            except TypeError:
+                return None
+        return self.__class__(
+            self.num - other.num,
+            self.num_null - other.num_null,
+            self.min, self.max,
+            None if self.sum is None else self.sum - other.sum,
+            self.sketch,
+        )
+
+
+
+#-------------------------------------------------------------------------------
+
+def compute(arr, job=None):
+    """
+    Computes stats of an array, a chunk at a time.
+
+    @param job
+      If not `None`, the job to which to report progress.  If the job is
+      cancelled, raises `RuntimeError`.
+    """
+    stats = Stats.from_array(arr[0 : 0])
+    for start in range(0, len(arr), CHUNK_SIZE):
+        if job is not None:
+            if job.cancelled:
+                raise RuntimeError("cancelled")
+            job.status = "stats {:.0%}".format(start / len(arr))
+        stats = stats.merge(Stats.from_array(arr[start : start + CHUNK_SIZE]))
+    return stats
+
+
+# IDs of columns whose stats are being computed.
+_computing = set()
+
+def compute_stats(mdl, col_ids, force=False):
+    """
+    Starts computing stats for columns, in the background.
+
+    Columns that have stats, or are unloaded, are skipped, as are all columns
+    while the model is loading.  If a column is edited while its stats are
+    computed, the stats are discarded.
+
+    @param force
+      If true, computes stats of columns not held in memory too.
+    @return
+      The job, or `None` if there are no stats to compute.
+    """
+    if mdl.loading:
+        return None
+    cols = [
+        c for c in ( mdl.get_col(i) for i in col_ids )
+        if c.stats is None
+        and c.id not in _computing
+        and not isinstance(c.arr, Unloaded)
+        and (force or not isinstance(c.arr, LazyArray) or c.arr.in_memory)
+    ]
+    if len(cols) == 0:
+        return None
+    _computing.update( c.id for c in cols )
+    arrs = [ c.arr for c in cols ]
+
+    def run(job):
+        try:
+            for col, arr in zip(cols, arrs):
+                stats = compute(arr, job)
+                try:
+                    col = mdl.get_col(col.id)
+                except LookupError:
+                    continue
+                if col.arr is arr:
+                    col.stats = stats
+        finally:
+            _computing.difference_update( c.id for c in cols )
+
+    return jobs.start("stats", run)
+
+
+@command()
+def compute_column_stats(vw, mdl):
+    """
+    Computes stats of the current column, even if not held in memory.
+    """
+    if mdl.loading:
+        raise CmdError("table is still loading")
+    col = mdl.get_col(vw.cols[vw.cur.c].col_id)
+    if isinstance(col.arr, Unloaded):
+        raise CmdError("column isn't loaded: {}".format(col.name))
+    if compute_stats(mdl, [col.id], force=True) is None:
+        return CmdResult(msg="stats of {} are current".format(col.name))
+    return CmdResult(msg="computing stats of {}".format(col.name))
+
+
+
@@ -0,0 +1,56 @@
+import numpy as np
+
+from   tbl import chunked, io, model
+from   tbl.chunked import ChunkedArray, chunk
+
+#-------------------------------------------------------------------------------
+
+def test_edits(monkeypatch):
+    monkeypatch.setattr(chunked, "CHUNK_SIZE", 8)
+    rng = np.random.default_rng(0)
+    arr = np.arange(100)
+    chk = ChunkedArray.from_array(arr, 8)
+    assert chk[2 : 5].base is arr
+
+    for _ in range(500):
+        if rng.random() < 0.5 and len(arr) > 0:
+            i = int(rng.integers(len(arr)))
+            arr, chk = np.delete(arr, i), chk.delete(i)
+        else:
+            i = int(rng.integers(len(arr) + 1))
+            arr, chk = np.insert(arr, i, -i), chk.insert(i, -i)
+        assert len(chk) == len(arr)
+        assert all( 4 <= e - s <= 16 for _, s, e in chk.chunks[1 : -1] )
+
+    assert (chk[:] == arr).all()
+    assert (chk[13 : 61] == arr[13 : 61]).all()
+    idx = rng.integers(len(arr), size=20)
+    assert (chk[idx] == arr[idx]).all()
+
+
+def test_edits_shared():
+    arr = np.arange(200000)
+    chk0 = chunk(arr)
+    chk1 = chk0.delete(70000)
+    assert chk1[70000] == 70001 and chk0[70000] == 70000
+    # Only the edited chunk was copied.
+    assert [ a is arr for a, _, _ in chk1.chunks ] == [True, False, True, True]
+
+
+
+
+def test_edits_lazy_widening(tmp_path):
+    path = tmp_path / "t.csv"
+    path.write_text(
+        "a\n" + "".join( "{}\n".format(i) for i in range(150000) )
+        + "x\n" * 50000)
+    mdl = io.load_mapped_csv(path)
+    model.delete_row(mdl, 0)
+    arr = mdl.cols[0].arr
+    assert arr.dtype == np.int64 and arr[0] == 1
+    # Reading past row 150000 widens the column.
+    assert list(arr[196600 : 196602]) == ["x", "x"]
+    assert arr.dtype == object
+    # Rows parsed, and copied, as ints are text now.
+    assert list(arr[0 : 2]) == ["1", "2"]
+    assert arr[100000] == "100001"
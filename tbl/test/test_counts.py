@@ -0,0 +1,64 @@
+import numpy as np
+
+from   tbl import counts, jobs, view
+from   tbl.encoding import DictArray
+from   tbl.model import Model
+from   tbl.view import build_view
+
+#-------------------------------------------------------------------------------
+
+def test_count_values():
+    arr = np.array([3.0, 1.0, np.nan, 3.0, 2.0, 3.0, 1.0])
+    res = counts.count_values(arr)
+    assert res.exact
+    assert res.values.tolist() == [3.0, 1.0, 2.0]
+    assert res.counts.tolist() == [3, 2, 1]
+    assert res.num_null == 1
+    # Cached per array.
+    assert counts.count_values(arr) is res
+    assert counts.count_values(arr.copy()) is not res
+
+    arr = DictArray(np.array([0, 1, 1, 2]), np.array(["a", "b", ""]))
+    res = counts.count_values(arr)
+    assert res.values.tolist() == ["b", "a"]
+    assert res.num_null == 1
+    # A code of -1 is a missing value.
+    arr = DictArray(np.array([0, -1, 0]), np.array(["a", None], dtype=object))
+    res = counts.count_values(arr)
+    assert res.values.tolist() == ["a"] and res.counts.tolist() == [2]
+    assert res.num_null == 1
+
+
+def test_count_values_approximate(monkeypatch):
+    monkeypatch.setattr(counts, "EXACT_LIMIT", 10)
+    monkeypatch.setattr(counts, "SUMMARY_SIZE", 4)
+    monkeypatch.setattr(counts, "CHUNK_SIZE", 16)
+    rng = np.random.default_rng(0)
+    arr = np.concatenate([
+        np.full(300, 7), np.full(200, 8), rng.integers(100, 1000, 500)])
+    rng.shuffle(arr)
+
+    res = counts.count_values(arr)
+    assert not res.exact
+    assert res.values[: 2].tolist() == [7, 8]
+    # Counts are underestimates, by at most the error.
+    assert 300 - res.error <= res.counts[0] <= 300
+    assert counts.count_values(arr, exact=True).counts[: 2].tolist() \
+        == [300, 200]
+
+
+def test_histogram():
+    mdl = Model()
+    mdl.add_col(np.array([0.0, 1.0, 2.5, 10.0, np.nan, -np.inf]), "x")
+    vw = build_view(mdl)
+    view.update_num_rows(vw, mdl.num_rows)
+
+    edges, hist = counts.histogram(mdl.cols[0].arr, bins=4)
+    # Infinite values are excluded, like NaN.
+    assert edges.tolist() == [0.0, 2.5, 5.0, 7.5, 10.0]
+    assert hist.tolist() == [2, 1, 0, 1]
+
+    # The table is computed in the background.
+    assert counts.show_histogram(vw, mdl).table is None
+    table, _ = jobs.running[-1].wait().table
+    assert np.asarray(table.cols[2].arr).sum() == 4
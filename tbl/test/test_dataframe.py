@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from   tbl.dataframe import from_dataframe
+from   tbl.encoding import DictArray
+
+pd = pytest.importorskip("pandas")
+
+#-------------------------------------------------------------------------------
+
+def test_from_dataframe():
+    df = pd.DataFrame({
+        "x": np.arange(5),
+        "y": np.arange(5) * 0.5,
+        "c": pd.Categorical(["a", "b", None, "a", "b"]),
+        "n": pd.array([1, None, 3, 4, None], dtype="Int64"),
+        "s": pd.array(["p", "q", None, "r", "s"], dtype="string"),
+    })
+    mdl = from_dataframe(df)
+    x, y, c, n, s = ( c.arr for c in mdl.cols )
+    assert mdl.num_rows == 5
+
+    # Numpy-backed columns aren't copied.
+    assert np.shares_memory(x, df["x"].to_numpy())
+    assert y[3] == 1.5
+
+    # Nor are categorical codes.
+    assert isinstance(c, DictArray)
+    assert np.shares_memory(c.codes, df["c"].array.codes)
+    assert list(c[:]) == ["a", "b", None, "a", "b"]
+    # Inserting a new category leaves missing values missing.
+    assert list(c.insert(0, "zz")[:]) == ["zz", "a", "b", None, "a", "b"]
+
+    assert n.dtype == np.float64
+    assert n[0] == 1 and np.isnan(n[1])
+    assert list(n[np.array([3, 2])]) == [4, 3]
+    assert list(s[1 : 4]) == ["q", None, "r"]
+
+
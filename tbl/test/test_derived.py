@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from   tbl import controller, derived, journal, model, view
+from   tbl.commands import CmdError
+from   tbl.controller import Controller
+from   tbl.derived import DerivedArray
+from   tbl.model import Model
+from   tbl.view import build_view
+
+#-------------------------------------------------------------------------------
+
+def test_derived_array(monkeypatch):
+    monkeypatch.setattr(derived, "CHUNK_SIZE", 4)
+    mdl = Model()
+    mdl.add_col(np.arange(10), "qty")
+    mdl.add_col(np.full(10, 2.5), "unit price")
+    arr = derived.derive(mdl, "qty * col('unit price')")
+    assert arr.dtype == np.float64
+    assert arr[3] == 7.5
+    assert arr[2 : 7].tolist() == [5.0, 7.5, 10.0, 12.5, 15.0]
+    assert arr[[9, 0]].tolist() == [22.5, 0.0]
+    assert np.asarray(arr).tolist() == ( np.arange(10) * 2.5 ).tolist()
+
+    # Edits to a source column replace the derived array.
+    mdl.add_col(arr, "total")
+    model.delete_row(mdl, 0)
+    new = mdl.cols[2].arr
+    assert new is not arr and len(new) == 9
+    assert new[0] == 2.5
+    model.take_rows(mdl, [1, 0])
+    assert list(mdl.cols[2].arr) == [5.0, 2.5]
+    # Values inserted for the derived column are ignored.
+    model.insert_row(mdl, 0, (4, 1.0, 99.0))
+    assert list(mdl.cols[2].arr) == [4.0, 5.0, 2.5]
+
+
+def test_add_column():
+    mdl = Model()
+    mdl.add_col(np.array([1, 2, 3]), "a")
+    mdl.add_col(np.array([10, 20, 30]), "b")
+    vw = build_view(mdl)
+    view.update_num_rows(vw, mdl.num_rows)
+    ctl = Controller()
+
+    controller.add_column(mdl, vw, ctl, "c = a + b")
+    assert [ c.name for c in mdl.cols ] == ["a", "c", "b"]
+    assert isinstance(mdl.cols[1].arr, DerivedArray)
+    assert list(mdl.cols[1].arr) == [11, 22, 33]
+    # The cursor is on the new column.
+    assert vw.cols[vw.cur.c].col_id == mdl.cols[1].id
+
+    controller.undo(mdl, vw, ctl)
+    assert [ c.name for c in mdl.cols ] == ["a", "b"]
+    assert len(vw.cols) == 2
+    controller.redo(mdl, vw, ctl)
+    assert [ mdl.get_col(c.col_id).name for c in vw.cols ] == ["a", "c", "b"]
+
+    # Journal ops replay the edit.
+    other = Model({"a": np.array([1, 2, 3]), "b": np.array([10, 20, 30])})
+    for op, args in ctl.history.undo[-1].ops:
+        journal.apply(other, {"op": op, **args})
+    assert list(other.cols[1].arr) == [11, 22, 33]
+
+
+def test_add_column_errors():
+    mdl = Model()
+    mdl.add_col(np.array([1, 2, "x"], dtype=object), "a")
+    vw = build_view(mdl)
+    view.update_num_rows(vw, mdl.num_rows)
+    ctl = Controller()
+
+    # Rows that can't be evaluated are null.
+    controller.add_column(mdl, vw, ctl, "b = a + 1")
+    assert mdl.cols[1].arr[:].tolist() == [2, 3, ""]
+    mdl.add_col(np.array([1, 0, 2]), "n")
+    controller.add_column(mdl, vw, ctl, "d = a // n")
+    arr, = ( c.arr for c in mdl.cols if c.name == "d" )
+    assert arr.dtype == object and arr[:].tolist() == [1, "", ""]
+
+    # An expression that can't be evaluated at all isn't added.
+    with pytest.raises(CmdError):
+        controller.add_column(mdl, vw, ctl, "c = a - 'y'")
+    assert [ c.name for c in mdl.cols ] == ["a", "b", "d", "n"]
@@ -0,0 +1,58 @@
+import numpy as np
+
+from   tbl import model
+from   tbl.encoding import DictArray, RLEArray, encode
+
+#-------------------------------------------------------------------------------
+
+def _objects(vals):
+    arr = np.empty(len(vals), dtype=object)
+    arr[:] = vals
+    return arr
+
+
+def _check(enc, arr):
+    assert len(enc) == len(arr)
+    assert list(enc[:]) == list(arr)
+    assert list(enc[3 : 17]) == list(arr[3 : 17])
+    idx = np.array([5, 0, 99, 50, 50])
+    assert list(enc[idx]) == list(arr[idx])
+    assert enc[42] == arr[42]
+
+
+def test_encode():
+    rng = np.random.default_rng(0)
+    arr = _objects(rng.choice(["red", "green", "blue"], 100))
+    enc = encode(arr)
+    assert isinstance(enc, DictArray)
+    assert enc.codes.dtype == np.int8
+    _check(enc, arr)
+
+    arr = _objects(["a"] * 40 + ["b"] * 30 + ["c"] * 30)
+    enc = encode(arr)
+    assert isinstance(enc, RLEArray)
+    assert list(enc.ends) == [40, 70, 100]
+    _check(enc, arr)
+
+    arr = _objects([ str(i) for i in range(100) ])
+    assert encode(arr) is arr
+
+
+def test_edit():
+    rng = np.random.default_rng(0)
+    for arr in (
+            _objects(rng.choice(["red", "green", "blue"], 100)),
+            _objects(["a"] * 40 + ["b"] * 30 + ["c"] * 30),
+    ):
+        mdl = model.Model()
+        mdl.add_col(encode(arr), "x")
+        for row_num, val in ((40, "b"), (0, "z"), (100, "a"), (69, "q")):
+            model.insert_row(mdl, row_num, (val, ))
+            arr = np.insert(arr, row_num, val)
+            _check(mdl.cols[0].arr, arr)
+        for row_num in (0, 39, 40, 100):
+            assert model.delete_row(mdl, row_num) == (arr[row_num], )
+            arr = np.delete(arr, row_num)
+            _check(mdl.cols[0].arr, arr)
+
+
@@ -0,0 +1,52 @@
+import os
+import time
+
+from   tbl import follow
+
+#-------------------------------------------------------------------------------
+
+def _wait_for(mdl, num_rows):
+    for _ in range(100):
+        if mdl.num_rows >= num_rows:
+            break
+        time.sleep(0.02)
+
+
+def test_follow_pipe():
+    rfd, wfd = os.pipe()
+    os.write(wfd, b"a,b\n1,x\n2,")
+    mdl = follow.load_following(rfd, "pipe", interval=0.01)
+    assert [ c.name for c in mdl.cols ] == ["a", "b"]
+
+    # The partial row isn't loaded until it's complete.
+    os.write(wfd, b'"y\nz"\n3,w\n')
+    _wait_for(mdl, 3)
+    assert mdl.num_rows == 3
+    assert list(mdl.cols[1].arr) == ["x", "y\nz", "w"]
+
+    os.write(wfd, b"4.5,v")
+    os.close(wfd)
+    mdl.loader.wait()
+    assert mdl.num_rows == 4
+    assert mdl.cols[0].arr[3] == 4.5
+
+
+def test_follow_file(tmp_path):
+    path = tmp_path / "test.csv"
+    path.write_text("a\n1\n2\n")
+    fd = os.open(path, os.O_RDONLY)
+    mdl = follow.load_following(fd, str(path), interval=0.01)
+    _wait_for(mdl, 2)
+    assert mdl.num_rows == 2
+
+    with open(path, "a") as file:
+        file.write("3\n4\n")
+    _wait_for(mdl, 4)
+    assert list(mdl.cols[0].arr) == [1, 2, 3, 4]
+
+    assert mdl.loading
+    result = follow.stop_following(mdl)
+    assert result.msg == "loaded 4 rows: {}".format(path)
+    assert not mdl.loading
+
+
@@ -0,0 +1,36 @@
+import numpy as np
+
+from   tbl import model
+from   tbl.formatter import sample
+from   tbl.view import build_view, widen_formatters
+
+#-------------------------------------------------------------------------------
+
+def test_sample():
+    arr = np.arange(1000000)
+    smp = sample(arr, size=100, blocks=10)
+    assert len(smp) == 100
+    assert smp[0] == 0 and smp[-1] == 999999
+    assert list(sample(arr[: 50], size=100)) == list(range(50))
+
+
+def test_widen():
+    vals = np.ones(1000000)
+    vals[123457] = -12345.125
+    mdl = model.Model()
+    mdl.add_col(vals, "x")
+    mdl.add_col(np.array(["a"] * 1000000, dtype=object), "y")
+    mdl.cols[1].arr[123456] = "abcdef"
+    vw = build_view(mdl)
+    fmt0, fmt1 = ( c.fmt for c in vw.cols )
+    # The sample misses the outliers.
+    assert (fmt0.size, fmt0.precision, fmt0.sign) == (1, None, " ")
+    assert fmt1.size == 1
+
+    assert not widen_formatters(vw, mdl, 0, 20)
+    assert widen_formatters(vw, mdl, 123450, 123470)
+    assert vw.cols[0].fmt is fmt0
+    assert fmt0(-12345.125) == "-12345.125"
+    assert fmt1("abcdef") == "abcdef"
+
+
@@ -0,0 +1,55 @@
+import numpy as np
+
+from   tbl import group, view
+from   tbl.encoding import DictArray
+from   tbl.model import Model
+from   tbl.view import build_view
+
+#-------------------------------------------------------------------------------
+
+def _values(mdl):
+    return { c.name: np.asarray(c.arr).tolist() for c in mdl.cols }
+
+
+def test_group():
+    mdl = Model()
+    codes = np.array([0, 1, 0, 2, 1, 0], dtype=np.int8)
+    mdl.add_col(DictArray(codes, np.array(["b", "a", ""], dtype=object)), "k")
+    mdl.add_col(np.array([1, 2, 1, 1, 2, 2]), "j")
+    mdl.add_col(np.array([1.0, 2.0, 3.0, 4.0, np.nan, 6.0]), "x")
+    k, j, x = ( c.id for c in mdl.cols )
+
+    # Keys in ascending order, nulls last.
+    res = _values(group.group(mdl, [k], [k, j, x]))
+    assert res["k"] == ["a", "b", ""]
+    assert res["count"] == [2, 3, 1]
+    assert res["j sum"] == [4, 4, 1]
+    assert res["x sum"] == [2.0, 10.0, 4.0]
+    assert res["x mean"] == [2.0, 10 / 3, 4.0]
+    assert res["x min"] == [2.0, 1.0, 4.0]
+    assert res["x max"] == [2.0, 6.0, 4.0]
+
+    # Multiple keys, and a subset of rows.
+    res = _values(group.group(mdl, [k, j], [x], np.array([0, 2, 4, 5])))
+    assert res["k"] == ["a", "b", "b"]
+    assert res["j"] == [2, 1, 2]
+    assert res["count"] == [1, 2, 1]
+    # A group with only nulls.
+    assert np.isnan(res["x min"][0])
+    assert res["x max"][1 :] == [3.0, 6.0]
+
+
+def test_group_by():
+    mdl = Model()
+    mdl.add_col(np.array([3, 1, 3, 1, 2]), "k")
+    mdl.add_col(np.array([10, 20, 30, 40, 50]), "v")
+    vw = build_view(mdl)
+    view.update_num_rows(vw, mdl.num_rows)
+
+    view.filter(vw, mdl, "v < 50")
+    res = group.group_by(vw, mdl, "")
+    grouped, grouped_vw = res.table
+    assert res.msg == "2 groups"
+    assert _values(grouped)["k"] == [1, 3]
+    assert _values(grouped)["v sum"] == [60, 40]
+    assert len(grouped_vw.cols) == grouped.num_cols
@@ -0,0 +1,46 @@
+import numpy as np
+
+from   tbl import controller, view
+from   tbl.controller import Controller
+from   tbl.model import Model
+from   tbl.view import build_view
+
+#-------------------------------------------------------------------------------
+
+def _make(num_rows, budget):
+    mdl = Model()
+    mdl.add_col(np.arange(num_rows), "x")
+    mdl.add_col(np.arange(num_rows) * 0.5, "y")
+    vw = build_view(mdl)
+    view.update_num_rows(vw, mdl.num_rows)
+    return mdl, vw, Controller(history_budget=budget)
+
+
+def test_undo_redo():
+    mdl, vw, ctl = _make(10, 1 << 20)
+    for r in (3, 3, 0):
+        view.move_cur_to(vw, r=r)
+        controller.delete_row(mdl, vw, ctl)
+    assert list(mdl.cols[0].arr) == [1, 2, 5, 6, 7, 8, 9]
+
+    assert controller.undo(mdl, vw, ctl).msg == "undo: delete row"
+    controller.undo(mdl, vw, ctl)
+    assert list(mdl.cols[0].arr) == [0, 1, 2, 4, 5, 6, 7, 8, 9]
+    controller.redo(mdl, vw, ctl)
+    assert list(mdl.cols[0].arr) == [0, 1, 2, 5, 6, 7, 8, 9]
+    assert list(mdl.cols[1].arr[: 3]) == [0, 0.5, 1.0]
+
+    # A new edit discards what was undone.
+    controller.delete_row(mdl, vw, ctl)
+    assert len(ctl.history.redo) == 0
+
+
+def test_budget():
+    # Each edit copies one 64K-row chunk of each column; that's ~1 MB.
+    mdl, vw, ctl = _make(1000000, 4 << 20)
+    for _ in range(10):
+        controller.delete_row(mdl, vw, ctl)
+    assert 3 <= len(ctl.history.undo) <= 4
+    assert ctl.history.size <= 4 << 20
+
+
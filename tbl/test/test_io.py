@@ -0,0 +1,308 @@
+import numpy as np
+import os
+from   pathlib import Path
+import pytest
+import runpy
+import subprocess
+import sys
+
+from   tbl import cache, io, jobs, model
+from   tbl.commands import CmdError
+from   tbl.controller import Controller
+from   tbl.lazy import Unloaded
+from   tbl.lib import fs
+from   tbl.model import Model
+
+#-------------------------------------------------------------------------------
+
+def test_load_csv_streaming(tmp_path):
+    path = tmp_path / "test.csv"
+    with open(path, "w") as file:
+        print("id,val,name", file=file)
+        for i in range(5000):
+            val = "" if i == 3000 else str(i * 0.5)
+            name = str(i) if i < 2000 else "x{}".format(i % 3)
+            print("{},{},{}".format(i, val, name), file=file)
+
+    mdl = io.open(str(path))
+    # The first batch is available immediately.
+    assert mdl.num_rows > 0
+    mdl.loader.wait()
+    assert not mdl.loading
+
+    assert mdl.num_rows == 5000
+    assert [ c.name for c in mdl.cols ] == ["id", "val", "name"]
+    ids, vals, names = ( c.arr for c in mdl.cols )
+    assert ids.dtype == np.int64
+    assert (ids == np.arange(5000)).all()
+    assert vals.dtype == np.float64
+    assert np.isnan(vals[3000])
+    assert vals[4999] == 2499.5
+    assert names.dtype == object
+    assert names[4999] == "x1"
+    # Rows parsed as ints before the column widened are text too.
+    assert names[0] == "0" and names[1999] == "1999"
+
+
+def test_load_csv_empty(tmp_path):
+    path = tmp_path / "empty.csv"
+    path.write_text("a,b\n")
+    mdl = io.open(str(path))
+    mdl.loader.wait()
+    assert mdl.num_rows == 0
+    assert mdl.num_cols == 2
+
+
+def test_load_mapped_csv(tmp_path):
+    path = tmp_path / "test.csv"
+    with open(path, "w") as file:
+        print("id,val,name", file=file)
+        for i in range(5000):
+            print('{},{},"line {}\nof {}"'.format(i, i * 0.5, i, i % 3), 
+                  file=file)
+
+    for _ in range(2):
+        # The second time, the sidecar row index is reused.
+        mdl = io.open(str(path), mmap=True)
+        assert mdl.num_rows == 5000
+        ids, vals, names = ( c.arr for c in mdl.cols )
+        assert ids[4321] == 4321
+        assert ids.dtype == np.int64
+        assert vals[-1] == 2499.5
+        assert names[10] == "line 10\nof 1"
+        assert list(ids[[4999, 0, 2048]]) == [4999, 0, 2048]
+        assert (np.asarray(ids) == np.arange(5000)).all()
+
+    assert (tmp_path / "test.csv.tblidx.npy").exists()
+
+
+def test_cache(tmp_path, monkeypatch):
+    monkeypatch.setenv("TBL_CACHE_DIR", str(tmp_path / "cache"))
+    path = tmp_path / "test.csv"
+    with open(path, "w") as file:
+        print("id,val,name", file=file)
+        for i in range(3000):
+            print("{},{},x{}".format(i, i * 0.5, i % 7), file=file)
+
+    mdl = io.open(str(path), cache=True)
+    jobs.wait_all()
+    assert mdl.loader is not None
+
+    mdl = io.open(str(path), cache=True)
+    assert mdl.loader is None
+    assert mdl.num_rows == 3000
+    ids, vals, names = ( c.arr for c in mdl.cols )
+    assert ids[2999] == 2999
+    assert vals.dtype == np.float64
+    assert vals[3] == 1.5
+    assert names[2999] == "x3"
+    assert list(names[5 : 8]) == ["x5", "x6", "x0"]
+
+    # Modifying the file invalidates the cache entry.
+    with open(path, "a") as file:
+        print("3000,1500.0,x4", file=file)
+    mdl = io.open(str(path), cache=True)
+    assert mdl.loader is not None
+    mdl.loader.wait()
+    assert mdl.num_rows == 3001
+
+    # Values that aren't strings are cached unchanged.
+    jobs.wait_all()
+    vals = np.array([1, None, "a", np.nan], dtype=object)
+    cache.save_cached(path, Model({"x": vals}))
+    arr = cache.load_cached(path).cols[0].arr
+    assert [ type(v) for v in arr ] == [ type(v) for v in vals ]
+    assert arr[0] == 1 and arr[1] is None and np.isnan(arr[3])
+
+    # An entry is used only with the options it was loaded with.
+    assert cache.load_cached(path, {"columns": "x"}) is None
+    # An entry saved with metadata from before a change is stale.
+    meta = cache.get_meta(path)
+    with open(path, "a") as file:
+        print("3001,1500.5,x5", file=file)
+    cache.save_cached(path, Model({"x": vals}), meta)
+    assert cache.load_cached(path) is None
+
+
+def test_cache_mapped(tmp_path, monkeypatch):
+    monkeypatch.setenv("TBL_CACHE_DIR", str(tmp_path / "cache"))
+    path = tmp_path / "test.csv"
+    path.write_text("a\n1\n2\n")
+    # Mapped columns aren't read in full to cache them.
+    io.open(str(path), cache=True, mmap=True)
+    jobs.wait_all()
+    assert cache.load_cached(path) is None
+
+
+def test_load_csv_parallel(tmp_path):
+    path = tmp_path / "test.csv"
+    with open(path, "w") as file:
+        print("id,val,name", file=file)
+        for i in range(20000):
+            # Only some ranges see floats or strings.
+            val = i * 0.5 if i > 15000 else i
+            name = '"a\nb"' if i == 12345 else "x" if i > 19000 else i
+            print("{},{},{}".format(i, val, name), file=file)
+
+    mdl = io.open(str(path), workers=3)
+    mdl.loader.wait()
+    assert mdl.num_rows == 20000
+    ids, vals, names = ( c.arr for c in mdl.cols )
+    assert (ids == np.arange(20000)).all()
+    assert vals.dtype == np.float64
+    assert vals[19999] == 9999.5
+    assert names.dtype == object
+    assert names[12345] == "a\nb"
+    assert names[19999] == "x"
+    # Ranges parsed as ints are text too.
+    assert names[0] == "0" and names[18000] == "18000"
+    assert all( type(n) is str for n in names )
+
+
+def test_load_csv_parallel_script(tmp_path):
+    # Workers are spawned, and import the main script as "__mp_main__", so
+    # ntab mustn't run then.
+    ntab = Path(__file__).parents[2] / "bin" / "ntab"
+    assert "main" in runpy.run_path(str(ntab), run_name="__mp_main__")
+
+    # A guarded script loads in parallel.
+    path = tmp_path / "test.csv"
+    path.write_text("a\n" + "".join( "{}\n".format(i) for i in range(1000) ))
+    script = tmp_path / "load.py"
+    script.write_text(
+        "from tbl import io\n"
+        "def main():\n"
+        "    print('main')\n"
+        "    mdl = io.open({!r}, workers=2)\n"
+        "    mdl.loader.wait()\n"
+        "    print(mdl.num_rows)\n"
+        "if __name__ == '__main__':\n"
+        "    main()\n".format(str(path)))
+    env = dict(os.environ, PYTHONPATH=str(Path(__file__).parents[2]))
+    res = subprocess.run(
+        [sys.executable, str(script)], env=env, capture_output=True,
+        text=True, check=True)
+    assert res.stdout.split() == ["main", "1000"]
+
+
+def test_save(tmp_path):
+    path = tmp_path / "test.csv"
+    path.write_text('id,val,name\n1,1.5,"a,b"\n2,,c\n3,2.25,\n')
+    mdl = io.open(str(path))
+    mdl.loader.wait()
+
+    out = tmp_path / "out.csv"
+    result = io.save_as(mdl, Controller(), str(out))
+    assert result.msg == "saving: {}".format(out)
+    # Edits after the save starts don't affect what's saved.
+    model.delete_row(mdl, 0)
+    jobs.wait_all()
+    assert out.read_text() == 'id,val,name\n1,1.5,"a,b"\n2,,c\n3,2.25,\n'
+    assert [ p.name for p in tmp_path.iterdir() if p.name.startswith(".") ] \
+        == []
+    # A new file has the default permissions.
+    assert out.stat().st_mode & 0o777 == 0o666 & ~fs.UMASK
+    assert mdl.source.path == out
+
+    # If saving fails, the source is unchanged.
+    io.save_as(mdl, Controller(), str(tmp_path / "missing" / "out.csv"))
+    with pytest.raises(OSError):
+        jobs.running[-1].wait()
+    jobs.reap()
+    assert mdl.source.path == out
+
+
+def test_compressed(tmp_path):
+    import gzip
+
+    lines = [ "{},{}\n".format(i, i % 5) for i in range(3000) ]
+    # Write a multi-member gzip file, one member per 100 lines.
+    path = tmp_path / "test.csv.gz"
+    with open(path, "wb") as file:
+        file.write(gzip.compress(b"a,b\n"))
+        for i in range(0, 3000, 100):
+            file.write(gzip.compress("".join(lines[i : i + 100]).encode()))
+
+    mdl = io.open(str(path), workers=2)
+    mdl.loader.wait()
+    assert mdl.num_rows == 3000
+    assert (mdl.cols[0].arr == np.arange(3000)).all()
+
+    # Round-trip through other compressions.
+    for suffix in (".bz2", ".xz", ".gz"):
+        out = tmp_path / ("out.csv" + suffix)
+        io.save_as(mdl, Controller(), str(out))
+        jobs.wait_all()
+        mdl = io.open(str(out))
+        mdl.loader.wait()
+        assert mdl.num_rows == 3000
+        assert (mdl.cols[1].arr == np.arange(3000) % 5).all()
+
+
+def test_sqlite(tmp_path, monkeypatch):
+    import sqlite3
+    from   tbl import sqlite
+
+    monkeypatch.setattr(sqlite, "PAGE_SIZE", 16)
+    path = tmp_path / "test.db"
+    with sqlite3.connect(str(path)) as conn:
+        conn.execute("CREATE TABLE t (id INTEGER, val REAL, name TEXT)")
+        conn.executemany(
+            "INSERT INTO t VALUES (?, ?, ?)",
+            [ (i, None if i == 50 else i / 2, "n{}".format(i))
+              for i in range(200) ])
+        # Make rowids sparse.
+        conn.execute("DELETE FROM t WHERE id % 3 = 0")
+
+    mdl = io.open("sqlite::{}::t".format(path))
+    ids, vals, names = ( c.arr for c in mdl.cols )
+    expected = np.array([ i for i in range(200) if i % 3 != 0 ])
+    assert mdl.num_rows == len(expected)
+    # Jump far ahead, then back.
+    assert ids[120] == expected[120]
+    assert names[5] == "n{}".format(expected[5])
+    assert (ids[: mdl.num_rows] == expected).all()
+    assert vals.dtype == np.float64
+    assert np.isnan(vals[list(expected).index(50)])
+
+    # With only one table, the table name is optional.
+    assert io.open(str(path)).num_rows == len(expected)
+
+    # Values are converted by their types, not by whether they parse.
+    with sqlite3.connect(str(path)) as conn:
+        conn.execute("CREATE TABLE u (x REAL, s TEXT)")
+        conn.executemany(
+            "INSERT INTO u VALUES (?, ?)", [(1.7, "007"), (2, "12")])
+    x, s = ( c.arr for c in io.open("sqlite::{}::u".format(path)).cols )
+    assert x.dtype == np.float64 and list(x[:]) == [1.7, 2.0]
+    assert s.dtype == object and list(s[:]) == ["007", "12"]
+
+    # Saving to SQLite is rejected before it starts.
+    with pytest.raises(CmdError):
+        io.save(mdl, Controller())
+
+
+def test_columns(tmp_path):
+    path = tmp_path / "test.csv"
+    with open(path, "w") as file:
+        print("a,b,c,d", file=file)
+        for i in range(3000):
+            print("{},{},x{},{}".format(i, i * 0.5, i % 7, -i), file=file)
+
+    for options in ({}, {"workers": 1}):
+        mdl = io.open(str(path), columns="d,b", **options)
+        mdl.loader.wait()
+        a, b, c, d = ( c.arr for c in mdl.cols )
+        assert [ c.name for c in mdl.cols ] == ["a", "b", "c", "d"]
+        assert isinstance(a, Unloaded) and isinstance(c, Unloaded)
+        assert len(a) == 3000 and a[5] == ""
+        assert b[3] == 1.5 and d[2999] == -2999
+
+        job = io.load_columns(mdl, [ c.id for c in mdl.cols ])
+        assert io.load_columns(mdl, [mdl.cols[0].id]) is None
+        job.wait()
+        assert job.msg == "loaded: a, c"
+        assert mdl.cols[0].arr[2999] == 2999
+        assert list(mdl.cols[2].arr[5 : 8]) == ["x5", "x6", "x0"]
+
+
@@ -0,0 +1,53 @@
+import numpy as np
+
+from   tbl import controller, view
+from   tbl.controller import Controller
+from   tbl.encoding import DictArray
+from   tbl.join import Index
+from   tbl.lazy import GatherArray
+from   tbl.model import Model
+from   tbl.view import build_view
+
+#-------------------------------------------------------------------------------
+
+def test_index():
+    index = Index.from_array(np.array([30, 10, 20, 10, np.nan]))
+    assert index.values.tolist() == [10, 20, 30]
+    # The first row of each value.
+    assert index.rows.tolist() == [1, 2, 0]
+    assert index.lookup(np.array([20, 5, 10, 40, np.nan])).tolist() \
+        == [2, -1, 1, -1, -1]
+
+    index = Index.from_array(np.array(["b", "a", ""], dtype=object))
+    keys = DictArray(np.array([0, 1, 2, 0]), np.array(["a", "c", None]))
+    assert index.lookup(keys).tolist() == [1, -1, -1, 1]
+
+
+def test_lookup_join(tmp_path):
+    path = tmp_path / "dim.csv"
+    path.write_text("id,name,size\n2,two,20\n1,one,10\n3,three,30\n")
+    mdl = Model()
+    mdl.add_col(np.array([1, 2, 4, 1]), "id")
+    mdl.add_col(np.array([0.5, 1.5, 2.5, 3.5]), "size")
+    vw = build_view(mdl)
+    view.update_num_rows(vw, mdl.num_rows)
+    ctl = Controller()
+
+    res = controller.lookup_join(mdl, vw, ctl, str(path), "")
+    assert res.msg == "joined 2 columns; 3 of 4 rows matched"
+    assert [ c.name for c in mdl.cols ] == ["id", "name", "size (dim)", "size"]
+    assert isinstance(mdl.cols[1].arr, GatherArray)
+    assert list(mdl.cols[1].arr) == ["one", "two", "", "one"]
+    sizes = np.asarray(mdl.cols[2].arr)
+    assert sizes[[0, 1, 3]].tolist() == [10, 20, 10] and np.isnan(sizes[2])
+
+    # Gathered columns stay lazy when rows are taken.
+    view.toggle_select_row(vw)
+    controller.delete_selected_rows(mdl, vw, ctl)
+    assert isinstance(mdl.cols[1].arr, GatherArray)
+    assert list(mdl.cols[1].arr) == ["two", "", "one"]
+
+    controller.undo(mdl, vw, ctl)
+    controller.undo(mdl, vw, ctl)
+    assert [ c.name for c in mdl.cols ] == ["id", "size"]
+    assert len(vw.cols) == 2
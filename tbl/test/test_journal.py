@@ -0,0 +1,63 @@
+from   tbl import controller, io, jobs
+from   tbl.controller import Controller
+from   tbl.view import build_view
+
+#-------------------------------------------------------------------------------
+
+def _open(path):
+    mdl = io.open(str(path), journal=True)
+    mdl.loader.wait()
+    jobs.wait_all()
+    vw = build_view(mdl)
+    return mdl, vw, Controller(journal=mdl.journal)
+
+
+def test_journal(tmp_path):
+    path = tmp_path / "test.csv"
+    text = "id,name\n1,a\n2,b\n3,c\n"
+    path.write_text(text)
+
+    mdl, vw, ctl = _open(path)
+    controller.delete_row(mdl, vw, ctl)
+    controller.delete_row(mdl, vw, ctl)
+    controller.undo(mdl, vw, ctl)
+    assert io.save(mdl, ctl).msg.startswith("saved 3 edits")
+    # An uncommitted edit, as if after a crash.
+    controller.delete_row(mdl, vw, ctl)
+    ctl.journal.close()
+    # Saving doesn't rewrite the source.
+    assert path.read_text() == text
+
+    mdl, vw, ctl = _open(path)
+    assert list(mdl.cols[0].arr) == [3]
+    assert ctl.journal.num_unsaved == 1
+    ctl.journal.discard()
+    ctl.journal.close()
+
+    mdl, vw, ctl = _open(path)
+    assert list(mdl.cols[0].arr) == [2, 3]
+    assert ctl.journal.num_unsaved == 0
+
+    # Compaction rewrites the source, and carries later edits over.
+    io.compact(mdl, ctl)
+    controller.delete_row(mdl, vw, ctl)
+    jobs.wait_all()
+    assert path.read_text() == "id,name\n2,b\n3,c\n"
+    assert ctl.journal.num_unsaved == 1
+    ctl.journal.commit()
+    ctl.journal.close()
+
+    mdl, vw, ctl = _open(path)
+    assert list(mdl.cols[0].arr) == [3]
+    ctl.journal.close()
+
+    # If the source changes, the journal is moved aside, not truncated.
+    journal = path.with_name(path.name + ".tbljournal")
+    old = journal.read_text()
+    path.write_text(text)
+    mdl, vw, ctl = _open(path)
+    assert list(mdl.cols[0].arr) == [1, 2, 3]
+    assert ctl.journal.stale_path == journal.with_name(
+        journal.name + ".stale")
+    assert ctl.journal.stale_path.read_text() == old
+    ctl.journal.close()
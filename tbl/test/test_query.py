@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from   tbl import controller, query, view
+from   tbl.controller import Controller
+from   tbl.model import Model
+from   tbl.query import Query
+from   tbl.view import build_view
+
+#-------------------------------------------------------------------------------
+
+def _make():
+    mdl = Model()
+    mdl.add_col(np.array([50, 150, 200, 99.5, 300]), "price")
+    mdl.add_col(np.array(["EU", "US", "EU", "EU", ""], dtype=object), "region")
+    mdl.add_col(np.arange(5), "unit count")
+    return mdl
+
+
+def test_query(monkeypatch):
+    # Evaluate in several chunks.
+    monkeypatch.setattr(query, "CHUNK_SIZE", 2)
+    mdl = _make()
+
+    def rows(*exprs):
+        return query.get_rows(mdl, [ Query(e) for e in exprs ]).tolist()
+
+    assert rows('price > 100 and region == "EU"') == [2]
+    assert rows('region in ["US", ""] or col("unit count") == 0') == [0, 1, 4]
+    assert rows("90 < price <= 200", "not region == 'US'") == [2, 3]
+    assert rows("price * 2 - 1 >= 399") == [2, 4]
+
+    for expr in ("price >", "cost > 1", "price.real > 1", "region < 1"):
+        with pytest.raises(ValueError):
+            rows(expr)
+
+
+def test_filter_view():
+    mdl = _make()
+    vw = build_view(mdl)
+    view.update_num_rows(vw, mdl.num_rows)
+    ctl = Controller()
+
+    view.filter(vw, mdl, "price > 60")
+    view.filter(vw, mdl, "region == 'EU'")
+    assert vw.rows.tolist() == [2, 3]
+    assert vw.layout.num_rows == 2
+
+    # Edits go through the filter.
+    view.move_cur_to(vw, r=1)
+    controller.delete_row(mdl, vw, ctl)
+    assert list(mdl.cols[2].arr) == [0, 1, 2, 4]
+    assert vw.rows.tolist() == [2]
+
+    view.undo_filter(vw, mdl)
+    assert vw.rows.tolist() == [1, 2, 3]
+    view.clear_filters(vw, mdl)
+    assert vw.rows is None
@@ -0,0 +1,46 @@
+import numpy as np
+
+from   tbl import search, view
+from   tbl.model import Model
+from   tbl.view import build_view
+
+#-------------------------------------------------------------------------------
+
+def test_matcher():
+    vals = np.array(["apple", "banana", None, "cherry"], dtype=object)
+    match = search.get_matcher("an", vals.dtype)
+    assert match(vals).tolist() == [False, True, False, False]
+    match = search.get_matcher("/^(a|c)/", vals.dtype)
+    assert match(vals).tolist() == [True, False, False, True]
+
+    vals = np.array([1.5, 2.0, 15.0])
+    assert search.get_matcher("2", vals.dtype)(vals).tolist() \
+        == [False, True, False]
+    assert search.get_matcher("5", vals.dtype)(vals).tolist() \
+        == [False, False, False]
+
+
+def test_search(monkeypatch):
+    monkeypatch.setattr(search, "CHUNK_SIZE", 3)
+    mdl = Model()
+    mdl.add_col(np.array([0, 1, 0, 0, 1, 0, 0, 0, 1, 0]), "x")
+    vw = build_view(mdl)
+    view.update_num_rows(vw, mdl.num_rows)
+
+    view.move_cur_to(vw, r=4)
+    search.search_forward(vw, mdl, "1")
+    vw.search.job.wait()
+    search.update(vw, mdl)
+    assert vw.cur.r == 8
+    assert vw.search.num_hits == 3
+
+    # An empty pattern repeats the search; searches wrap around.
+    search.search_forward(vw, mdl, "")
+    vw.search.job.wait()
+    search.update(vw, mdl)
+    assert vw.cur.r == 1
+
+    search.search_backward(vw, mdl, "1")
+    vw.search.job.wait()
+    search.update(vw, mdl)
+    assert vw.cur.r == 8
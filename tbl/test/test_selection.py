@@ -0,0 +1,99 @@
+import json
+import numpy as np
+
+from   tbl import controller, journal, model, view
+from   tbl.controller import Controller
+from   tbl.encoding import encode
+from   tbl.model import Model
+from   tbl.selection import Selection, from_runs, to_runs
+from   tbl.view import build_view
+
+#-------------------------------------------------------------------------------
+
+def test_selection():
+    sel = Selection()
+    sel.add(2, 5)
+    sel.add(8, 10)
+    sel.add(5, 6)
+    assert sel.starts.tolist() == [2, 8] and sel.stops.tolist() == [6, 10]
+    sel.remove(3, 9)
+    assert sel.starts.tolist() == [2, 9] and sel.stops.tolist() == [3, 10]
+    assert len(sel) == 2 and 2 in sel and 3 not in sel
+
+    mask = sel.get_mask(12)
+    assert np.flatnonzero(mask).tolist() == [2, 9]
+    assert Selection.from_mask(mask).get_indices().tolist() == [2, 9]
+
+    idx = np.array([0, 1, 2, 5, 7, 8])
+    assert to_runs(idx) == [[0, 3], [5, 6], [7, 9]]
+    assert from_runs(to_runs(idx)).tolist() == idx.tolist()
+
+
+def _make():
+    mdl = Model()
+    mdl.add_col(np.arange(8), "x")
+    mdl.add_col(encode(np.array(list("aaaabbbb"), dtype=object)), "y")
+    vw = build_view(mdl)
+    view.update_num_rows(vw, mdl.num_rows)
+    return mdl, vw, Controller()
+
+
+def test_bulk_edits():
+    mdl, vw, ctl = _make()
+    vw.selection.add(1, 3)
+    vw.selection.add(6, 7)
+
+    controller.duplicate_selected_rows(mdl, vw, ctl)
+    assert list(mdl.cols[0].arr) == [0, 1, 1, 2, 2, 3, 4, 5, 6, 6, 7]
+    assert vw.selection.get_indices().tolist() == [2, 4, 9]
+
+    controller.delete_selected_rows(mdl, vw, ctl)
+    assert list(mdl.cols[0].arr) == [0, 1, 2, 3, 4, 5, 6, 7]
+
+    vw.selection.add(5, 7)
+    view.move_cur_to(vw, r=1)
+    controller.move_selected_rows(mdl, vw, ctl)
+    assert list(mdl.cols[0].arr) == [0, 5, 6, 1, 2, 3, 4, 7]
+    assert "".join(mdl.cols[1].arr) == "abbaaabb"
+
+    # Each command is a single undo step.
+    controller.undo(mdl, vw, ctl)
+    controller.undo(mdl, vw, ctl)
+    assert list(mdl.cols[0].arr) == [0, 1, 1, 2, 2, 3, 4, 5, 6, 6, 7]
+
+
+def _apply(mdl, ops):
+    for op, args in ops:
+        args = { n: journal._to_json(v) for n, v in args.items() }
+        journal.apply(mdl, json.loads(json.dumps(dict(op=op, **args))))
+
+
+def test_journal_ops(tmp_path):
+    # Replaying each edit's ops, then its inverse, restores the model.
+    mdl, vw, ctl = _make()
+    # Deleted values are kept for the inverse only if there's a journal.
+    vw.selection.add(0, 2)
+    controller.delete_selected_rows(mdl, vw, ctl)
+    assert ctl.history.undo[-1].inverse == []
+    controller.undo(mdl, vw, ctl)
+    path = tmp_path / "test.csv"
+    path.write_text("")
+    ctl.journal = journal.Journal(path)
+
+    vw.selection.add(0, 2)
+    view.move_cur_to(vw, r=6)
+    for cmd in (
+            controller.delete_selected_rows,
+            controller.duplicate_selected_rows,
+            controller.move_selected_rows,
+    ):
+        copy = _make()[0]
+        vw.selection.add(0, 2)
+        cmd(mdl, vw, ctl)
+        version = ctl.history.undo[-1]
+        _apply(copy, version.ops)
+        assert list(copy.cols[0].arr) == list(mdl.cols[0].arr)
+        _apply(copy, version.inverse)
+        assert list(copy.cols[1].arr) == list(version.snap.cols[1].arr)
+        model.restore(mdl, version.snap)
+    ctl.journal.close()
@@ -0,0 +1,64 @@
+import numpy as np
+
+from   tbl import controller, sort, view
+from   tbl.controller import Controller
+from   tbl.encoding import DictArray
+from   tbl.model import Model
+from   tbl.view import build_view
+
+#-------------------------------------------------------------------------------
+
+def test_get_order():
+    mdl = Model()
+    mdl.add_col(np.array([2.0, np.nan, 1.0, 2.0, 1.0]), "x")
+    codes = np.array([0, 1, 1, 0, 2], dtype=np.int8)
+    mdl.add_col(DictArray(codes, np.array(["b", "a", ""], dtype=object)), "y")
+    x, y = ( c.id for c in mdl.cols )
+
+    assert sort.get_order(mdl, [(x, False)]).tolist() == [2, 4, 0, 3, 1]
+    # Nulls sort last, in either direction.
+    assert sort.get_order(mdl, [(x, True)]).tolist() == [0, 3, 2, 4, 1]
+    assert sort.get_order(mdl, [(y, False)]).tolist() == [1, 2, 0, 3, 4]
+    assert sort.get_order(mdl, [(y, False), (x, True)]).tolist() \
+        == [2, 1, 0, 3, 4]
+
+    # Cached per key set.
+    assert sort.get_order(mdl, [(x, True)]) is sort.get_order(mdl, [(x, True)])
+
+
+def test_sort_view():
+    mdl = Model()
+    mdl.add_col(np.array([3, 1, 2, 1]), "x")
+    mdl.add_col(np.array([10, 20, 30, 40]), "y")
+    vw = build_view(mdl)
+    view.update_num_rows(vw, mdl.num_rows)
+    ctl = Controller()
+
+    view.sort_by_column(vw, mdl)
+    assert vw.rows.tolist() == [1, 3, 2, 0]
+    # The cursor stays on its row.
+    assert vw.cur.r == 3
+    # Sorting again reverses.
+    view.sort_by_column(vw, mdl)
+    assert vw.rows.tolist() == [0, 2, 1, 3]
+
+    # Edits go through the permutation, which is updated.
+    view.move_cur_to(vw, r=1)
+    controller.delete_row(mdl, vw, ctl)
+    assert list(mdl.cols[1].arr) == [10, 20, 40]
+    assert vw.rows.tolist() == [0, 1, 2]
+    assert np.asarray(mdl.cols[0].arr).tolist() == [3, 1, 1]
+    # Without further changes, the rows aren't recomputed.
+    rows = vw.rows
+    view.update_rows(vw, mdl)
+    assert vw.rows is rows
+
+    view.clear_sort(vw, mdl)
+    assert vw.rows is None
+
+    # If a sort key can no longer be sorted, the view reverts, and says why.
+    view.sort_by_column(vw, mdl)
+    mdl.cols[0].arr = np.array([3, "a", 1], dtype=object)
+    view.update_rows(vw, mdl)
+    assert vw.rows is None and vw.sort_keys == ()
+    assert vw.error.startswith("cleared filters and sort: ")
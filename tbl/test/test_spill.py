@@ -0,0 +1,55 @@
+import numpy as np
+
+from   tbl import model, spill
+from   tbl.chunked import chunk
+from   tbl.encoding import DictArray
+from   tbl.history import History
+from   tbl.model import Model
+
+#-------------------------------------------------------------------------------
+
+def test_spill():
+    arr = np.arange(10000, dtype=np.int64)
+    spilled = spill.spill(arr)
+    assert spill.is_mapped(spilled) and not spill.is_mapped(arr)
+    assert (spilled == arr).all()
+    assert spill.get_size([arr, arr, spilled]) == arr.nbytes
+
+    edited = chunk(arr).delete(5)
+    assert (spill.spill(edited) == np.delete(arr, 5)).all()
+    arr = DictArray(np.zeros(100, dtype=np.int8), np.array(["a"], dtype=object))
+    assert spill.is_mapped(spill.spill(arr).codes)
+    # Object arrays can't be spilled.
+    assert spill.spill(np.array(["a", "b"], dtype=object)) is None
+
+    # A spilled column that widens to object as it grows is held in memory.
+    grown = model._append(spilled, np.array(["x"], dtype=object))
+    assert grown.dtype == object and not spill.is_mapped(grown)
+    assert spill.get_size([grown]) == grown.nbytes
+
+
+def test_enforce_budget():
+    mdl = Model()
+    for name in "abc":
+        mdl.add_col(np.zeros(1000), name)
+    a, b, c = mdl.cols
+    history = History()
+    snap = model.snapshot(mdl)
+    history.push(snap, mdl, "nothing")
+
+    model.touch_cols(mdl, [c.id, a.id])
+    assert model.enforce_budget(mdl) == []
+    mdl.memory_budget = 16000
+    old = c.arr
+    replaced = model.enforce_budget(mdl, keep=[b.id])
+    # The least recently viewed column is spilled, except those kept.
+    assert len(replaced) == 1 and replaced[0][0] is old
+    assert spill.is_mapped(c.arr)
+    assert not spill.is_mapped(a.arr) and not spill.is_mapped(b.arr)
+    history.replace_arrays(replaced)
+    assert history.undo[0].snap.cols[2].arr is c.arr
+
+    # Spilled columns grow on disk.
+    model.append_rows(mdl, [ np.ones(2000) for _ in range(3) ])
+    assert spill.is_mapped(c.arr) and len(c.arr) == 3000
+    assert c.arr[-1] == 1
@@ -0,0 +1,44 @@
+import numpy as np
+
+from   tbl import model, stats
+from   tbl.derived import derive
+from   tbl.model import Model
+from   tbl.stats import Stats
+
+#-------------------------------------------------------------------------------
+
+def test_stats():
+    arr = np.array([3.0, np.nan, 1.0, 4.0, 1.0, 5.0])
+    s = Stats.from_array(arr)
+    assert (s.num, s.num_null, s.min, s.max) == (6, 1, 1.0, 5.0)
+    assert s.mean == 2.8
+    assert s.distinct == 4
+
+    s = Stats.from_array(np.array(["x", None, "", "y", "x"], dtype=object))
+    assert (s.num_null, s.min, s.max, s.mean) == (2, "x", "y", None)
+
+    # Distinct counts are approximate.
+    arr = np.random.randint(0, 100000, 500000)
+    assert abs(stats.compute(arr).distinct / len(np.unique(arr)) - 1) < 0.05
+
+
+def test_incremental():
+    mdl = Model()
+    mdl.add_col(np.arange(10) * 1.5, "x")
+    stats.compute_stats(mdl, [mdl.cols[0].id]).wait()
+    assert mdl.cols[0].stats.sum == 67.5
+
+    model.delete_row(mdl, 4)
+    model.insert_row(mdl, 0, [20.0])
+    s = mdl.cols[0].stats
+    assert (s.num, s.min, s.max, s.sum) == (10, 0, 20.0, 81.5)
+
+    # Deleting the min loses it.
+    model.delete_row(mdl, 1)
+    assert mdl.cols[0].stats is None
+
+    # Stats of a column not held in memory are computed only on request.
+    mdl.add_col(derive(mdl, "x * 2"), "y")
+    assert stats.compute_stats(mdl, [mdl.cols[1].id]) is None
+    stats.compute_stats(mdl, [mdl.cols[1].id], force=True).wait()
+    assert mdl.cols[1].stats.max == 40.0
@@ -2,8 +2,12 @@ import logging
 import numpy as np
 
 from   .commands import command, CmdError, CmdResult
+from   . import formatter
 from   .formatter import choose_formatter
 from   .lib import clip, if_none
+from   .query import Query, get_rows
+from   .selection import Selection
+from   .sort import get_order
 
 #-------------------------------------------------------------------------------
 
@@ -66,6 +70,8 @@ class View:
             self.col_id     = col_id
             self.fmt        = fmt
             self.visible    = True
+            # If true, widen the formatter for rendered values that don't fit.
+            self.widen      = True
 
 
 
@@ -91,6 +97,8 @@ class View:
 
         self.show_header = True
         self.show_row_num = True
+        # If true, keep the cursor on the last row as rows are appended.
+        self.follow = False
 
         # Decoration characters.
         self.row_num_sep    = "\u2551"
@@ -107,6 +115,22 @@ class View:
         self.cols           = []
         self.layout         = None
 
+        # Selected rows.
+        self.selection      = Selection()
+
+        # Filter queries; rows must pass all to be displayed.
+        self.filters        = []
+        # Sort keys, as `(col_id, descending)` pairs.
+        self.sort_keys      = ()
+        # Model row for each displayed row, or None for model order.
+        self.rows           = None
+        # The model arrays, filters, and sort keys from which `rows` was
+        # computed, to tell when it's stale.
+        self.rows_for       = None
+
+        # The last search, if any.
+        self.search         = None
+
 
     def add_column(self, col_id, fmt, position=None):
         if position is None:
@@ -135,11 +159,220 @@ def build_view(mdl):
     """
     vw = View()
     for col in mdl.cols:
+        # Formatters are chosen from a sample, and widened as needed.
         fmt = choose_formatter(col.arr)
         vw.add_column(col.id, fmt)
     return vw
 
 
+def widen_formatters(vw, mdl, start, stop):
+    """
+    Widens formatters of on-screen columns to fit values in rows
+    `[start, stop)`.
+
+    @return
+      True if any formatter changed, in which case the layout is stale.
+    """
+    changed = False
+    for c in get_screen_cols(vw):
+        col = vw.cols[c]
+        if not col.widen or stop <= start:
+            continue
+        fmt = col.fmt
+        width = fmt.width
+        arr = mdl.get_col(col.col_id).arr
+        rows = get_model_rows(vw, slice(start, stop))
+        col.fmt = formatter.widen(fmt, arr[rows])
+        changed |= col.fmt is not fmt or col.fmt.width != width
+    return changed
+
+
+def get_model_rows(vw, rows):
+    """
+    Returns the model rows of displayed rows.
+
+    @param rows
+      A displayed row number, or a slice or array of them.
+    """
+    return rows if vw.rows is None else vw.rows[rows]
+
+
+def _get_rows(mdl, filters, sort_keys):
+    """
+    Returns the model rows to display, or `None` for all in model order.
+    """
+    rows = get_rows(mdl, filters)
+    if len(sort_keys) > 0:
+        order = get_order(mdl, sort_keys)
+        if rows is None:
+            rows = order
+        else:
+            mask = np.zeros(mdl.num_rows, dtype=bool)
+            mask[rows] = True
+            rows = order[mask[order]]
+    return rows
+
+
+def _get_rows_for(vw, mdl):
+    return (
+        mdl.num_rows, [ c.arr for c in mdl.cols ],
+        list(vw.filters), tuple(vw.sort_keys))
+
+
+def _rows_current(vw, mdl):
+    """
+    Returns true if the displayed rows are for the model's current arrays and
+    the view's filters and sort keys.
+    """
+    if vw.rows_for is None:
+        return False
+    num_rows, arrs, filters, sort_keys = vw.rows_for
+    # Edits replace arrays, so unchanged arrays have the same values.
+    return (
+        num_rows == mdl.num_rows
+        and len(arrs) == len(mdl.cols)
+        and all( a is c.arr for a, c in zip(arrs, mdl.cols) )
+        and filters == vw.filters
+        and sort_keys == tuple(vw.sort_keys)
+    )
+
+
+def get_num_rows(vw, mdl):
+    """
+    Returns the number of displayed rows.
+    """
+    return mdl.num_rows if vw.rows is None else len(vw.rows)
+
+
+def update_rows(vw, mdl):
+    """
+    Updates the displayed rows for the model's current contents.
+
+    If the filters or sort keys no longer apply, _e.g._ values that aren't
+    comparable were inserted, reverts to showing all rows in model order, and
+    sets `vw.error` to say why.
+
+    Does nothing if the model's arrays and the view's filters and sort keys
+    haven't changed since the rows were computed.
+    """
+    if _rows_current(vw, mdl):
+        return
+    try:
+        vw.rows = _get_rows(mdl, vw.filters, vw.sort_keys)
+    except ValueError as exc:
+        vw.error = "cleared filters and sort: {}".format(exc)
+        vw.filters = []
+        vw.sort_keys = ()
+        vw.rows = None
+    vw.rows_for = _get_rows_for(vw, mdl)
+    update_num_rows(vw, get_num_rows(vw, mdl))
+
+
+def update_cols(vw, mdl):
+    """
+    Updates the displayed columns for columns added to or removed from the
+    model, _e.g._ by undo.
+
+    Keeps the cursor on its column, if it's still displayed.
+    """
+    ids = [ c.id for c in mdl.cols ]
+    shown = { c.col_id for c in vw.cols }
+    if shown == set(ids):
+        return
+    cur = vw.cols[vw.cur.c].col_id if len(vw.cols) > 0 else None
+
+    vw.cols = [ c for c in vw.cols if c.col_id in set(ids) ]
+    vw.sort_keys = tuple( k for k in vw.sort_keys if k[0] in set(ids) )
+    for i, col in enumerate(mdl.cols):
+        if col.id not in shown:
+            # Show the column after the one before it in the model.
+            position = 0 if i == 0 else 1 + next(
+                p for p, c in enumerate(vw.cols) if c.col_id == ids[i - 1])
+            vw.add_column(col.id, choose_formatter(col.arr), position)
+
+    if vw.layout is not None:
+        num_rows = vw.layout.num_rows
+        vw.layout = Layout(vw)
+        vw.layout.num_rows = num_rows
+    c = next(
+        ( p for p, c in enumerate(vw.cols) if c.col_id == cur ),
+        clip(0, vw.cur.c, len(vw.cols) - 1))
+    if len(vw.cols) > 0 and not vw.cols[c].visible:
+        try:
+            c = _next_visible(vw.cols, c)
+        except StopIteration:
+            c = _prev_visible(vw.cols, c)
+    vw.cur.c = c
+
+
+def get_selected(vw, num_rows):
+    """
+    Returns a mask of the model rows that are selected.
+    """
+    if vw.rows is None:
+        return vw.selection.get_mask(num_rows)
+    mask = np.zeros(num_rows, dtype=bool)
+    mask[vw.rows] = vw.selection.get_mask(len(vw.rows))
+    return mask
+
+
+def select(vw, mask):
+    """
+    Selects the model rows where `mask` is true.
+    """
+    vw.selection = Selection.from_mask(
+        mask if vw.rows is None else mask[vw.rows])
+
+
+def set_rows(vw, mdl, *, filters=None, sort_keys=None):
+    """
+    Filters and sorts the displayed rows, keeping the selection.
+
+    Keeps the cursor on its row, if it's still displayed.
+
+    @param filters
+      Queries for rows to display, or `None` to keep the current ones.
+    @param sort_keys
+      Sort keys, or `None` to keep the current ones.
+    @raise ValueError
+      A filter can't be evaluated, or a key column can't be sorted.
+    """
+    filters = list(if_none(filters, vw.filters))
+    sort_keys = tuple(if_none(sort_keys, vw.sort_keys))
+    rows = _get_rows(mdl, filters, sort_keys)
+    mask = get_selected(vw, mdl.num_rows)
+    row = get_model_rows(vw, vw.cur.r) if get_num_rows(vw, mdl) > 0 else 0
+
+    vw.filters = filters
+    vw.sort_keys = sort_keys
+    vw.rows = rows
+    vw.rows_for = _get_rows_for(vw, mdl)
+    select(vw, mask)
+    update_num_rows(vw, get_num_rows(vw, mdl))
+    if rows is not None:
+        found = np.flatnonzero(rows == row)
+        row = (
+            int(found[0]) if len(found) > 0
+            # Unsorted rows are in model order.
+            else int(np.searchsorted(rows, row)) if len(sort_keys) == 0
+            else 0
+        )
+    move_cur_to(vw, r=row)
+
+
+def get_screen_cols(vw):
+    """
+    Returns positions of visible columns that are at least partly on screen.
+
+    Uses the current layout; if there is none, returns all visible columns.
+    """
+    if vw.layout is None:
+        return [ c for c, col in enumerate(vw.cols) if col.visible ]
+    x0 = vw.scr.x + vw.layout.fixed_x
+    x1 = vw.scr.x + vw.size.x
+    return [ c for x, w, c in vw.layout.cols if x0 < x + w and x < x1 ]
+
+
 #-------------------------------------------------------------------------------
 # Layout
 
@@ -247,11 +480,12 @@ def _rendered_cols(vw, mdl):
         if c == "row_num":
             # Row number.
             fmt = vw.row_num_fmt
-            arr = np.arange(mdl.num_rows)  # FIXME
+            # A range, rather than an array, so its size doesn't matter.
+            arr = range(mdl.num_rows)
             name = "row #"
         else:
             fmt = vw.cols[c].fmt
-            col = mdl.get_col(c)
+            col = mdl.get_col(vw.cols[c].col_id)
             arr = col.arr
             name = col.name
 
@@ -276,7 +510,7 @@ def _rendered_cols(vw, mdl):
         s1 = vw.size.x - x0
         trim = slice(s0 if s0 > 0 else None, s1 if s1 < w else None)
 
-        col     = mdl.get_col(c)
+        col     = mdl.get_col(vw.cols[c].col_id)
         name    = col.name
         fmt     = vw.cols[c].fmt
         arr     = col.arr
@@ -321,16 +555,40 @@ def get_status(vw, mdl):
     @return
       The left- and right-justified portions of the text.
     """
-    col     = mdl.cols[vw.cur.c]
-    row_num = vw.cur.r
-    val     = col.arr[vw.cur.r]
+    col     = mdl.get_col(vw.cols[vw.cur.c].col_id)
+    try:
+        row_num = get_model_rows(vw, vw.cur.r)
+        val     = col.arr[row_num]
+    except IndexError:
+        # No rows displayed.
+        row_num, val = -1, ""
     dtype   = col.arr.dtype
 
     hidden = sum( not c.visible for c in vw.cols )
     hidden = " [{} cols hidden]".format(hidden) if hidden > 0 else ""
+    selected = len(vw.selection)
+    selected = " [{} rows selected]".format(selected) if selected > 0 else ""
+    sort = ", ".join(
+        "{} {}".format(mdl.get_col(i).name, "\u25bc" if d else "\u25b2")
+        for i, d in vw.sort_keys
+    )
+    sort = " [sort: {}]".format(sort) if len(sort) > 0 else ""
+    filters = (
+        " [{} filters: {} rows]".format(len(vw.filters), len(vw.rows))
+        if len(vw.filters) > 0 else ""
+    )
+
+    stats = col.stats
+    if stats is not None:
+        if stats.min is not None:
+            dtype = "{} {}\u2026{}".format(dtype, stats.min, stats.max)
+        if stats.mean is not None:
+            dtype = "{} mean {:.6g}".format(dtype, stats.mean)
+        dtype = "{} nulls {} ~{} distinct".format(
+            dtype, stats.num_null, stats.distinct)
 
     return (
-        "{} [{}]".format(val, dtype) + hidden,
+        "{} [{}]".format(val, dtype) + hidden + selected + sort + filters,
         "{} {:6d}".format(col.name, row_num)
     )
 
@@ -382,6 +640,24 @@ def move_cur_to(vw, c=None, r=None):
     scroll_to_row(vw, vw.cur.r)
 
 
+def update_num_rows(vw, num_rows):
+    """
+    Updates the view for a change in the number of rows.
+
+    In follow mode, if the cursor is on the last row, keeps it there.  If the
+    view hasn't been laid out yet, moves it there.
+    """
+    if vw.layout is None:
+        vw.layout = Layout(vw)
+        at_bottom = True
+    else:
+        at_bottom = vw.cur.r >= vw.layout.num_rows - 1
+    vw.layout.num_rows = num_rows
+    vw.selection.clip(num_rows)
+    if vw.follow and at_bottom and num_rows > 0:
+        move_cur_to(vw, r=num_rows - 1)
+
+
 def move_cur_to_coord(vw, x, y):
     """
     Moves the cursor to the position matching coordinates `x, y`.
@@ -465,6 +741,99 @@ def move_down_page(vw):
     move_cur_to(vw, r=vw.cur.r + (vw.size.y - 2))
 
 
+@command()
+def goto_row(vw, row):
+    try:
+        r = int(row)
+    except ValueError:
+        raise CmdError("not a row number: {}".format(row))
+    move_cur_to(vw, r=r)
+
+
+@command()
+def toggle_select_row(vw):
+    r = vw.cur.r
+    if r in vw.selection:
+        vw.selection.remove(r, r + 1)
+    else:
+        vw.selection.add(r, r + 1)
+    move_cur_to(vw, r=r + 1)
+
+
+@command()
+def extend_selection_up(vw):
+    vw.selection.add(vw.cur.r, vw.cur.r + 1)
+    move_cur_to(vw, r=vw.cur.r - 1)
+    vw.selection.add(vw.cur.r, vw.cur.r + 1)
+
+
+@command()
+def extend_selection_down(vw):
+    vw.selection.add(vw.cur.r, vw.cur.r + 1)
+    move_cur_to(vw, r=vw.cur.r + 1)
+    vw.selection.add(vw.cur.r, vw.cur.r + 1)
+
+
+@command()
+def select_all(vw):
+    vw.selection.add(0, vw.layout.num_rows)
+
+
+@command()
+def clear_selection(vw):
+    vw.selection.clear()
+
+
+@command()
+def sort_by_column(vw, mdl):
+    """
+    Sorts by the current column, then by previous sort keys.
+
+    If already sorted by the current column, reverses the sort direction.
+    """
+    if mdl.loading:
+        raise CmdError("table is still loading")
+    col = mdl.get_col(vw.cols[vw.cur.c].col_id)
+    descending = vw.sort_keys[: 1] == ((col.id, False), )
+    keys = [ k for k in vw.sort_keys if k[0] != col.id ]
+    try:
+        set_rows(vw, mdl, sort_keys=[(col.id, descending)] + keys)
+    except ValueError as exc:
+        raise CmdError("can't sort by {}: {}".format(col.name, exc))
+    return CmdResult(msg="sorted by {} {}".format(
+        col.name, "descending" if descending else "ascending"))
+
+
+@command()
+def clear_sort(vw, mdl):
+    set_rows(vw, mdl, sort_keys=())
+
+
+@command()
+def filter(vw, mdl, expr):
+    if mdl.loading:
+        raise CmdError("table is still loading")
+    try:
+        set_rows(vw, mdl, filters=vw.filters + [Query(expr)])
+    except ValueError as exc:
+        raise CmdError(str(exc))
+    return CmdResult(msg="{} rows match".format(vw.layout.num_rows))
+
+
+@command()
+def undo_filter(vw, mdl):
+    if len(vw.filters) == 0:
+        raise CmdError("no filter")
+    query = vw.filters[-1]
+    set_rows(vw, mdl, filters=vw.filters[: -1])
+    return CmdResult(msg="removed filter: {}".format(query.expr))
+
+
+@command()
+def clear_filters(vw, mdl):
+    set_rows(vw, mdl, filters=[])
+
+
 @command()
 def scroll_left(vw):
     scroll_to(vw, vw.scr.x - 1)
@@ -475,6 +844,14 @@ def scroll_right(vw):
     scroll_to(vw, vw.scr.x + 1)
 
 
+@command()
+def toggle_follow(vw):
+    vw.follow = not vw.follow
+    if vw.follow:
+        move_cur_to(vw, r=vw.layout.num_rows - 1)
+    return CmdResult(msg="follow {}".format("on" if vw.follow else "off"))
+
+
 @command()
 def toggle_show_row_num(vw):
     vw.show_row_num = not vw.show_row_num